@@ -0,0 +1,97 @@
+"""ONNX Runtime and TorchScript backends for exported DETR models"""
+
+import torch
+from transformers.models.detr.modeling_detr import DetrObjectDetectionOutput
+
+
+class OnnxDetrModel:
+    """Run an exported DETR model with ONNX Runtime on CPU"""
+
+    def __init__(self, path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        """
+        Args:
+            path: Path to the exported .onnx file
+            intra_op_threads: Threads within an operator (0 lets ONNX Runtime decide)
+            inter_op_threads: Threads across operators (0 lets ONNX Runtime decide)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError(
+                "INFERENCE_BACKEND=onnx requires onnxruntime (pip install onnxruntime)"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def eval(self):
+        return self
+
+    def __call__(
+        self, pixel_values: torch.Tensor, pixel_mask: torch.Tensor
+    ) -> DetrObjectDetectionOutput:
+        logits, pred_boxes = self.session.run(
+            None,
+            {
+                "pixel_values": pixel_values.numpy(),
+                "pixel_mask": pixel_mask.to(torch.int64).numpy(),
+            },
+        )
+        return DetrObjectDetectionOutput(
+            logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes)
+        )
+
+
+class TorchScriptDetrModel:
+    """Run a traced TorchScript DETR model"""
+
+    def __init__(self, path: str):
+        self.module = torch.jit.load(path, map_location="cpu")
+        self.module.eval()
+
+    def eval(self):
+        return self
+
+    def __call__(
+        self, pixel_values: torch.Tensor, pixel_mask: torch.Tensor
+    ) -> DetrObjectDetectionOutput:
+        logits, pred_boxes = self.module(pixel_values, pixel_mask)
+        return DetrObjectDetectionOutput(logits=logits, pred_boxes=pred_boxes)
+
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+def bf16_supported() -> bool:
+    """Whether this CPU has native bfloat16 support (AVX512-BF16 / AMX)"""
+    try:
+        return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except Exception:
+        return False
+
+
+def apply_precision(model, precision: str):
+    """Quantize Linear layers to int8 (bf16 runs under autocast instead)"""
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r} (expected one of {', '.join(PRECISIONS)})"
+        )
+
+    if precision == "int8":
+        return torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+def precision_context(precision: str):
+    """Autocast context for a forward pass at the given precision"""
+    return torch.autocast("cpu", dtype=torch.bfloat16, enabled=precision == "bf16")
@@ -0,0 +1,163 @@
+"""Dynamic micro-batching of concurrent detection requests"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the batching queue has reached its maximum depth"""
+
+
+class MicroBatcher:
+    """Gather concurrent requests into batches and run them together"""
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        batch_window_ms: float = 10.0,
+        max_queue_size: int = 64,
+        executor=None,
+    ):
+        """
+        Args:
+            process_batch: Blocking function mapping a list of inputs to their results
+            max_batch_size: Maximum number of requests run in one batch
+            batch_window_ms: How long to wait for more requests after the first one
+            max_queue_size: Maximum number of requests waiting to be batched
+            executor: Executor used to run process_batch (None uses the loop default)
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.executor = executor
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batch_size_histogram = Counter()
+        self.total_requests = 0
+        self.rejected_requests = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    async def start(self):
+        """Start the background batching loop"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop, failing any requests still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batching queue stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue a single input and wait for its result
+
+        Raises:
+            QueueFullError: If the queue already holds max_queue_size requests
+        """
+        if self._queue is None:
+            raise RuntimeError("Batching queue not started")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected_requests += 1
+            raise QueueFullError("Too many requests waiting for inference")
+
+        self.total_requests += 1
+        return await future
+
+    async def _collect_batch(self) -> list:
+        """Gather requests until the batch window closes or the batch is full"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests that queued up while the previous batch was running are taken as well
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await self._collect_batch()
+
+            # Skip requests whose caller has already gone away
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                wait_time = now - enqueued_at
+                self.total_wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+            self.batch_size_histogram[len(batch)] += 1
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.process_batch, [item for item, _, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Error processing batch: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        """Return queue and batching metrics"""
+        processed = sum(
+            size * count for size, count in self.batch_size_histogram.items()
+        )
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.batch_window * 1000.0,
+            "total_requests": self.total_requests,
+            "rejected_requests": self.rejected_requests,
+            "total_batches": sum(self.batch_size_histogram.values()),
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "avg_queue_wait_ms": (
+                (self.total_wait_time / processed * 1000.0) if processed else 0.0
+            ),
+            "max_queue_wait_ms": self.max_wait_time * 1000.0,
+        }
@@ -0,0 +1,237 @@
+"""Content-addressed cache of raw detection results, in memory and optionally on disk"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional, Union
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Chunk size used to hash uploads read from a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def result_nbytes(result: Dict[str, torch.Tensor]) -> int:
+    """Approximate memory used by a result dict of tensors"""
+    return sum(
+        value.element_size() * value.nelement()
+        for value in result.values()
+        if isinstance(value, torch.Tensor)
+    )
+
+
+class DetectionCache:
+    """LRU + TTL cache of raw detection results with an optional disk tier"""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        """
+        Args:
+            max_bytes: Memory budget for cached results (0 disables the memory tier)
+            ttl_seconds: How long an entry stays valid after it was stored
+            disk_dir: Directory for the on-disk tier (None disables it)
+            disk_max_bytes: Size budget for the on-disk tier
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._disk_puts = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def content_hash(contents: Union[bytes, BinaryIO]) -> str:
+        """SHA-256 of uploaded bytes (or a file holding them)"""
+        digest = hashlib.sha256()
+        if isinstance(contents, (bytes, bytearray, memoryview)):
+            digest.update(contents)
+        else:
+            contents.seek(0)
+            for chunk in iter(lambda: contents.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def variant_key(content_hash: str, model_id: str) -> str:
+        """Build the cache key for content with this hash served by model_id"""
+        return hashlib.sha256(f"{model_id}\0{content_hash}".encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        """Return the cached result for key, or None on a miss"""
+        result = self._memory_get(key)
+        if result is None:
+            if self.disk_dir:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, self._tier_get, key
+                )
+            else:
+                result = self._tier_get(key)
+        return result
+
+    async def put(self, key: str, result: Dict[str, torch.Tensor]):
+        """Store a raw result in every enabled tier"""
+        with self._lock:
+            self._memory_put(key, result, time.time())
+        if self.disk_dir:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._disk_put, key, result
+            )
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result, nbytes = entry
+            if time.time() - stored_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self._remove(key)
+        return None
+
+    def _tier_get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        """Look in the disk tier after a memory miss, counting the outcome"""
+        now = time.time()
+        result = self._disk_get(key, now)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._memory_put(key, result, now)
+        return result
+
+    def _memory_put(self, key: str, result: Dict[str, torch.Tensor], now: float):
+        nbytes = result_nbytes(result)
+        if nbytes > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (now, result, nbytes)
+        self._bytes += nbytes
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pt")
+
+    def _disk_get(self, key: str, now: float) -> Optional[Dict[str, torch.Tensor]]:
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            return torch.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _disk_put(self, key: str, result: Dict[str, torch.Tensor]):
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            torch.save(result, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write cache entry {path}: {e}")
+            return
+
+        # Scanning the directory is relatively costly, so only prune periodically
+        with self._lock:
+            self._disk_puts += 1
+            prune = self._disk_puts % 64 == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove expired entries, then the oldest ones while over the size budget"""
+        now = time.time()
+        files = []
+        total = 0
+
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".pt"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._unlink(entry.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        files.sort()
+        while total > self.disk_max_bytes and files:
+            _, size, path = files.pop(0)
+            self._unlink(path)
+            total -= size
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """Return cache counters and memory usage"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": bool(self.disk_dir),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,172 @@
+"""Image decoding and encoding helpers, run in the worker pool"""
+
+import base64
+import io
+import math
+from typing import BinaryIO, Optional, Tuple, Union
+
+from PIL import Image
+
+# Uploaded bytes, or a seekable file holding them
+ImageSource = Union[bytes, BinaryIO]
+
+# Formats browsers can display as-is, with their MIME types
+BROWSER_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION = 0x0112
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image has more pixels than the configured limit"""
+
+
+def open_image(source: ImageSource, max_pixels: Optional[int] = None) -> Image.Image:
+    """
+    Open an image lazily (only the header is read) and enforce the pixel limit
+
+    Args:
+        source: Image bytes or a seekable binary file
+        max_pixels: Largest width * height accepted (None or 0 for no limit)
+
+    Raises:
+        ImageTooLargeError: If the image has more than max_pixels pixels
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    else:
+        source.seek(0)
+    image = Image.open(source)
+
+    pixels = image.width * image.height
+    if max_pixels and pixels > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {image.width}x{image.height} ({pixels / 1e6:.1f} megapixels); "
+            f"the limit is {max_pixels / 1e6:.1f} megapixels"
+        )
+    return image
+
+
+def to_rgb(image: Image.Image) -> Image.Image:
+    """Convert to RGB, or only finish decoding when the image already is RGB"""
+    if image.mode == "RGB":
+        image.load()
+        return image
+    return image.convert("RGB")
+
+
+def inference_scale(size: Tuple[int, int], resolution: Tuple[int, int]) -> float:
+    """
+    Scale factor the DETR processor will resize an image by
+
+    Args:
+        size: Image (width, height)
+        resolution: Processor (shortest_edge, longest_edge)
+    """
+    width, height = size
+    shortest_edge, longest_edge = resolution
+    return min(shortest_edge / min(width, height), longest_edge / max(width, height))
+
+
+def decode_image(
+    source: ImageSource,
+    resolution: Optional[Tuple[int, int]] = None,
+    max_pixels: Optional[int] = None,
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode an upload into an RGB image, shrunk no further than inference needs
+
+    Args:
+        source: Uploaded image bytes or file
+        resolution: Inference (shortest_edge, longest_edge), or None for full size
+        max_pixels: Reject images with more pixels than this before decoding
+
+    Returns:
+        Tuple of (RGB image, original (width, height))
+
+    Raises:
+        ImageTooLargeError: If the image exceeds max_pixels
+    """
+    image = open_image(source, max_pixels)
+    original_size = image.size
+
+    if resolution is not None and image.format == "JPEG":
+        scale = inference_scale(original_size, resolution)
+        if scale < 1:
+            image.draft(
+                "RGB",
+                (
+                    max(1, math.ceil(original_size[0] * scale)),
+                    max(1, math.ceil(original_size[1] * scale)),
+                ),
+            )
+
+    image = to_rgb(image)
+
+    if resolution is not None:
+        image = reduce_for_inference(image, resolution)
+
+    return image, original_size
+
+
+def decode_image_file(
+    path: str,
+    resolution: Optional[Tuple[int, int]] = None,
+    max_pixels: Optional[int] = None,
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Decode an image file on disk like decode_image (used by bulk jobs)"""
+    with open(path, "rb") as f:
+        return decode_image(f, resolution, max_pixels)
+
+
+def reduce_for_inference(
+    image: Image.Image, resolution: Tuple[int, int]
+) -> Image.Image:
+    """Shrink an image by an integer factor, staying above the inference size"""
+    scale = inference_scale(image.size, resolution)
+    if scale >= 1:
+        return image
+    factor = min(
+        image.width // math.ceil(image.width * scale),
+        image.height // math.ceil(image.height * scale),
+    )
+    return image.reduce(factor) if factor >= 2 else image
+
+
+def read_image_size(
+    source: ImageSource, max_pixels: Optional[int] = None
+) -> Tuple[int, int]:
+    """Read an image's (width, height) from its header without decoding pixels"""
+    return open_image(source, max_pixels).size
+
+
+def encode_preview(contents: bytes, max_side: int) -> Tuple[str, str]:
+    """
+    Return the upload if browsers can show it as is, or else a downscaled JPEG
+
+    Args:
+        contents: Original uploaded bytes
+        max_side: Longest side of a generated preview
+
+    Returns:
+        Tuple of (MIME type, base64 data)
+    """
+    original = Image.open(io.BytesIO(contents))
+    if (
+        original.format in BROWSER_FORMATS
+        and original.getexif().get(EXIF_ORIENTATION, 1) == 1
+    ):
+        return BROWSER_FORMATS[original.format], base64.b64encode(contents).decode()
+
+    if original.format == "JPEG":
+        original.draft("RGB", (max_side, max_side))
+    preview = original.convert("RGB")
+    preview.thumbnail((max_side, max_side))
+    buffered = io.BytesIO()
+    preview.save(buffered, format="JPEG")
+    return "image/jpeg", base64.b64encode(buffered.getvalue()).decode()
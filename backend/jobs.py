@@ -0,0 +1,701 @@
+"""Persistent background jobs for bulk detection, checkpointed in SQLite"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from serialization import json_dumps
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Files picked up when scanning a directory
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+# Results and uploaded images of a job, in its directory
+RESULTS_FILE = "results.jsonl"
+INPUTS_DIR = "inputs"
+
+# Job states; the last three are final
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    params TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    output_bytes INTEGER NOT NULL DEFAULT 0,
+    parquet_parts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires_at REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    result_offset INTEGER,
+    result_length INTEGER,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS job_items_pending ON job_items (job_id, done, position);
+"""
+
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+
+class JobNotFoundError(Exception):
+    """Raised when a job id is unknown"""
+
+
+class LeaseLostError(Exception):
+    """Raised when another runner has taken over a job"""
+
+
+@dataclass
+class Job:
+    """A bulk detection job as stored in the database"""
+
+    id: str
+    status: str
+    source: str
+    params: Dict[str, Any]
+    total: int
+    processed: int = 0
+    failed: int = 0
+    output_bytes: int = 0
+    parquet_parts: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    updated_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-ready progress report"""
+        elapsed = (
+            ((self.finished_at or time.time()) - self.started_at)
+            if self.started_at
+            else None
+        )
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "source": self.source,
+            "total_images": self.total,
+            "processed_images": self.processed,
+            "failed_images": self.failed,
+            "progress": self.processed / self.total if self.total else 1.0,
+            "images_per_second": self.processed / elapsed if elapsed else None,
+            "params": self.params,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+@dataclass
+class JobItem:
+    """One image of a job"""
+
+    position: int
+    path: str
+    name: str  # Reported as "filename" in results
+
+
+def scan_directory(directory: str, recursive: bool = True) -> List[Tuple[str, str]]:
+    """
+    List image files under a directory in a stable order
+
+    Returns:
+        (absolute path, path relative to directory) pairs
+    """
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        if not recursive:
+            dirs.clear()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                path = os.path.join(root, name)
+                found.append((path, os.path.relpath(path, directory)))
+    return found
+
+
+def is_within(path: str, roots: Iterable[str]) -> bool:
+    """Whether a path resolves to a location inside one of the roots"""
+    path = os.path.realpath(path)
+    for root in roots:
+        root = os.path.realpath(root)
+        if os.path.commonpath([path, root]) == root:
+            return True
+    return False
+
+
+class JobStore:
+    """SQLite-backed jobs and per-image progress"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            # WAL lets readers (progress and result queries) run while a runner commits
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            status=row["status"],
+            source=row["source"],
+            params=json.loads(row["params"]),
+            total=row["total"],
+            processed=row["processed"],
+            failed=row["failed"],
+            output_bytes=row["output_bytes"],
+            parquet_parts=row["parquet_parts"],
+            error=row["error"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            updated_at=row["updated_at"],
+            finished_at=row["finished_at"],
+        )
+
+    def create(
+        self,
+        source: str,
+        params: Dict[str, Any],
+        items: List[Tuple[str, str]],
+        job_id: str = None,
+    ) -> Job:
+        """
+        Queue a job
+
+        Args:
+            source: Where the images came from ("upload" or a directory)
+            params: Detection settings, stored as JSON
+            items: (path, name) of every image, in processing order
+        """
+        now = time.time()
+        job = Job(
+            id=job_id or uuid.uuid4().hex,
+            status=QUEUED,
+            source=source,
+            params=params,
+            total=len(items),
+            created_at=now,
+            updated_at=now,
+        )
+
+        def insert(db):
+            db.execute(
+                "INSERT INTO jobs (id, status, source, params, total, created_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    job.source,
+                    json.dumps(params),
+                    job.total,
+                    now,
+                    now,
+                ),
+            )
+            db.executemany(
+                "INSERT INTO job_items (job_id, position, path, name) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (job.id, position, path, name)
+                    for position, (path, name) in enumerate(items)
+                ),
+            )
+
+        self._transaction(insert)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"Job {job_id} not found")
+        return self._job(row)
+
+    def list(self, limit: int = 50, offset: int = 0) -> List[Job]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self, owner: str, lease_seconds: float) -> Optional[Job]:
+        """Take the oldest queued job, or a running job whose lease expired"""
+        now = time.time()
+
+        def take(db):
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? "
+                "OR (status = ? AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_expires_at = ?, "
+                "started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                (RUNNING, owner, now + lease_seconds, now, now, row["id"]),
+            )
+            return row["id"]
+
+        job_id = self._transaction(take)
+        return self.get(job_id) if job_id else None
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extend a job's lease; False if this owner no longer runs the job"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease_expires_at = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (time.time() + lease_seconds, job_id, owner, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def pending_items(self, job_id: str, limit: int) -> List[JobItem]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT position, path, name FROM job_items "
+                "WHERE job_id = ? AND done = 0 ORDER BY position LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+        return [JobItem(row["position"], row["path"], row["name"]) for row in rows]
+
+    def checkpoint(
+        self,
+        job_id: str,
+        owner: str,
+        results: List[Tuple[int, bool, int, int]],
+        output_bytes: int,
+        parquet_parts: int,
+    ):
+        """
+        Record a finished batch
+
+        Args:
+            results: (position, success, result offset, result length) per image
+            output_bytes: Size of the results file including this batch
+            parquet_parts: Number of Parquet part files including this batch
+
+        Raises:
+            LeaseLostError: If the job is no longer running under this owner
+        """
+        now = time.time()
+
+        def record(db):
+            cursor = db.execute(
+                "UPDATE jobs SET processed = processed + ?, failed = failed + ?, "
+                "output_bytes = ?, parquet_parts = ?, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (
+                    len(results),
+                    sum(not success for _, success, _, _ in results),
+                    output_bytes,
+                    parquet_parts,
+                    now,
+                    job_id,
+                    owner,
+                    RUNNING,
+                ),
+            )
+            if cursor.rowcount != 1:
+                raise LeaseLostError(
+                    f"Job {job_id} is no longer running under this runner"
+                )
+            db.executemany(
+                "UPDATE job_items SET done = 1, result_offset = ?, result_length = ? "
+                "WHERE job_id = ? AND position = ?",
+                (
+                    (offset, length, job_id, position)
+                    for position, _, offset, length in results
+                ),
+            )
+
+        self._transaction(record)
+
+    def finish(self, job_id: str, owner: str, status: str, error: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, owner = NULL, "
+                "lease_expires_at = NULL, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (status, error, now, now, job_id, owner, RUNNING),
+            )
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued or running job (a running batch finishes first)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_expires_at = NULL, "
+                "finished_at = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, now, now, job_id, QUEUED, RUNNING),
+            )
+        return self.get(job_id)
+
+    def result_ranges(
+        self, job_id: str, offset: int, limit: int
+    ) -> List[Tuple[int, int]]:
+        """(offset, length) in the results file of finished images, in upload order"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT result_offset, result_length FROM job_items "
+                "WHERE job_id = ? AND done = 1 ORDER BY position LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [(row["result_offset"], row["result_length"]) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["jobs"] for row in rows}
+
+
+class JobOutput:
+    """Result files of one job, rolled back to its last checkpoint on open"""
+
+    def __init__(self, directory: str, job: Job):
+        self.directory = directory
+        self.parquet = bool(job.params.get("parquet"))
+        self.columnar = job.params.get("format") == "columnar"
+        self.parquet_parts = job.parquet_parts
+        os.makedirs(directory, exist_ok=True)
+
+        self.results_path = os.path.join(directory, RESULTS_FILE)
+        self._file = open(self.results_path, "ab")
+        self._file.truncate(job.output_bytes)
+        self._file.seek(job.output_bytes)
+
+        if self.parquet:
+            if pyarrow is None:
+                raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+            os.makedirs(os.path.join(directory, "parquet"), exist_ok=True)
+            for name in os.listdir(os.path.join(directory, "parquet")):
+                if name.endswith(".parquet") and int(name[5:11]) >= self.parquet_parts:
+                    os.remove(os.path.join(directory, "parquet", name))
+
+    def close(self):
+        self._file.close()
+
+    def write(self, records: List[Dict[str, Any]]) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Append a batch of records and flush them to disk
+
+        Returns:
+            Tuple of ((offset, length) per record, results file size)
+        """
+        ranges = []
+        for record in records:
+            line = json_dumps(record) + b"\n"
+            ranges.append((self._file.tell(), len(line)))
+            self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        if self.parquet:
+            self._write_parquet(records)
+        return ranges, self._file.tell()
+
+    def _parquet_schema(self):
+        fields = [
+            ("position", pyarrow.int64()),
+            ("filename", pyarrow.string()),
+            ("success", pyarrow.bool_()),
+            ("error", pyarrow.string()),
+            ("width", pyarrow.int64()),
+            ("height", pyarrow.int64()),
+            (
+                ("class_ids", pyarrow.list_(pyarrow.int64()))
+                if self.columnar
+                else ("classes", pyarrow.list_(pyarrow.string()))
+            ),
+            ("scores", pyarrow.list_(pyarrow.float64())),
+            ("boxes", pyarrow.list_(pyarrow.float64())),
+        ]
+        return pyarrow.schema(fields)
+
+    def _write_parquet(self, records: List[Dict[str, Any]]):
+        """Write a batch as one Parquet part file with one row per image"""
+        columns = {
+            "position": [record["position"] for record in records],
+            "filename": [record["filename"] for record in records],
+            "success": [record["success"] for record in records],
+            "error": [record.get("error") for record in records],
+            "width": [record.get("image_size", {}).get("width") for record in records],
+            "height": [
+                record.get("image_size", {}).get("height") for record in records
+            ],
+        }
+        if self.columnar:
+            columns["class_ids"] = [record.get("class_ids", []) for record in records]
+            columns["scores"] = [record.get("scores", []) for record in records]
+            columns["boxes"] = [record.get("boxes", []) for record in records]
+        else:
+            detections = [record.get("detections", []) for record in records]
+            columns["classes"] = [[d["class"] for d in items] for items in detections]
+            columns["scores"] = [
+                [d["confidence"] for d in items] for items in detections
+            ]
+            columns["boxes"] = [
+                [
+                    value
+                    for d in items
+                    for value in (
+                        d["bbox"]["xmin"],
+                        d["bbox"]["ymin"],
+                        d["bbox"]["xmax"],
+                        d["bbox"]["ymax"],
+                    )
+                ]
+                for items in detections
+            ]
+
+        path = os.path.join(
+            self.directory, "parquet", f"part-{self.parquet_parts:06d}.parquet"
+        )
+        pyarrow.parquet.write_table(
+            pyarrow.table(columns, schema=self._parquet_schema()), path
+        )
+        self.parquet_parts += 1
+
+    @staticmethod
+    def read_ranges(path: str, ranges: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """Read records back from the results file by (offset, length)"""
+        records = []
+        with open(path, "rb") as f:
+            for offset, length in ranges:
+                f.seek(offset)
+                records.append(json.loads(f.read(length)))
+        return records
+
+
+class JobRunner:
+    """Claim jobs from the store and run them batch by batch in the background"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        jobs_dir: str,
+        process_batch: Callable[[Job, List[JobItem]], Awaitable[List[Dict[str, Any]]]],
+        batch_size: int = 8,
+        lease_seconds: float = 60.0,
+        poll_seconds: float = 5.0,
+    ):
+        """
+        Args:
+            store: Job database
+            jobs_dir: Directory holding each job's uploads and results
+            process_batch: Coroutine returning one result record per item, in order
+            batch_size: Images per batch (and per checkpoint)
+            lease_seconds: How long a claimed job stays reserved without renewal
+            poll_seconds: How often to look for jobs queued by other processes
+        """
+        self.store = store
+        self.jobs_dir = jobs_dir
+        self.process_batch = process_batch
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.current_job: Optional[str] = None
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def results_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir(job_id), RESULTS_FILE)
+
+    def inputs_dir(self, job_id: str) -> str:
+        """Where images uploaded with a job are kept until it ends"""
+        return os.path.join(self.job_dir(job_id), INPUTS_DIR)
+
+    def remove_inputs(self, job_id: str):
+        """Delete a finished job's uploaded images (directory jobs have none)"""
+        shutil.rmtree(self.inputs_dir(job_id), ignore_errors=True)
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop after the current batch's checkpoint; the job resumes on restart"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Look for new work now instead of at the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @staticmethod
+    async def _blocking(function: Callable, *args) -> Any:
+        """Run a store or file call in a thread"""
+        # SQLite may wait up to its busy timeout for another process's write lock
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def _run(self):
+        while True:
+            job = await self._blocking(self.store.claim, self.owner, self.lease_seconds)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.current_job = job.id
+            try:
+                await self._run_job(job)
+            except LeaseLostError as e:
+                logger.warning(str(e))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                await self._blocking(
+                    self.store.finish, job.id, self.owner, FAILED, str(e)
+                )
+                await self._blocking(self.remove_inputs, job.id)
+            finally:
+                self.current_job = None
+
+    async def _renew_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._blocking(
+                self.store.renew, job_id, self.owner, self.lease_seconds
+            )
+
+    async def _run_job(self, job: Job):
+        action = "Resuming" if job.processed else "Starting"
+        logger.info(f"{action} job {job.id} at {job.processed}/{job.total} images")
+        output = await self._blocking(JobOutput, self.job_dir(job.id), job)
+        renewer = asyncio.create_task(self._renew_lease(job.id))
+        committing = None
+
+        try:
+            while True:
+                if not await self._blocking(
+                    self.store.renew, job.id, self.owner, self.lease_seconds
+                ):
+                    stopped = await self._blocking(self.store.get, job.id)
+                    logger.info(f"Job {job.id} stopped ({stopped.status})")
+                    if stopped.status == CANCELLED:
+                        await self._blocking(self.remove_inputs, job.id)
+                    return
+
+                items = await self._blocking(
+                    self.store.pending_items, job.id, self.batch_size
+                )
+                if not items:
+                    await self._blocking(
+                        self.store.finish, job.id, self.owner, COMPLETED
+                    )
+                    await self._blocking(self.remove_inputs, job.id)
+                    logger.info(f"Job {job.id} completed")
+                    return
+
+                records = await self.process_batch(job, items)
+                for item, record in zip(items, records):
+                    record["position"] = item.position
+
+                def commit():
+                    ranges, output_bytes = output.write(records)
+                    self.store.checkpoint(
+                        job.id,
+                        self.owner,
+                        [
+                            (item.position, record["success"], offset, length)
+                            for item, record, (offset, length) in zip(
+                                items, records, ranges
+                            )
+                        ],
+                        output_bytes,
+                        output.parquet_parts,
+                    )
+
+                # Writing and committing run to completion even if the runner
+                # is being stopped, so the checkpoint matches the files
+                committing = asyncio.get_running_loop().run_in_executor(None, commit)
+                await asyncio.shield(committing)
+        finally:
+            renewer.cancel()
+            if committing is not None and not committing.done():
+                await asyncio.wait([committing])
+            await self._blocking(output.close)
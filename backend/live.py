@@ -0,0 +1,84 @@
+"""Latest-frame-wins buffering for live detection streams"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class LiveFrame:
+    """An encoded frame received over a live connection"""
+
+    index: int  # Position in the stream, counting dropped frames
+    data: bytes
+    received_at: float  # time.perf_counter() when it arrived
+
+
+class LatestFrameSlot:
+    """Single-frame mailbox where a newer frame replaces an unprocessed one"""
+
+    def __init__(self):
+        self._frame: Optional[LiveFrame] = None
+        self._closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, frame: LiveFrame) -> Optional[LiveFrame]:
+        """Store a frame, returning the unprocessed frame it replaced (if any)"""
+        replaced, self._frame = self._frame, frame
+        self._ready.set()
+        return replaced
+
+    def close(self):
+        """Wake the consumer once the remaining frame (if any) has been taken"""
+        self._closed = True
+        self._ready.set()
+
+    async def get(self) -> Optional[LiveFrame]:
+        """Wait for the newest frame; None once closed and empty"""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class LiveStats:
+    """Throughput, drop and latency counters for one connection"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+
+    def record(self, latency: float):
+        self.processed += 1
+        self.total_latency += latency
+        self.last_latency = latency
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "frames_received": self.received,
+            "frames_processed": self.processed,
+            "frames_dropped": self.dropped,
+            "frames_failed": self.failed,
+            "processed_fps": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "drop_rate": (
+                round(self.dropped / self.received, 4) if self.received else 0.0
+            ),
+            "avg_latency_ms": (
+                round(self.total_latency / self.processed * 1000.0, 1)
+                if self.processed
+                else None
+            ),
+            "last_latency_ms": (
+                round(self.last_latency * 1000.0, 1) if self.processed else None
+            ),
+        }
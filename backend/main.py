@@ -1,15 +1,106 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import asyncio
+import collections
+import logging
+import math
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from profiling import PROFILE_MODES, ProfileSampler
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from fastapi import (
+    FastAPI,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+    WebSocketException,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from transformers import DetrForObjectDetection, DetrImageProcessor
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from PIL import Image
-import torch
-import numpy as np
-import io
-import base64
-import os
-from typing import List, Dict, Any
-import logging
+from transformers import (
+    AutoImageProcessor,
+    AutoModelForObjectDetection,
+    DetrForObjectDetection,
+    DetrImageProcessor,
+)
+
+from backends import (
+    OnnxDetrModel,
+    TorchScriptDetrModel,
+    apply_precision,
+    bf16_supported,
+    precision_context,
+)
+from batching import MicroBatcher, QueueFullError
+from cache import DetectionCache
+from imaging import (
+    ImageTooLargeError,
+    decode_image,
+    decode_image_file,
+    encode_preview,
+    read_image_size,
+    reduce_for_inference,
+)
+from jobs import (
+    CANCELLED,
+    Job,
+    JobItem,
+    JobNotFoundError,
+    JobOutput,
+    JobRunner,
+    JobStore,
+    is_within,
+    parquet_available,
+    scan_directory,
+)
+from live import LatestFrameSlot, LiveFrame, LiveStats
+from metrics import (
+    MetricsRegistry,
+    RequestMetrics,
+    RequestMetricsMiddleware,
+    StageTimer,
+)
+from preprocessing import (
+    NPY_MAX_HEADER_BYTES,
+    RawFrameError,
+    frames_from_buffer,
+    frames_from_npy,
+    parse_frame_shape,
+    preprocess,
+    preprocess_frames,
+)
+from registry import Detector, ModelRegistry, UnknownModelError, classes_from_config
+from serialization import FastJSONResponse, json_dumps
+from store import DetectionStore, SearchQuery, StoredResult
+from streaming import (
+    BodyStreamingResponse,
+    MultipartError,
+    UploadLimitError,
+    UploadSpool,
+    encode_ndjson,
+    encode_sse,
+    iter_multipart_files,
+)
+from tiling import decode_for_tiling, merge_detections, plan_tiles
+from tuning import TuningProfile, apply_thread_settings, host_signature, load_profile
+from video import (
+    DuplicateFilter,
+    VideoDecodeError,
+    iter_video_frames,
+    iter_zip_frames,
+    next_frame_batch,
+    sample_frames,
+)
+from workers import InFlightLimiter, ServerBusyError, create_executor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,254 +121,2744 @@ app.add_middleware(
 model = None
 processor = None
 cache_dir = "./models"
+MODEL_ID = "facebook/detr-resnet-50"
+
+# Model loading. MODEL_PATH points at a local model directory; otherwise the
+# MODEL_REVISION snapshot (a branch, tag or commit hash) is looked up directly
+# in the Hugging Face cache under cache_dir. If it is missing the model is
+# downloaded, unless MODEL_OFFLINE=1, in which case startup fails.
+MODEL_PATH = os.getenv("MODEL_PATH") or None
+MODEL_REVISION = os.getenv("MODEL_REVISION", "main")
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "0") == "1"
+
+# Image sizes (WIDTHxHEIGHT, comma-separated) run through the model once
+# before /ready reports ready, so the first requests don't pay for lazy
+# initialization. Empty disables warm-up.
+WARMUP_IMAGE_SIZES = os.getenv("WARMUP_IMAGE_SIZES", "640x480,480x640")
+
+# Startup progress, reported by /ready and /health
+startup_status = {
+    "status": "starting",
+    "error": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "cold_start_seconds": None,
+}
+startup_task = None
+
+# Inference backend: "pytorch" (eager), or a model exported with
+# scripts/export_model.py served by ONNX Runtime ("onnx") or TorchScript
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+ONNX_MODEL_PATH = os.getenv(
+    "ONNX_MODEL_PATH", os.path.join(cache_dir, "detr-resnet-50.onnx")
+)
+TORCHSCRIPT_MODEL_PATH = os.getenv(
+    "TORCHSCRIPT_MODEL_PATH", os.path.join(cache_dir, "detr-resnet-50.torchscript.pt")
+)
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+
+# Numeric precision of the eager PyTorch backend: "fp32", "int8" (dynamic
+# quantization of Linear layers) or "bf16" (bfloat16 autocast). Compare modes
+# with scripts/evaluate_precision.py before switching.
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")
+
+# Identifies the model variant producing results, for cache keys
+MODEL_VARIANT = f"{MODEL_ID}:{INFERENCE_BACKEND}:{MODEL_PRECISION}"
+
+# Additional models a request can pick with ?model=NAME, as comma-separated
+# NAME=SOURCE pairs; SOURCE is a Hugging Face model id (optionally @revision,
+# loaded from cache_dir) or a local directory. They load with PyTorch (at
+# MODEL_PRECISION) on first use, or at startup when listed in MODEL_PRELOAD,
+# and the least recently used are unloaded when the loaded models' weights
+# exceed MODEL_MEMORY_BUDGET_MB. The default model (MODEL_ID, served as
+# DEFAULT_MODEL) is always loaded.
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "detr-resnet-50")
+EXTRA_MODELS = dict(
+    item.strip().split("=", 1)
+    for item in os.getenv("MODELS", "").split(",")
+    if item.strip()
+)
+MODEL_PRELOAD = [
+    name.strip() for name in os.getenv("MODEL_PRELOAD", "").split(",") if name.strip()
+]
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "2048"))
+
+# Default inference resolution. Images are resized so the shortest edge is
+# INFERENCE_SHORTEST_EDGE without the longest exceeding INFERENCE_LONGEST_EDGE;
+# requests can override both with shortest_edge / max_size.
+INFERENCE_SHORTEST_EDGE = int(os.getenv("INFERENCE_SHORTEST_EDGE", "800"))
+INFERENCE_LONGEST_EDGE = int(os.getenv("INFERENCE_LONGEST_EDGE", "1333"))
+
+# Upload limits, checked before anything is decoded: bytes per uploaded
+# image (413 when exceeded) and pixels per image or video frame, read from
+# the header, so a few huge or decompression-bomb images can't exhaust
+# worker memory. 0 disables a limit.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "50000000"))
+
+# /detect-batch/stream keeps images it has received but not yet processed in
+# memory up to this many bytes per request, then in temporary files. Bodies
+# larger than STREAM_MAX_BODY_BYTES or with more than STREAM_MAX_FILES images
+# are rejected (0 disables a limit).
+STREAM_SPOOL_MEMORY_BYTES = int(
+    os.getenv("STREAM_SPOOL_MEMORY_BYTES", str(16 * 1024 * 1024))
+)
+STREAM_MAX_BODY_BYTES = int(os.getenv("STREAM_MAX_BODY_BYTES", str(1024 * 1024 * 1024)))
+STREAM_MAX_FILES = int(os.getenv("STREAM_MAX_FILES", "10000"))
+
+# Building model inputs: "torch" resizes in PIL and normalizes into one
+# preallocated batch tensor; "processor" uses the Hugging Face processor
+PREPROCESSING = os.getenv("PREPROCESSING", "torch")
+
+# Maximum number of images sent through the model in a single forward pass
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+
+# Settings measured by scripts/autotune.py on this host type: torch intra-op
+# and inter-op threads and MAX_BATCH_SIZE, applied by load_models() (serve.py
+# also takes its worker count from it). Settings given explicitly (here or
+# on the serve.py command line) win; TUNING_PROFILE= (empty) ignores the file.
+TUNING_PROFILE = os.getenv("TUNING_PROFILE", os.path.join(cache_dir, "autotune.json"))
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+tuning_profile = None
+
+# Micro-batching of concurrent /detect requests
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "64"))
+batcher = None
+
+# Worker pools for CPU-bound stages. Decoding and encoding run in WORKER_POOL
+# ("thread" or "process"); model forward passes run one at a time on a
+# dedicated thread so torch can use its own intra-op threads.
+WORKER_POOL = os.getenv("WORKER_POOL", "thread")
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+worker_pool = None
+inference_pool = None
 
-# COCO class names
+# Images allowed in flight before new requests are rejected with 503
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "32"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+limiter = InFlightLimiter(MAX_IN_FLIGHT)
+
+# Tiled inference (/detect?tiling=true) for very large images: square tiles
+# of TILE_SIZE pixels overlapping by TILE_OVERLAP (fraction of the tile),
+# merged with class-aware NMS at TILE_NMS_IOU. Images needing more than
+# TILE_MAX_TILES tiles are decoded at reduced scale. With
+# TILE_INCLUDE_FULL_IMAGE=1 the whole image is also run once, so objects
+# larger than a tile are not only seen in fragments.
+TILE_SIZE = int(os.getenv("TILE_SIZE", "800"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "64"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+TILE_INCLUDE_FULL_IMAGE = os.getenv("TILE_INCLUDE_FULL_IMAGE", "1") == "1"
+
+# /detect-video: sampled frames whose perceptual hash differs from the last
+# frame run through the model by at most VIDEO_DEDUP_DISTANCE bits (of 64)
+# reuse its detections (-1 disables). Batches hold at most
+# VIDEO_MAX_BATCH_FRAMES frames, so static scenes still stream steadily.
+VIDEO_DEDUP_DISTANCE = int(os.getenv("VIDEO_DEDUP_DISTANCE", "4"))
+VIDEO_MAX_BATCH_FRAMES = int(os.getenv("VIDEO_MAX_BATCH_FRAMES", "64"))
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+# /detect-raw accepts raw pixels as application/octet-stream or .npy files
+NPY_CONTENT_TYPES = {"application/x-npy", "application/npy"}
+
+# Longest side of previews generated for return_image when the upload
+# can't be echoed back unchanged
+PREVIEW_MAX_SIDE = int(os.getenv("PREVIEW_MAX_SIDE", "1024"))
+
+# Cache of raw (unfiltered) detection results keyed on the uploaded bytes
+result_cache = DetectionCache(
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", "3600")),
+    disk_dir=os.getenv("CACHE_DISK_DIR") or None,
+    disk_max_bytes=int(os.getenv("CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))),
+)
+
+# Prometheus metrics, served at /metrics. Detection requests record the time
+# spent in each stage; with SERVER_TIMING=1 the stages are also returned in a
+# Server-Timing response header.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+metrics = MetricsRegistry()
+request_metrics = RequestMetrics(metrics, "detection")
+model_batch_size = metrics.histogram(
+    "detection_model_batch_size",
+    "Images per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+metrics.gauge(
+    "detection_in_flight_images",
+    "Images admitted and not yet finished",
+    function=lambda: limiter.in_flight,
+)
+metrics.gauge(
+    "detection_batch_queue_depth",
+    "Requests waiting for the micro-batcher",
+    function=lambda: batcher.stats()["queue_depth"] if batcher is not None else 0,
+)
+metrics.gauge(
+    "model_ready",
+    "1 once the model is loaded and warmed up",
+    function=lambda: int(startup_status["status"] == "ready"),
+)
+metrics.gauge(
+    "model_load_seconds",
+    "Time taken to load the model",
+    function=lambda: startup_status["load_seconds"],
+)
+metrics.gauge(
+    "model_warmup_seconds",
+    "Time taken to warm up the model",
+    function=lambda: startup_status["warmup_seconds"],
+)
+metrics.gauge(
+    "models_loaded",
+    "Models currently loaded",
+    function=lambda: len(registry.loaded_names()),
+)
+metrics.gauge(
+    "models_memory_bytes",
+    "Weight bytes of the loaded models",
+    function=lambda: registry.stats()["memory_bytes"],
+)
+metrics.gauge(
+    "model_evictions",
+    "Models unloaded to stay within the memory budget",
+    function=lambda: registry.evictions,
+)
+metrics.gauge(
+    "cold_start_seconds",
+    "Time from startup until ready",
+    function=lambda: startup_status["cold_start_seconds"],
+)
+live_connections = metrics.gauge("live_connections", "Open /ws/detect connections")
+live_frames = metrics.counter(
+    "live_frames_total",
+    "Frames received over /ws/detect by outcome (processed, dropped, failed)",
+    ["outcome"],
+)
+live_latency = metrics.histogram(
+    "live_frame_latency_seconds",
+    "Time from receiving a /ws/detect frame to sending its result",
+)
+metrics.gauge(
+    "result_store_queue_depth",
+    "Detection results waiting to be written to the result store",
+    function=lambda: (
+        result_store.stats()["queue_depth"] if result_store is not None else 0
+    ),
+)
+metrics.gauge(
+    "result_store_dropped",
+    "Detection results not stored because the write queue was full",
+    function=lambda: result_store.dropped if result_store is not None else 0,
+)
+app.add_middleware(
+    RequestMetricsMiddleware,
+    metrics=request_metrics,
+    paths=[
+        "/detect",
+        "/detect-batch",
+        "/detect-batch/stream",
+        "/detect-video",
+        "/detect-raw",
+    ],
+    server_timing=SERVER_TIMING,
+)
+
+# Sampled profiling: one in PROFILE_EVERY_N detection requests (0 disables)
+# has its model stages profiled with PROFILE_MODE ("cprofile" or "torch"),
+# writing to PROFILE_DIR. With PROFILING_CONTROL=1 the rate and mode can be
+# changed at runtime through /debug/profiling.
+profiler = ProfileSampler(
+    every_n=int(os.getenv("PROFILE_EVERY_N", "0")),
+    mode=os.getenv("PROFILE_MODE", "cprofile"),
+    output_dir=os.getenv("PROFILE_DIR", "./profiles"),
+    keep=int(os.getenv("PROFILE_KEEP", "20")),
+)
+PROFILING_CONTROL = os.getenv("PROFILING_CONTROL", "0") == "1"
+
+# Bulk detection jobs (/jobs): job state, uploads and results live under
+# JOBS_DIR (empty disables jobs), with progress checkpointed to
+# JOBS_DIR/jobs.sqlite3 so jobs resume after a restart. Directory jobs may only
+# read below one of the comma-separated JOBS_INPUT_ROOTS (unset disables them).
+# A job whose server stops renewing its lease for JOB_LEASE_SECONDS is taken
+# over by another.
+JOBS_DIR = os.getenv("JOBS_DIR", "")
+JOBS_INPUT_ROOTS = [
+    root.strip()
+    for root in os.getenv("JOBS_INPUT_ROOTS", "").split(",")
+    if root.strip()
+]
+JOB_MAX_IMAGES = int(os.getenv("JOB_MAX_IMAGES", "100000"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+job_store = None
+job_runner = None
+
+# Searchable store of detection results (/search): fresh results from
+# /detect, /detect-batch and bulk jobs are written to the SQLite database at
+# RESULT_STORE_PATH (empty disables it) in the background, keeping only
+# detections scoring at least RESULT_STORE_MIN_SCORE. Results are dropped
+# rather than slowing requests down if RESULT_STORE_QUEUE_SIZE are waiting.
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "")
+RESULT_STORE_MIN_SCORE = float(os.getenv("RESULT_STORE_MIN_SCORE", "0.3"))
+RESULT_STORE_QUEUE_SIZE = int(os.getenv("RESULT_STORE_QUEUE_SIZE", "10000"))
+SEARCH_MAX_LIMIT = 1000
+result_store = None
+
+# COCO class names, for models whose config has no label map (such as
+# exported ONNX/TorchScript models)
 COCO_CLASSES = [
-    'N/A', 'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus',
-    'train', 'truck', 'boat', 'traffic light', 'fire hydrant', 'N/A',
-    'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog', 'horse',
-    'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'N/A', 'backpack',
-    'umbrella', 'N/A', 'N/A', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis',
-    'snowboard', 'sports ball', 'kite', 'baseball bat', 'baseball glove',
-    'skateboard', 'surfboard', 'tennis racket', 'bottle', 'N/A', 'wine glass',
-    'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich',
-    'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake',
-    'chair', 'couch', 'potted plant', 'bed', 'N/A', 'dining table', 'N/A',
-    'N/A', 'toilet', 'N/A', 'tv', 'laptop', 'mouse', 'remote', 'keyboard',
-    'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator',
-    'N/A', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
-    'toothbrush'
+    "N/A",
+    "person",
+    "bicycle",
+    "car",
+    "motorcycle",
+    "airplane",
+    "bus",
+    "train",
+    "truck",
+    "boat",
+    "traffic light",
+    "fire hydrant",
+    "N/A",
+    "stop sign",
+    "parking meter",
+    "bench",
+    "bird",
+    "cat",
+    "dog",
+    "horse",
+    "sheep",
+    "cow",
+    "elephant",
+    "bear",
+    "zebra",
+    "giraffe",
+    "N/A",
+    "backpack",
+    "umbrella",
+    "N/A",
+    "N/A",
+    "handbag",
+    "tie",
+    "suitcase",
+    "frisbee",
+    "skis",
+    "snowboard",
+    "sports ball",
+    "kite",
+    "baseball bat",
+    "baseball glove",
+    "skateboard",
+    "surfboard",
+    "tennis racket",
+    "bottle",
+    "N/A",
+    "wine glass",
+    "cup",
+    "fork",
+    "knife",
+    "spoon",
+    "bowl",
+    "banana",
+    "apple",
+    "sandwich",
+    "orange",
+    "broccoli",
+    "carrot",
+    "hot dog",
+    "pizza",
+    "donut",
+    "cake",
+    "chair",
+    "couch",
+    "potted plant",
+    "bed",
+    "N/A",
+    "dining table",
+    "N/A",
+    "N/A",
+    "toilet",
+    "N/A",
+    "tv",
+    "laptop",
+    "mouse",
+    "remote",
+    "keyboard",
+    "cell phone",
+    "microwave",
+    "oven",
+    "toaster",
+    "sink",
+    "refrigerator",
+    "N/A",
+    "book",
+    "clock",
+    "vase",
+    "scissors",
+    "teddy bear",
+    "hair drier",
+    "toothbrush",
 ]
 
+
+def resolve_model_path(model_id: str = None, revision: str = None):
+    """
+    Find a model snapshot on disk without touching the network
+
+    Args:
+        model_id: Hugging Face model id (default: MODEL_ID, or MODEL_PATH if set)
+        revision: Branch, tag or commit hash (default: MODEL_REVISION)
+
+    Returns:
+        MODEL_PATH, the cached snapshot directory, or None if that snapshot
+        is not cached
+    """
+    if model_id is None:
+        if MODEL_PATH:
+            return MODEL_PATH
+        model_id, revision = MODEL_ID, MODEL_REVISION
+
+    repo_dir = os.path.join(cache_dir, "models--" + model_id.replace("/", "--"))
+    revision = revision or "main"
+    ref_path = os.path.join(repo_dir, "refs", revision)
+    if os.path.isfile(ref_path):
+        with open(ref_path) as f:
+            revision = f.read().strip()
+
+    snapshot_dir = os.path.join(repo_dir, "snapshots", revision)
+    return snapshot_dir if os.path.isdir(snapshot_dir) else None
+
+
+def load_pretrained(
+    cls, model_path, model_id: str = MODEL_ID, revision: str = MODEL_REVISION
+):
+    """Load a pretrained model or processor from the cache or its pinned revision"""
+    if model_path is not None:
+        return cls.from_pretrained(model_path)
+
+    if MODEL_OFFLINE:
+        raise RuntimeError(
+            f"{model_id}@{revision} is not cached in {cache_dir} and MODEL_OFFLINE=1; "
+            "run scripts/download_models.py first"
+        )
+
+    logger.info(f"{model_id}@{revision} not cached, downloading...")
+    return cls.from_pretrained(model_id, revision=revision, cache_dir=cache_dir)
+
+
+def load_inference_model(model_path):
+    """Load the model for the configured INFERENCE_BACKEND"""
+    if INFERENCE_BACKEND == "pytorch":
+        return load_pretrained(DetrForObjectDetection, model_path)
+    if INFERENCE_BACKEND == "onnx":
+        return OnnxDetrModel(
+            ONNX_MODEL_PATH,
+            intra_op_threads=ORT_INTRA_OP_THREADS,
+            inter_op_threads=ORT_INTER_OP_THREADS,
+        )
+    if INFERENCE_BACKEND == "torchscript":
+        return TorchScriptDetrModel(TORCHSCRIPT_MODEL_PATH)
+    raise ValueError(
+        f"Unknown INFERENCE_BACKEND {INFERENCE_BACKEND!r} "
+        "(expected pytorch, onnx or torchscript)"
+    )
+
+
+def read_tuning_profile() -> Optional[TuningProfile]:
+    """The TUNING_PROFILE entry measured on this host type, if there is one"""
+    if not TUNING_PROFILE:
+        return None
+    return load_profile(
+        TUNING_PROFILE, host_signature(INFERENCE_BACKEND, MODEL_PRECISION)
+    )
+
+
+def apply_tuning_profile():
+    """Use the thread counts and batch size measured on this host type"""
+    global tuning_profile, MAX_BATCH_SIZE
+    tuning_profile = read_tuning_profile()
+    apply_thread_settings(
+        TORCH_THREADS or (tuning_profile.torch_threads if tuning_profile else 0),
+        TORCH_INTEROP_THREADS
+        or (tuning_profile.interop_threads if tuning_profile else 0),
+    )
+    if tuning_profile is None:
+        return
+
+    if "MAX_BATCH_SIZE" not in os.environ:
+        MAX_BATCH_SIZE = tuning_profile.batch_size
+        if batcher is not None:
+            batcher.max_batch_size = MAX_BATCH_SIZE
+        if job_runner is not None:
+            job_runner.batch_size = MAX_BATCH_SIZE
+    logger.info(
+        f"Using tuning profile from {tuning_profile.tuned_at}: "
+        f"{torch.get_num_threads()} torch thread(s), batch size {MAX_BATCH_SIZE} "
+        f"({tuning_profile.images_per_second:.1f} images/s measured)"
+    )
+
+
 def load_models():
     """Load DETR model and processor"""
     global model, processor
-    
+
     try:
-        logger.info("Loading DETR model and processor...")
+        apply_tuning_profile()
+        logger.info(
+            f"Loading DETR model ({INFERENCE_BACKEND} backend) and processor..."
+        )
         os.makedirs(cache_dir, exist_ok=True)
-        
-        # Try to load from cache first
-        if os.path.exists(cache_dir) and os.listdir(cache_dir):
-            try:
-                model = DetrForObjectDetection.from_pretrained(
-                    "facebook/detr-resnet-50",
-                    cache_dir=cache_dir,
-                    local_files_only=True
+
+        model_path = resolve_model_path()
+        processor = load_pretrained(DetrImageProcessor, model_path)
+        model = load_inference_model(model_path)
+
+        model.eval()
+
+        if MODEL_PRECISION != "fp32":
+            if INFERENCE_BACKEND != "pytorch":
+                raise ValueError(
+                    f"MODEL_PRECISION={MODEL_PRECISION} is only supported with "
+                    "INFERENCE_BACKEND=pytorch"
+                )
+            if MODEL_PRECISION == "bf16" and not bf16_supported():
+                logger.warning(
+                    "This CPU has no native bfloat16 support; "
+                    "bf16 inference may be slower than fp32"
                 )
-                processor = DetrImageProcessor.from_pretrained(
-                    "facebook/detr-resnet-50",
-                    cache_dir=cache_dir,
-                    local_files_only=True
+            model = apply_precision(model, MODEL_PRECISION)
+            logger.info(f"Using {MODEL_PRECISION} precision")
+
+        logger.info("Models loaded successfully!")
+
+    except Exception as e:
+        logger.error(f"Error loading models: {e}")
+        raise e
+
+
+def make_detector(
+    name: str, detection_model, image_processor, variant: str
+) -> Detector:
+    """Wrap a loaded model for the registry, with class names from its config"""
+    return Detector(
+        name=name,
+        model=detection_model,
+        processor=image_processor,
+        classes=classes_from_config(
+            getattr(detection_model, "config", None), COCO_CLASSES
+        ),
+        variant=variant,
+    )
+
+
+def load_detector(name: str, source: str) -> Detector:
+    """
+    Load and warm up an additional model for the registry
+
+    Args:
+        name: Name requests use for the model
+        source: Hugging Face model id (optionally @revision) or local directory
+    """
+    if name == DEFAULT_MODEL:
+        # load_models() loads the default model; callers that ask the
+        # registry for it by name before default_detector() registered it
+        # get the same entry
+        if model is None:
+            raise RuntimeError(f"The default model {name} is not loaded yet")
+        return default_detector()
+
+    if os.path.isdir(source):
+        model_path, model_id, revision = source, source, None
+    else:
+        model_id, _, revision = source.partition("@")
+        revision = revision or "main"
+        model_path = resolve_model_path(model_id, revision)
+
+    logger.info(f"Loading model {name} ({source})...")
+    image_processor = load_pretrained(
+        AutoImageProcessor, model_path, model_id, revision
+    )
+    detection_model = load_pretrained(
+        AutoModelForObjectDetection, model_path, model_id, revision
+    ).eval()
+    if MODEL_PRECISION != "fp32":
+        detection_model = apply_precision(detection_model, MODEL_PRECISION)
+
+    detector = make_detector(
+        name, detection_model, image_processor, f"{source}:pytorch:{MODEL_PRECISION}"
+    )
+    warm_up(detector)
+    return detector
+
+
+registry = ModelRegistry(
+    {DEFAULT_MODEL: MODEL_PATH or MODEL_ID, **EXTRA_MODELS},
+    DEFAULT_MODEL,
+    load_detector,
+    memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+)
+
+
+def default_detector() -> Detector:
+    """The default model's registry entry, kept in step with load_models()"""
+    detector = registry.loaded(DEFAULT_MODEL)
+    if detector is None or detector.model is not model:
+        detector = registry.register(
+            make_detector(DEFAULT_MODEL, model, processor, MODEL_VARIANT)
+        )
+    return detector
+
+
+@dataclass
+class InferenceRequest:
+    """A decoded image queued for the model"""
+
+    image: Image.Image
+    original_size: Tuple[int, int]  # (width, height) before any decode-time downscaling
+    resolution: Tuple[int, int]  # (shortest_edge, longest_edge)
+    timer: Optional[StageTimer] = None
+    detector: Optional[Detector] = None  # Default model when None
+
+
+def resolve_resolution(
+    shortest_edge: int = None, max_size: int = None
+) -> Tuple[int, int]:
+    """Combine per-request resolution overrides with the server defaults"""
+    resolution = (
+        shortest_edge or INFERENCE_SHORTEST_EDGE,
+        max_size or INFERENCE_LONGEST_EDGE,
+    )
+    if resolution[0] > resolution[1]:
+        raise HTTPException(
+            status_code=400, detail="shortest_edge must not be larger than max_size"
+        )
+    return resolution
+
+
+def cache_variant(
+    resolution: Tuple[int, int],
+    tiling: Tuple[int, float] = None,
+    detector: Detector = None,
+) -> str:
+    """Identify the model variant, resolution and tiling of a result, for cache keys"""
+    variant = (
+        f"{(detector or default_detector()).variant}@{resolution[0]}x{resolution[1]}"
+    )
+    if tiling is not None:
+        variant += (
+            f":tiles={tiling[0]}/{tiling[1]}/{TILE_MAX_TILES}/{TILE_NMS_IOU}"
+            f"/{int(TILE_INCLUDE_FULL_IMAGE)}"
+        )
+    return variant
+
+
+def preprocess_images(
+    images: List[Image.Image], resolution: Tuple[int, int], detector: Detector
+) -> Dict[str, torch.Tensor]:
+    """Build pixel_values and pixel_mask for a batch of RGB images"""
+    image_processor = detector.processor
+    if PREPROCESSING == "processor":
+        size = {"shortest_edge": resolution[0], "longest_edge": resolution[1]}
+        return image_processor(images=images, size=size, return_tensors="pt")
+    return preprocess(
+        images,
+        resolution,
+        image_processor.image_mean,
+        image_processor.image_std,
+        image_processor.resample,
+    )
+
+
+def run_inference(
+    images: List[Image.Image],
+    original_sizes: List[Tuple[int, int]] = None,
+    resolution: Tuple[int, int] = None,
+    timer: StageTimer = None,
+    detector: Detector = None,
+) -> List[Dict[str, torch.Tensor]]:
+    """
+    Run DETR over a list of images in mini-batches
+
+    Args:
+        images: RGB images to run through the model
+        original_sizes: (width, height) to map boxes back to, if images were
+            decoded at reduced scale (defaults to each image's size)
+        resolution: Processor (shortest_edge, longest_edge) (default: server setting)
+        timer: Records preprocess, forward and postprocess times
+        detector: Model to run (default: the default model)
+
+    Returns:
+        One raw result dict (scores, labels, boxes) per image
+    """
+    if timer is None:
+        timer = StageTimer()
+    detector = detector or default_detector()
+    if original_sizes is None:
+        original_sizes = [image.size for image in images]
+    resolution = resolution or resolve_resolution()
+
+    results = []
+
+    for start in range(0, len(images), MAX_BATCH_SIZE):
+        chunk = images[start : start + MAX_BATCH_SIZE]
+
+        with timer.stage("preprocess"):
+            inputs = preprocess_images(chunk, resolution, detector)
+
+        results.extend(
+            run_model(
+                inputs, original_sizes[start : start + MAX_BATCH_SIZE], timer, detector
+            )
+        )
+
+    return results
+
+
+def run_model(
+    inputs: Dict[str, torch.Tensor],
+    original_sizes: List[Tuple[int, int]],
+    timer: StageTimer = None,
+    detector: Detector = None,
+) -> List[Dict[str, torch.Tensor]]:
+    """
+    Run the model on preprocessed inputs and post-process the outputs
+
+    Args:
+        inputs: pixel_values and pixel_mask for one batch
+        original_sizes: (width, height) to map each image's boxes back to
+        timer: Records forward and postprocess times
+        detector: Model to run (default: the default model)
+
+    Returns:
+        One raw result dict (scores, labels, boxes) per image, unthresholded
+    """
+    if timer is None:
+        timer = StageTimer()
+    detector = detector or default_detector()
+    model_batch_size.observe(len(original_sizes))
+
+    with timer.stage("forward"), torch.no_grad(), precision_context(MODEL_PRECISION):
+        outputs = detector.model(**inputs)
+
+    with timer.stage("postprocess"):
+        # Post-process in fp32 regardless of the precision the model ran at
+        outputs.logits = outputs.logits.float()
+        outputs.pred_boxes = outputs.pred_boxes.float()
+
+        target_sizes = torch.tensor(
+            [(height, width) for width, height in original_sizes]
+        )
+        return detector.processor.post_process_object_detection(
+            outputs, threshold=0.0, target_sizes=target_sizes
+        )
+
+
+def run_frame_inference(
+    frames: torch.Tensor,
+    resolution: Tuple[int, int],
+    timer: StageTimer = None,
+    detector: Detector = None,
+) -> List[Dict[str, torch.Tensor]]:
+    """
+    Run raw (count, height, width, 3) uint8 frames through the model
+
+    Returns:
+        One raw result dict (scores, labels, boxes) per frame
+    """
+    if timer is None:
+        timer = StageTimer()
+    detector = detector or default_detector()
+    count, height, width, _ = frames.shape
+
+    with timer.stage("preprocess"):
+        image_processor = detector.processor
+        inputs = preprocess_frames(
+            frames, resolution, image_processor.image_mean, image_processor.image_std
+        )
+
+    return run_model(inputs, [(width, height)] * count, timer, detector)
+
+
+def run_inference_requests(
+    requests: List[InferenceRequest],
+) -> List[Dict[str, torch.Tensor]]:
+    """Run queued requests, batched together per model and resolution"""
+    return run_profiled(
+        [request.timer for request in requests], "detect", run_request_groups, requests
+    )
+
+
+def run_request_groups(
+    requests: List[InferenceRequest],
+) -> List[Dict[str, torch.Tensor]]:
+    results = [None] * len(requests)
+    groups = {}
+    for index, request in enumerate(requests):
+        detector = request.detector or default_detector()
+        groups.setdefault((detector.name, request.resolution), (detector, []))[
+            1
+        ].append(index)
+
+    for (_, resolution), (detector, indices) in groups.items():
+        group_timer = StageTimer()
+        group_results = run_inference(
+            [requests[index].image for index in indices],
+            [requests[index].original_size for index in indices],
+            resolution,
+            group_timer,
+            detector,
+        )
+        for index, result in zip(indices, group_results):
+            results[index] = result
+            if requests[index].timer is not None:
+                requests[index].timer.merge(group_timer)
+
+    return results
+
+
+def run_profiled(timers: List[Optional[StageTimer]], label: str, func, *args):
+    """Call func, under the profiler if any of the requests it serves was sampled"""
+    sampled = [timer for timer in timers if timer is not None and timer.profile]
+    if not sampled:
+        return func(*args)
+
+    with profiler.profile(label) as profile:
+        result = func(*args)
+    for timer in sampled:
+        timer.profile_path = profile["path"]
+    return result
+
+
+def run_tiled_inference(
+    image: Image.Image,
+    tiles: List[Tuple[int, int, int, int]],
+    scale: float,
+    resolution: Tuple[int, int],
+    timer: StageTimer = None,
+    detector: Detector = None,
+) -> Dict[str, torch.Tensor]:
+    """
+    Run the model over overlapping tiles of an image and merge the detections
+
+    Args:
+        image: Decoded image, at the scale the tiles were planned for
+        tiles: (left, top, right, bottom) tile boxes from plan_tiles
+        scale: Decode scale relative to the original image
+        resolution: Processor (shortest_edge, longest_edge) for each tile
+        timer: Records model stage times and the "merge" stage
+        detector: Model to run (default: the default model)
+
+    Returns:
+        Raw result dict (scores, labels, boxes) in original image coordinates
+    """
+    if timer is None:
+        timer = StageTimer()
+    results = []
+    offsets = []
+
+    for start in range(0, len(tiles), MAX_BATCH_SIZE):
+        chunk = tiles[start : start + MAX_BATCH_SIZE]
+        results.extend(
+            run_inference(
+                [image.crop(box) for box in chunk],
+                resolution=resolution,
+                timer=timer,
+                detector=detector,
+            )
+        )
+        offsets.extend((left, top) for left, top, _, _ in chunk)
+
+    if TILE_INCLUDE_FULL_IMAGE and len(tiles) > 1:
+        results.extend(
+            run_inference(
+                [image], resolution=resolution, timer=timer, detector=detector
+            )
+        )
+        offsets.append((0, 0))
+
+    with timer.stage("merge"):
+        return merge_detections(results, offsets, scale, TILE_NMS_IOU)
+
+
+def parse_image_sizes(value: str) -> List[Tuple[int, int]]:
+    """Parse a comma-separated list of WIDTHxHEIGHT sizes"""
+    sizes = []
+    for item in value.split(","):
+        if item.strip():
+            width, height = item.lower().split("x")
+            sizes.append((int(width), int(height)))
+    return sizes
+
+
+def warm_up(detector: Detector = None):
+    """Run a model once per WARMUP_IMAGE_SIZES entry on a blank image"""
+    for size in parse_image_sizes(WARMUP_IMAGE_SIZES):
+        run_inference([Image.new("RGB", size)], detector=detector)
+
+
+def prepare_model():
+    """Load (unless already preloaded) and warm up the model, timing each step"""
+    if model is None:
+        start = time.perf_counter()
+        load_models()
+        startup_status["load_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_up()
+    startup_status["warmup_seconds"] = time.perf_counter() - start
+
+
+# Response formats for detection results
+RESPONSE_FORMATS = ("detailed", "columnar")
+
+
+def class_name(label: int, detector: Detector = None) -> str:
+    """Look up a model's class name for a label id (default: the default model)"""
+    return (detector or default_detector()).class_name(label)
+
+
+def filter_detections(
+    result: Dict[str, torch.Tensor], confidence_threshold: float
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Apply the confidence threshold to a raw result with a single tensor mask"""
+    keep = result["scores"] > confidence_threshold
+    return result["labels"][keep], result["scores"][keep], result["boxes"][keep]
+
+
+def format_detections(
+    result: Dict[str, torch.Tensor],
+    confidence_threshold: float,
+    detector: Detector = None,
+) -> List[Dict[str, Any]]:
+    """Filter a post-processed result by confidence into JSON-ready dicts"""
+    labels, scores, boxes = filter_detections(result, confidence_threshold)
+    detector = detector or default_detector()
+
+    return [
+        {
+            "class": detector.class_name(label),
+            "confidence": score,
+            "bbox": {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax},
+        }
+        for label, score, (xmin, ymin, xmax, ymax) in zip(
+            labels.tolist(), scores.tolist(), boxes.tolist()
+        )
+    ]
+
+
+def format_detections_columnar(
+    result: Dict[str, torch.Tensor], confidence_threshold: float
+) -> Dict[str, Any]:
+    """Filter a post-processed result into parallel arrays (boxes flattened)"""
+    labels, scores, boxes = filter_detections(result, confidence_threshold)
+    return {
+        "class_ids": labels.tolist(),
+        "scores": scores.tolist(),
+        "boxes": boxes.flatten().tolist(),
+        "total_detections": len(labels),
+    }
+
+
+def check_response_format(response_format: str):
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"format must be one of: {', '.join(RESPONSE_FORMATS)}",
+        )
+
+
+async def run_in_worker(func, *args):
+    """Run a CPU-bound function in the worker pool"""
+    return await asyncio.get_running_loop().run_in_executor(worker_pool, func, *args)
+
+
+async def run_in_inference_pool(func, *args):
+    """Run a function that uses the model on the inference thread"""
+    return await asyncio.get_running_loop().run_in_executor(inference_pool, func, *args)
+
+
+def request_timer(request: Request, sample: bool = True) -> StageTimer:
+    """The request's stage timer from the metrics middleware, sampled for profiling"""
+    timer = getattr(request.state, "timer", None) or StageTimer()
+    timer.profile = sample and profiler.sample()
+    return timer
+
+
+def upload_size_error(file: UploadFile) -> Optional[str]:
+    """Describe why an upload is too large to process, or return None"""
+    if MAX_UPLOAD_BYTES and file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        return f"File exceeds the {MAX_UPLOAD_BYTES}-byte upload limit"
+    return None
+
+
+def raw_frames_error(shape: Tuple[int, ...]) -> Optional[str]:
+    """Describe why raw frames of this shape are too large, or return None"""
+    count, height, width = (1, *shape[:2]) if len(shape) == 3 else shape[:3]
+    if count > MAX_BATCH_SIZE:
+        return f"At most {MAX_BATCH_SIZE} frames per request, got {count}"
+    if MAX_IMAGE_PIXELS and height * width > MAX_IMAGE_PIXELS:
+        return (
+            f"Frame has {height * width} pixels, "
+            f"more than the {MAX_IMAGE_PIXELS} pixel limit"
+        )
+    if MAX_UPLOAD_BYTES and height * width * 3 > MAX_UPLOAD_BYTES:
+        return f"Frame exceeds the {MAX_UPLOAD_BYTES}-byte upload limit"
+    return None
+
+
+async def read_raw_body(request: Request, max_bytes: int) -> bytearray:
+    """Read a request body into one writable buffer, rejecting bodies over max_bytes"""
+    length = request.headers.get("content-length")
+    length = int(length) if length and length.isdigit() else None
+    if max_bytes and length is not None and length > max_bytes:
+        raise HTTPException(
+            status_code=413, detail=f"Body exceeds the {max_bytes}-byte limit"
+        )
+
+    body = bytearray(length or 0)
+    position = 0
+    async for chunk in request.stream():
+        end = position + len(chunk)
+        if length is None:
+            body += chunk
+            if max_bytes and end > max_bytes:
+                raise HTTPException(
+                    status_code=413, detail=f"Body exceeds the {max_bytes}-byte limit"
                 )
-                logger.info("✅ Models loaded from local cache")
-            except:
-                logger.info("Cache not found, downloading models...")
-                model = DetrForObjectDetection.from_pretrained(
-                    "facebook/detr-resnet-50",
-                    cache_dir=cache_dir
+        elif end <= length:
+            body[position:end] = chunk
+        else:
+            raise HTTPException(
+                status_code=400, detail="Body is longer than its Content-Length"
+            )
+        position = end
+    if length is not None and position != length:
+        raise HTTPException(
+            status_code=400, detail="Body is shorter than its Content-Length"
+        )
+    return body
+
+
+async def read_upload(file: UploadFile, variant: str):
+    """
+    Get an upload ready for decoding and compute its content hash and cache key
+
+    Returns:
+        Tuple of (bytes or file to decode, cache key, content hash)
+    """
+    # Worker processes can't share the spooled file; threads decode it directly
+    if WORKER_POOL == "process":
+        contents = await file.read()
+        image_hash = DetectionCache.content_hash(contents)
+        return contents, DetectionCache.variant_key(image_hash, variant), image_hash
+    image_hash = await run_in_worker(DetectionCache.content_hash, file.file)
+    return file.file, DetectionCache.variant_key(image_hash, variant), image_hash
+
+
+def store_result(
+    source: str,
+    filename: Optional[str],
+    image_size: Tuple[int, int],
+    result: Dict[str, torch.Tensor],
+    detector: Detector,
+    image_hash: str = None,
+    path: str = None,
+):
+    """Queue a fresh detection result for the result store (if enabled)"""
+    if result_store is None:
+        return
+    result_store.add(
+        StoredResult(
+            model=detector.name,
+            classes=detector.classes,
+            source=source,
+            filename=filename,
+            image_size=image_size,
+            result=result,
+            image_hash=image_hash,
+            path=path,
+        )
+    )
+
+
+async def submit_to_batcher(
+    inference_request: InferenceRequest,
+) -> Dict[str, torch.Tensor]:
+    """Queue an image for batched inference, timing the wait as the "queue" stage"""
+    timer = inference_request.timer
+    started = time.perf_counter()
+    model_seconds = timer.total()
+    result = await batcher.submit(inference_request)
+    model_seconds = timer.total() - model_seconds
+    timer.add("queue", time.perf_counter() - started - model_seconds)
+    return result
+
+
+async def detect_upload(
+    contents: bytes,
+    filename: str,
+    content_type: str,
+    confidence_threshold: float,
+    resolution: Tuple[int, int],
+    error: Optional[str] = None,
+    detector: Detector = None,
+    timer: StageTimer = None,
+) -> Dict[str, Any]:
+    """
+    Run a single upload through the result cache and batching queue
+
+    Args:
+        error: Why the upload was rejected while it was read, if it was
+        detector: Model to run (default: the default model)
+        timer: The request's timer, which this image's stages are added to
+
+    Returns:
+        Per-image result in the same shape as /detect-batch entries
+    """
+    if error is None and not content_type.startswith("image/"):
+        error = "File must be an image"
+    if error is not None:
+        return {"filename": filename, "success": False, "error": error}
+
+    # Images of one request are in flight together, so each gets its own
+    # timer (the queue stage is measured against it) that is then added up
+    if timer is None:
+        timer = StageTimer()
+    image_timer = StageTimer()
+    try:
+        image_hash = DetectionCache.content_hash(contents)
+        cache_key = DetectionCache.variant_key(
+            image_hash, cache_variant(resolution, detector=detector)
+        )
+        raw_result = await result_cache.get(cache_key)
+        if raw_result is None:
+            with image_timer.stage("decode"):
+                image, original_size = await run_in_worker(
+                    decode_image, contents, resolution, MAX_IMAGE_PIXELS
                 )
-                processor = DetrImageProcessor.from_pretrained(
-                    "facebook/detr-resnet-50",
-                    cache_dir=cache_dir
+            raw_result = await submit_to_batcher(
+                InferenceRequest(
+                    image, original_size, resolution, image_timer, detector
                 )
-                logger.info("✅ Models downloaded and cached")
+            )
+            await result_cache.put(cache_key, raw_result)
+            store_result(
+                "detect-batch",
+                filename,
+                original_size,
+                raw_result,
+                detector,
+                image_hash,
+            )
+    except Exception as e:
+        timer.merge(image_timer)
+        return {"filename": filename, "success": False, "error": str(e)}
+
+    with image_timer.stage("format"):
+        detections = format_detections(raw_result, confidence_threshold, detector)
+    timer.merge(image_timer)
+    return {
+        "filename": filename,
+        "success": True,
+        "detections": detections,
+        "total_detections": len(detections),
+    }
+
+
+async def detect_job_batch(job: Job, items: List[JobItem]) -> List[Dict[str, Any]]:
+    """
+    Run one batch of a bulk job through the model, bypassing the result cache
+
+    Returns:
+        One /detect-batch style result record (plus image_size) per item
+    """
+    params = job.params
+    resolution = tuple(params["resolution"])
+    detector = await asyncio.get_running_loop().run_in_executor(
+        None, registry.get, params.get("model") or DEFAULT_MODEL
+    )
+    records = [None] * len(items)
+    images = []
+    original_sizes = []
+    decoded_indices = []
+
+    decoded = await asyncio.gather(
+        *(
+            run_in_worker(decode_image_file, item.path, resolution, MAX_IMAGE_PIXELS)
+            for item in items
+        ),
+        return_exceptions=True,
+    )
+    for index, (item, result) in enumerate(zip(items, decoded)):
+        if isinstance(result, Exception):
+            records[index] = {
+                "filename": item.name,
+                "success": False,
+                "error": str(result),
+            }
         else:
-            model = DetrForObjectDetection.from_pretrained(
-                "facebook/detr-resnet-50",
-                cache_dir=cache_dir
+            images.append(result[0])
+            original_sizes.append(result[1])
+            decoded_indices.append(index)
+
+    detection_results = (
+        await run_in_inference_pool(
+            run_inference, images, original_sizes, resolution, None, detector
+        )
+        if images
+        else []
+    )
+
+    for index, raw_result, (width, height) in zip(
+        decoded_indices, detection_results, original_sizes
+    ):
+        # Job files are hashed by the store's writer thread, off the request path
+        store_result(
+            f"job:{job.id}",
+            items[index].name,
+            (width, height),
+            raw_result,
+            detector,
+            path=items[index].path,
+        )
+        record = {
+            "filename": items[index].name,
+            "success": True,
+            "image_size": {"width": width, "height": height},
+        }
+        if params["format"] == "columnar":
+            record.update(
+                format_detections_columnar(raw_result, params["confidence_threshold"])
             )
-            processor = DetrImageProcessor.from_pretrained(
-                "facebook/detr-resnet-50",
-                cache_dir=cache_dir
+        else:
+            detections = format_detections(
+                raw_result, params["confidence_threshold"], detector
             )
-            logger.info("✅ Models downloaded and cached")
-            
-        model.eval()
-        logger.info("Models loaded successfully!")
-        
+            record["detections"] = detections
+            record["total_detections"] = len(detections)
+        records[index] = record
+
+    return records
+
+
+def check_jobs_enabled():
+    """Reject /jobs requests with 404 when JOBS_DIR is not set"""
+    if job_store is None:
+        raise HTTPException(
+            status_code=404, detail="Bulk jobs are disabled (set JOBS_DIR)"
+        )
+
+
+async def get_job(job_id: str) -> Job:
+    check_jobs_enabled()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, job_store.get, job_id
+        )
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def save_job_uploads(files: List[UploadFile], directory: str) -> List[Tuple[str, str]]:
+    """Copy uploads into a job's input directory; returns (path, filename) per file"""
+    os.makedirs(directory, exist_ok=True)
+    items = []
+    for position, file in enumerate(files):
+        name = os.path.basename(file.filename or "") or f"image-{position}"
+        path = os.path.join(directory, f"{position:06d}-{name}")
+        file.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+        items.append((path, file.filename or name))
+    return items
+
+
+async def resolve_detector(name: Optional[str]) -> Detector:
+    """Look up the model a request asked for, loading it if needed"""
+    if not name or name == DEFAULT_MODEL:
+        return default_detector()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, registry.get, name
+        )
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error loading models: {e}")
-        raise e
+        logger.error(f"Error loading model {name}: {e}")
+        raise HTTPException(
+            status_code=503, detail=f"Model {name} could not be loaded: {e}"
+        )
+
+
+def check_ready():
+    """Reject requests with 503 until the model is loaded and warmed up"""
+    if startup_status["status"] != "ready":
+        raise HTTPException(
+            status_code=503,
+            detail="Model is not ready yet",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+
+def busy_error(e: Exception) -> HTTPException:
+    """Build the 503 response returned when the server is saturated"""
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+async def prepare_model_in_background(started_at: float):
+    """Load and warm up the model without blocking startup, then mark it ready"""
+    try:
+        await run_in_inference_pool(prepare_model)
+    except Exception as e:
+        logger.error(f"Startup failed: {e}")
+        startup_status["status"] = "failed"
+        startup_status["error"] = str(e)
+        return
+
+    startup_status["cold_start_seconds"] = time.perf_counter() - started_at
+    startup_status["status"] = "ready"
+    if job_runner is not None:
+        await job_runner.start()
+    await preload_models()
+    logger.info(
+        f"Cold start took {startup_status['cold_start_seconds']:.2f}s "
+        f"(load: {startup_status['load_seconds'] or 0:.2f}s, "
+        f"warm-up: {startup_status['warmup_seconds']:.2f}s)"
+    )
+
+
+async def preload_models():
+    """Load and warm up the MODEL_PRELOAD models concurrently"""
+    loop = asyncio.get_running_loop()
+    names = [name for name in MODEL_PRELOAD if name != DEFAULT_MODEL]
+    results = await asyncio.gather(
+        *(loop.run_in_executor(None, registry.get, name) for name in names),
+        return_exceptions=True,
+    )
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.error(f"Could not preload model {name}: {result}")
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Load models when the API starts"""
-    load_models()
+    """Start the worker pools and batching queue, then load the model"""
+    global batcher, worker_pool, inference_pool, startup_task
+    global job_store, job_runner, result_store
+    started_at = time.perf_counter()
+
+    worker_pool = create_executor(WORKER_POOL, WORKER_POOL_SIZE)
+    inference_pool = create_executor("thread", 1)
+
+    batcher = MicroBatcher(
+        run_inference_requests,
+        max_batch_size=MAX_BATCH_SIZE,
+        batch_window_ms=BATCH_WINDOW_MS,
+        max_queue_size=BATCH_QUEUE_SIZE,
+        executor=inference_pool,
+    )
+    await batcher.start()
+
+    if RESULT_STORE_PATH:
+        result_store = DetectionStore(
+            RESULT_STORE_PATH, RESULT_STORE_MIN_SCORE, RESULT_STORE_QUEUE_SIZE
+        )
+
+    # Jobs can be queued straight away; the runner starts once the model is ready
+    if JOBS_DIR:
+        job_store = JobStore(os.path.join(JOBS_DIR, "jobs.sqlite3"))
+        job_runner = JobRunner(
+            job_store,
+            JOBS_DIR,
+            detect_job_batch,
+            batch_size=MAX_BATCH_SIZE,
+            lease_seconds=JOB_LEASE_SECONDS,
+        )
+
+    # /live answers straight away; /ready and the detection endpoints wait
+    # until the model is loaded (here, or before forking in serve.py) and warmed up
+    startup_task = asyncio.create_task(prepare_model_in_background(started_at))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job runner, batching queue and worker pools; flush the result store"""
+    if startup_task is not None:
+        startup_task.cancel()
+    if job_runner is not None:
+        # An unfinished job resumes from its last checkpoint on the next start
+        await job_runner.stop()
+    if batcher is not None:
+        await batcher.stop()
+    for pool in (worker_pool, inference_pool):
+        if pool is not None:
+            pool.shutdown(wait=False)
+    if job_store is not None:
+        job_store.close()
+    if result_store is not None:
+        await asyncio.get_running_loop().run_in_executor(None, result_store.close)
+
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"message": "Object Detection API is running!", "status": "healthy"}
 
+
+@app.get("/live")
+async def liveness():
+    """Liveness probe: the process is serving requests and startup has not failed"""
+    if startup_status["status"] == "failed":
+        return JSONResponse(
+            {"status": "failed", "error": startup_status["error"]}, status_code=503
+        )
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: the model is loaded and warmed up"""
+    ready = startup_status["status"] == "ready"
+    return JSONResponse(startup_status, status_code=200 if ready else 503)
+
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
     return {
-        "status": "healthy",
+        "status": (
+            "healthy"
+            if startup_status["status"] == "ready"
+            else startup_status["status"]
+        ),
         "model_loaded": model is not None,
-        "processor_loaded": processor is not None
+        "processor_loaded": processor is not None,
+        "inference_backend": INFERENCE_BACKEND,
+        "inference_resolution": {
+            "shortest_edge": INFERENCE_SHORTEST_EDGE,
+            "longest_edge": INFERENCE_LONGEST_EDGE,
+        },
+        "model_precision": MODEL_PRECISION,
+        "startup": startup_status,
+        "process": {"pid": os.getpid(), "torch_threads": torch.get_num_threads()},
+        "tuning": {
+            "profile": TUNING_PROFILE or None,
+            "applied": tuning_profile is not None,
+            "tuned_at": tuning_profile.tuned_at if tuning_profile else None,
+            "max_batch_size": MAX_BATCH_SIZE,
+        },
+        "batching": batcher.stats() if batcher is not None else None,
+        "workers": limiter.stats(),
+        "cache": result_cache.stats(),
+        "models": registry.stats(),
+        "profiling": profiler.stats(),
+        "jobs": {
+            "counts": (
+                await asyncio.get_running_loop().run_in_executor(None, job_store.counts)
+                if job_store is not None
+                else {}
+            ),
+            "current_job": job_runner.current_job if job_runner is not None else None,
+        },
+        "result_store": result_store.stats() if result_store is not None else None,
     }
 
+
+@app.get("/models")
+async def list_models():
+    """Models requests can choose with ?model=NAME, and which of them are loaded"""
+    return registry.stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request, stage, batching and model metrics in the Prometheus text format"""
+    return Response(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/debug/profiling")
+async def get_profiling():
+    """Current profiling settings"""
+    if not PROFILING_CONTROL:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return profiler.stats()
+
+
+@app.post("/debug/profiling")
+async def set_profiling(every_n: int = Query(..., ge=0), mode: str = Query(None)):
+    """
+    Change profiling settings without restarting (needs PROFILING_CONTROL=1)
+
+    Args:
+        every_n: Profile one detection request in every_n (0 disables profiling)
+        mode: "cprofile" or "torch" (default: keep the current mode)
+
+    Returns:
+        The new profiling settings
+    """
+    if not PROFILING_CONTROL:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if mode is not None and mode not in PROFILE_MODES:
+        raise HTTPException(
+            status_code=400, detail=f"mode must be one of: {', '.join(PROFILE_MODES)}"
+        )
+    profiler.configure(every_n, mode or profiler.mode)
+    logger.info(
+        f"Profiling one in {every_n} requests with {profiler.mode}"
+        if every_n
+        else "Profiling disabled"
+    )
+    return profiler.stats()
+
+
 @app.post("/detect")
 async def detect_objects(
+    request: Request,
     file: UploadFile = File(...),
-    confidence_threshold: float = 0.7
+    confidence_threshold: float = 0.7,
+    return_image: bool = False,
+    response_format: str = Query("detailed", alias="format"),
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    tiling: bool = False,
+    tile_size: int = Query(None, ge=128, le=4096),
+    tile_overlap: float = Query(None, ge=0.0, le=0.75),
+    model_name: str = Query(None, alias="model"),
 ):
     """
     Detect objects in an uploaded image
-    
+
     Args:
         file: Uploaded image file
         confidence_threshold: Minimum confidence score for detections (0.0-1.0)
-    
+        return_image: Include the image (base64) in the response for display
+        response_format: "detailed" (one object per detection) or "columnar"
+            (parallel arrays of class ids, scores and flattened boxes)
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        tiling: Run overlapping tiles of the image through the model at full
+            resolution and merge their detections (for very large images)
+        tile_size: Tile side in pixels (default: TILE_SIZE)
+        tile_overlap: Fraction of a tile shared with its neighbours
+            (default: TILE_OVERLAP)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+
     Returns:
         JSON response with detected objects and their bounding boxes
     """
-    if model is None or processor is None:
-        raise HTTPException(status_code=500, detail="Models not loaded")
-    
+    check_ready()
+
     # Validate file type
-    if not file.content_type.startswith('image/'):
+    if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
-    
+    size_error = upload_size_error(file)
+    if size_error:
+        raise HTTPException(status_code=413, detail=size_error)
+    check_response_format(response_format)
+    resolution = resolve_resolution(shortest_edge, max_size)
+    timer = request_timer(request)
+    tile_options = (
+        (tile_size or TILE_SIZE, TILE_OVERLAP if tile_overlap is None else tile_overlap)
+        if tiling
+        else None
+    )
+    detector = await resolve_detector(model_name)
+
     try:
-        # Read and process the image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
-        
-        # Get image dimensions
-        width, height = image.size
-        
-        # Preprocess the image
-        inputs = processor(images=image, return_tensors="pt")
-        
-        # Make predictions
-        with torch.no_grad():
-            outputs = model(**inputs)
-        
-        # Post-process results
-        target_sizes = torch.tensor([image.size[::-1]])
-        results = processor.post_process_object_detection(outputs, target_sizes=target_sizes)[0]
-        
-        # Filter results by confidence threshold
-        detections = []
-        for box, label, score in zip(results["boxes"], results["labels"], results["scores"]):
-            if score > confidence_threshold:
-                xmin, ymin, xmax, ymax = box.tolist()
-                class_name = COCO_CLASSES[label] if label < len(COCO_CLASSES) else f"class_{label}"
-                
-                detections.append({
-                    "class": class_name,
-                    "confidence": float(score),
-                    "bbox": {
-                        "xmin": float(xmin),
-                        "ymin": float(ymin),
-                        "xmax": float(xmax),
-                        "ymax": float(ymax)
-                    }
-                })
-        
-        # Convert image to base64 for frontend display
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        return {
+        # A tiled request keeps the model busy for up to a full batch per tile batch
+        slots = limiter.acquire(MAX_BATCH_SIZE if tiling else 1)
+    except ServerBusyError as e:
+        raise busy_error(e)
+
+    try:
+        with timer.stage("read"):
+            source, cache_key, image_hash = await read_upload(
+                file, cache_variant(resolution, tile_options, detector)
+            )
+
+        # Run the model (batched with concurrent requests) unless the same
+        # bytes were seen before, then filter results by confidence threshold
+        results = await result_cache.get(cache_key)
+        if tiling:
+            with timer.stage("decode"):
+                width, height = await run_in_worker(
+                    read_image_size, source, MAX_IMAGE_PIXELS
+                )
+                scale, tiles = plan_tiles(
+                    (width, height), *tile_options, TILE_MAX_TILES
+                )
+                if results is None:
+                    image, _ = await run_in_worker(
+                        decode_for_tiling, source, scale, MAX_IMAGE_PIXELS
+                    )
+            if results is None:
+                results = await run_in_inference_pool(
+                    run_profiled,
+                    [timer],
+                    "detect-tiled",
+                    run_tiled_inference,
+                    image,
+                    tiles,
+                    scale,
+                    resolution,
+                    timer,
+                    detector,
+                )
+                del image
+                await result_cache.put(cache_key, results)
+                store_result(
+                    "detect",
+                    file.filename,
+                    (width, height),
+                    results,
+                    detector,
+                    image_hash,
+                )
+        elif results is None:
+            # Decode in the worker pool, at reduced scale when inference downscales
+            with timer.stage("decode"):
+                image, (width, height) = await run_in_worker(
+                    decode_image, source, resolution, MAX_IMAGE_PIXELS
+                )
+            results = await submit_to_batcher(
+                InferenceRequest(image, (width, height), resolution, timer, detector)
+            )
+            await result_cache.put(cache_key, results)
+            store_result(
+                "detect", file.filename, (width, height), results, detector, image_hash
+            )
+        else:
+            with timer.stage("decode"):
+                width, height = await run_in_worker(read_image_size, source)
+
+        format_started = time.perf_counter()
+        response = {
             "success": True,
             "filename": file.filename,
             "image_size": {"width": width, "height": height},
-            "detections": detections,
-            "total_detections": len(detections),
-            "confidence_threshold": confidence_threshold,
-            "image_base64": img_base64
+            "model": detector.name,
         }
-        
+        if response_format == "columnar":
+            response["format"] = "columnar"
+            response["classes"] = detector.classes
+            response.update(format_detections_columnar(results, confidence_threshold))
+        else:
+            detections = format_detections(results, confidence_threshold, detector)
+            response["detections"] = detections
+            response["total_detections"] = len(detections)
+        response["confidence_threshold"] = confidence_threshold
+        if tiling:
+            response["tiling"] = {
+                "tiles": len(tiles),
+                "tile_size": tile_options[0],
+                "overlap": tile_options[1],
+                "scale": round(scale, 4),
+            }
+        timer.add("format", time.perf_counter() - format_started)
+
+        # Only echo the image back when asked to
+        if return_image:
+            with timer.stage("encode_image"):
+                await file.seek(0)
+                mime_type, img_base64 = await run_in_worker(
+                    encode_preview, await file.read(), PREVIEW_MAX_SIDE
+                )
+            response["image_base64"] = img_base64
+            response["image_mime_type"] = mime_type
+
+        with timer.stage("serialize"):
+            return FastJSONResponse(response)
+
+    except QueueFullError as e:
+        raise busy_error(e)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+    finally:
+        limiter.release(slots)
+
 
 @app.post("/detect-batch")
 async def detect_objects_batch(
+    request: Request,
     files: List[UploadFile] = File(...),
-    confidence_threshold: float = 0.7
+    confidence_threshold: float = 0.7,
+    response_format: str = Query("detailed", alias="format"),
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    model_name: str = Query(None, alias="model"),
 ):
     """
     Detect objects in multiple uploaded images
-    
+
     Args:
         files: List of uploaded image files
         confidence_threshold: Minimum confidence score for detections
-    
+        response_format: "detailed" or "columnar" (see /detect)
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+
     Returns:
         JSON response with results for each image
     """
-    if model is None or processor is None:
-        raise HTTPException(status_code=500, detail="Models not loaded")
-    
-    results = []
-    
-    for file in files:
-        if not file.content_type.startswith('image/'):
-            results.append({
-                "filename": file.filename,
-                "success": False,
-                "error": "File must be an image"
-            })
-            continue
-        
+    check_ready()
+    check_response_format(response_format)
+    resolution = resolve_resolution(shortest_edge, max_size)
+    timer = request_timer(request)
+    detector = await resolve_detector(model_name)
+
+    try:
+        slots = limiter.acquire(len(files))
+    except ServerBusyError as e:
+        raise busy_error(e)
+
+    try:
+        results = [None] * len(files)
+        raw_results = {}
+        cache_keys = {}
+        image_hashes = {}
+        image_indices = []
+        decode_tasks = []
+
+        # Decode every upload first so valid images can share forward passes
+        for index, file in enumerate(files):
+            if not file.content_type.startswith("image/"):
+                results[index] = {
+                    "filename": file.filename,
+                    "success": False,
+                    "error": "File must be an image",
+                }
+                continue
+
+            size_error = upload_size_error(file)
+            if size_error:
+                results[index] = {
+                    "filename": file.filename,
+                    "success": False,
+                    "error": size_error,
+                }
+                continue
+
+            with timer.stage("read"):
+                source, cache_keys[index], image_hashes[index] = await read_upload(
+                    file, cache_variant(resolution, detector=detector)
+                )
+
+            # Images with a cached result skip decoding and the model entirely
+            cached = await result_cache.get(cache_keys[index])
+            if cached is not None:
+                raw_results[index] = cached
+                continue
+
+            image_indices.append(index)
+            decode_tasks.append(
+                run_in_worker(decode_image, source, resolution, MAX_IMAGE_PIXELS)
+            )
+
+        images = []
+        original_sizes = []
+        decoded_indices = []
+        with timer.stage("decode"):
+            decoded_images = await asyncio.gather(*decode_tasks, return_exceptions=True)
+        for index, decoded in zip(image_indices, decoded_images):
+            if isinstance(decoded, Exception):
+                results[index] = {
+                    "filename": files[index].filename,
+                    "success": False,
+                    "error": str(decoded),
+                }
+            else:
+                image, original_size = decoded
+                images.append(image)
+                original_sizes.append(original_size)
+                decoded_indices.append(index)
+
         try:
-            # Process each image
-            contents = await file.read()
-            image = Image.open(io.BytesIO(contents)).convert('RGB')
-            
-            inputs = processor(images=image, return_tensors="pt")
-            
-            with torch.no_grad():
-                outputs = model(**inputs)
-            
-            target_sizes = torch.tensor([image.size[::-1]])
-            detection_results = processor.post_process_object_detection(outputs, target_sizes=target_sizes)[0]
-            
-            # Filter and format results
-            detections = []
-            for box, label, score in zip(detection_results["boxes"], detection_results["labels"], detection_results["scores"]):
-                if score > confidence_threshold:
-                    xmin, ymin, xmax, ymax = box.tolist()
-                    class_name = COCO_CLASSES[label] if label < len(COCO_CLASSES) else f"class_{label}"
-                    
-                    detections.append({
-                        "class": class_name,
-                        "confidence": float(score),
-                        "bbox": {
-                            "xmin": float(xmin),
-                            "ymin": float(ymin),
-                            "xmax": float(xmax),
-                            "ymax": float(ymax)
-                        }
-                    })
-            
-            results.append({
-                "filename": file.filename,
-                "success": True,
-                "detections": detections,
-                "total_detections": len(detections)
-            })
-            
+            detection_results = await run_in_inference_pool(
+                run_profiled,
+                [timer],
+                "detect-batch",
+                run_inference,
+                images,
+                original_sizes,
+                resolution,
+                timer,
+                detector,
+            )
         except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "success": False,
-                "error": str(e)
-            })
-    
-    return {
+            logger.error(f"Error processing batch: {e}")
+            for index in decoded_indices:
+                results[index] = {
+                    "filename": files[index].filename,
+                    "success": False,
+                    "error": str(e),
+                }
+        else:
+            for index, detection_result, original_size in zip(
+                decoded_indices, detection_results, original_sizes
+            ):
+                await result_cache.put(cache_keys[index], detection_result)
+                store_result(
+                    "detect-batch",
+                    files[index].filename,
+                    original_size,
+                    detection_result,
+                    detector,
+                    image_hashes[index],
+                )
+                raw_results[index] = detection_result
+
+        format_started = time.perf_counter()
+        for index, raw_result in raw_results.items():
+            results[index] = {"filename": files[index].filename, "success": True}
+            if response_format == "columnar":
+                results[index].update(
+                    format_detections_columnar(raw_result, confidence_threshold)
+                )
+            else:
+                detections = format_detections(
+                    raw_result, confidence_threshold, detector
+                )
+                results[index]["detections"] = detections
+                results[index]["total_detections"] = len(detections)
+        timer.add("format", time.perf_counter() - format_started)
+    finally:
+        limiter.release(slots)
+
+    response = {
         "success": True,
         "total_images": len(files),
         "results": results,
-        "confidence_threshold": confidence_threshold
+        "confidence_threshold": confidence_threshold,
+        "model": detector.name,
+    }
+    if response_format == "columnar":
+        response["format"] = "columnar"
+        response["classes"] = detector.classes
+
+    with timer.stage("serialize"):
+        return FastJSONResponse(response)
+
+
+@app.post("/detect-batch/stream")
+async def detect_objects_batch_stream(
+    request: Request,
+    confidence_threshold: float = 0.7,
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    model_name: str = Query(None, alias="model"),
+):
+    """
+    Detect objects in multiple uploaded images, streaming one result per image
+
+    Args:
+        request: Multipart request with one or more "files" parts
+        confidence_threshold: Minimum confidence score for detections
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+
+    Returns:
+        Streamed results for each image, followed by a final "done" record
+    """
+    check_ready()
+    content_length = request.headers.get("content-length", "")
+    if (
+        STREAM_MAX_BODY_BYTES
+        and content_length.isdigit()
+        and int(content_length) > STREAM_MAX_BODY_BYTES
+    ):
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload exceeds the {STREAM_MAX_BODY_BYTES}-byte limit",
+        )
+
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    resolution = resolve_resolution(shortest_edge, max_size)
+    detector = await resolve_detector(model_name)
+
+    def encode(payload: Dict[str, Any], event: str = "result") -> bytes:
+        return encode_sse(payload, event) if use_sse else encode_ndjson(payload)
+
+    try:
+        slots = limiter.acquire(MAX_BATCH_SIZE)
+    except ServerBusyError as e:
+        raise busy_error(e)
+
+    # The body is always read to the end, with received images spooled until
+    # their turn: clients such as requests send the whole body before they
+    # read any of the response, so if reading stopped while unread results
+    # filled the socket buffers, both sides would wait on each other. Only
+    # MAX_BATCH_SIZE images at a time are decoded and detected ahead of the
+    # output. Spooled images are freed as they are taken, so memory and disk
+    # use follow the backlog, which STREAM_MAX_BODY_BYTES bounds.
+    loop = asyncio.get_running_loop()
+    spool = UploadSpool(STREAM_SPOOL_MEMORY_BYTES)
+    received = asyncio.Queue()
+    # Model stages are timed per batch, not profiled, as a stream runs many
+    timer = request_timer(request, sample=False)
+
+    async def read_uploads():
+        try:
+            async for part in iter_multipart_files(
+                request.headers.get("content-type", ""),
+                request.stream(),
+                MAX_UPLOAD_BYTES,
+                STREAM_MAX_BODY_BYTES,
+                STREAM_MAX_FILES,
+            ):
+                spooled = None
+                if part.error is None:
+                    spooled = await loop.run_in_executor(None, spool.write, part.data)
+                    part.data = b""
+                await received.put((part, spooled))
+            await received.put(None)
+        except Exception as e:
+            await received.put(e)
+
+    async def detect_spooled(part, spooled):
+        if spooled:
+            with timer.stage("read"):
+                contents = await loop.run_in_executor(None, spool.take, spooled)
+        else:
+            contents = part.data
+        return await detect_upload(
+            contents,
+            part.filename,
+            part.content_type,
+            confidence_threshold,
+            resolution,
+            part.error,
+            detector,
+            timer,
+        )
+
+    async def generate():
+        reader = asyncio.ensure_future(read_uploads())
+        pending = collections.deque()  # Detection tasks in upload order
+        end = None  # Once the upload is over: True, or the error that ended it
+        total_images = 0
+
+        try:
+            while True:
+                # Start the images received so far; only wait for more of the
+                # upload when there are no results left to send
+                while (
+                    end is None
+                    and len(pending) < MAX_BATCH_SIZE
+                    and (not pending or not received.empty())
+                ):
+                    item = await received.get()
+                    if item is None:
+                        end = True
+                    elif isinstance(item, Exception):
+                        end = item
+                    else:
+                        pending.append(asyncio.ensure_future(detect_spooled(*item)))
+                if not pending:
+                    break
+
+                result = await pending.popleft()
+                result["index"] = total_images
+                total_images += 1
+                with timer.stage("serialize"):
+                    line = encode(result)
+                yield line
+
+            if isinstance(end, Exception):
+                error = (
+                    str(end)
+                    if isinstance(end, MultipartError)
+                    else f"Error reading upload: {end}"
+                )
+                record = {"success": False, "error": error}
+                if isinstance(end, UploadLimitError):
+                    # Too late for a 413 status, so the record carries it
+                    record["status_code"] = 413
+                yield encode(record, "error")
+
+            yield encode(
+                {
+                    "done": True,
+                    "total_images": total_images,
+                    "confidence_threshold": confidence_threshold,
+                    "model": detector.name,
+                },
+                "done",
+            )
+        finally:
+            reader.cancel()
+            for task in pending:
+                task.cancel()
+            limiter.release(slots)
+            spool.close()
+
+    return BodyStreamingResponse(
+        generate(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+    )
+
+
+def next_video_batch(frames, duplicates: DuplicateFilter, resolution: Tuple[int, int]):
+    """
+    Read the next batch of sampled frames and prepare its keyframes for the model
+
+    Returns:
+        Tuple of (FrameBatch or None when done, keyframe images, their original sizes)
+    """
+    batch = next_frame_batch(frames, duplicates, MAX_BATCH_SIZE, VIDEO_MAX_BATCH_FRAMES)
+    if batch is None:
+        return None, [], []
+
+    images = []
+    original_sizes = []
+    for position in batch.keyframes:
+        frame = batch.frames[position]
+        original_sizes.append(frame.image.size)
+        images.append(reduce_for_inference(frame.image, resolution))
+        frame.image = None
+    return batch, images, original_sizes
+
+
+@app.post("/detect-video")
+async def detect_video(
+    request: Request,
+    file: UploadFile = File(...),
+    confidence_threshold: float = 0.7,
+    every_n: int = Query(1, ge=1),
+    target_fps: float = Query(None, gt=0),
+    source_fps: float = Query(30.0, gt=0),
+    max_frames: int = Query(None, ge=1),
+    dedup_distance: int = Query(None, ge=-1, le=64),
+    response_format: str = Query("detailed", alias="format"),
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    model_name: str = Query(None, alias="model"),
+):
+    """
+    Detect objects in the frames of a video or a zip archive of frames
+
+    Args:
+        file: Video file (needs PyAV) or zip archive of image frames
+        confidence_threshold: Minimum confidence score for detections
+        every_n: Keep every Nth frame (ignored when target_fps is set)
+        target_fps: Keep frames at about this rate
+        source_fps: Frame rate of a zip frame sequence, for timestamps
+        max_frames: Stop after this many sampled frames
+        dedup_distance: dHash distance (0-64) below which a frame counts as a
+            duplicate, or -1 to run every sampled frame (default: VIDEO_DEDUP_DISTANCE)
+        response_format: "detailed" or "columnar" (see /detect)
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+
+    Returns:
+        Streamed per-frame detections
+    """
+    check_ready()
+    check_response_format(response_format)
+    resolution = resolve_resolution(shortest_edge, max_size)
+    detector = await resolve_detector(model_name)
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+
+    filename = file.filename or ""
+    extension = os.path.splitext(filename)[1].lower()
+    if file.content_type in ZIP_CONTENT_TYPES or extension == ".zip":
+        source = iter_zip_frames(file.file, source_fps, MAX_IMAGE_PIXELS)
+    elif (file.content_type or "").startswith(
+        "video/"
+    ) or extension in VIDEO_EXTENSIONS:
+        source = iter_video_frames(file.file, MAX_IMAGE_PIXELS)
+    else:
+        raise HTTPException(
+            status_code=400, detail="File must be a video or a zip archive of frames"
+        )
+
+    frames = sample_frames(
+        source, every_n=every_n, target_fps=target_fps, max_frames=max_frames
+    )
+    duplicates = DuplicateFilter(
+        VIDEO_DEDUP_DISTANCE if dedup_distance is None else dedup_distance
+    )
+    loop = asyncio.get_running_loop()
+    timer = request_timer(request, sample=False)
+
+    def encode(payload: Dict[str, Any], event: str = "result") -> bytes:
+        return encode_sse(payload, event) if use_sse else encode_ndjson(payload)
+
+    try:
+        slots = limiter.acquire(MAX_BATCH_SIZE)
+    except ServerBusyError as e:
+        raise busy_error(e)
+
+    # Read the first batch up front so unreadable uploads get a 400
+    try:
+        with timer.stage("decode"):
+            first_batch = await loop.run_in_executor(
+                None, next_video_batch, frames, duplicates, resolution
+            )
+    except VideoDecodeError as e:
+        limiter.release(slots)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        limiter.release(slots)
+        raise
+
+    async def generate():
+        batch, images, original_sizes = first_batch
+        last_result = None
+        frames_inferred = 0
+        frames_reused = 0
+
+        try:
+            while batch is not None:
+                results = []
+                if images:
+                    results = await run_in_inference_pool(
+                        run_inference,
+                        images,
+                        original_sizes,
+                        resolution,
+                        timer,
+                        detector,
+                    )
+                keyframe_results = dict(zip(batch.keyframes, results))
+
+                for position, frame in enumerate(batch.frames):
+                    source_position = batch.sources[position]
+                    raw_result = (
+                        keyframe_results[source_position]
+                        if source_position >= 0
+                        else last_result
+                    )
+                    reused = source_position != position
+                    frames_reused += reused
+                    frames_inferred += not reused
+
+                    record = {
+                        "frame_index": frame.index,
+                        "timestamp": round(frame.timestamp, 3),
+                        "reused": reused,
+                    }
+                    with timer.stage("format"):
+                        if response_format == "columnar":
+                            record.update(
+                                format_detections_columnar(
+                                    raw_result, confidence_threshold
+                                )
+                            )
+                        else:
+                            detections = format_detections(
+                                raw_result, confidence_threshold, detector
+                            )
+                            record["detections"] = detections
+                            record["total_detections"] = len(detections)
+                    with timer.stage("serialize"):
+                        line = encode(record)
+                    yield line
+
+                if results:
+                    last_result = results[-1]
+
+                with timer.stage("decode"):
+                    batch, images, original_sizes = await loop.run_in_executor(
+                        None, next_video_batch, frames, duplicates, resolution
+                    )
+
+            done = {
+                "done": True,
+                "frames_sampled": frames_inferred + frames_reused,
+                "frames_inferred": frames_inferred,
+                "frames_reused": frames_reused,
+                "confidence_threshold": confidence_threshold,
+                "model": detector.name,
+            }
+            if response_format == "columnar":
+                done["format"] = "columnar"
+                done["classes"] = detector.classes
+            yield encode(done, "done")
+        except VideoDecodeError as e:
+            yield encode({"success": False, "error": str(e)}, "error")
+        except Exception as e:
+            logger.error(f"Error processing video: {e}")
+            yield encode(
+                {"success": False, "error": f"Error processing video: {e}"}, "error"
+            )
+        finally:
+            try:
+                frames.close()
+            except ValueError:
+                # Still being read by a cancelled batch; it is closed when collected
+                pass
+            limiter.release(slots)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+    )
+
+
+@app.post("/detect-raw")
+async def detect_raw_frames(
+    request: Request,
+    confidence_threshold: float = 0.7,
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    model_name: str = Query(None, alias="model"),
+):
+    """
+    Detect objects in already decoded frames sent as raw pixels
+
+    Args:
+        request: uint8 RGB pixels (application/octet-stream, with an X-Frame-Shape
+            header) or a .npy file of them (application/x-npy)
+        confidence_threshold: Minimum confidence score for detections (0.0-1.0)
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+
+    Returns:
+        JSON response with columnar detections for each frame
+    """
+    check_ready()
+    resolution = resolve_resolution(shortest_edge, max_size)
+    timer = request_timer(request)
+    detector = await resolve_detector(model_name)
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        if content_type in NPY_CONTENT_TYPES:
+            max_bytes = (
+                MAX_UPLOAD_BYTES * MAX_BATCH_SIZE + NPY_MAX_HEADER_BYTES
+                if MAX_UPLOAD_BYTES
+                else 0
+            )
+            with timer.stage("read"):
+                frames = frames_from_npy(await read_raw_body(request, max_bytes))
+        elif content_type == "application/octet-stream":
+            shape_header = request.headers.get("x-frame-shape")
+            if not shape_header:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        "X-Frame-Shape header is required for "
+                        "application/octet-stream"
+                    ),
+                )
+            shape = parse_frame_shape(shape_header)
+            size_error = raw_frames_error(shape)
+            if size_error:
+                raise HTTPException(status_code=413, detail=size_error)
+            with timer.stage("read"):
+                frames = frames_from_buffer(
+                    await read_raw_body(request, math.prod(shape)), shape
+                )
+        else:
+            npy_types = " or ".join(sorted(NPY_CONTENT_TYPES))
+            raise HTTPException(
+                status_code=415,
+                detail=(
+                    f"Content-Type must be application/octet-stream or {npy_types}"
+                ),
+            )
+    except RawFrameError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    size_error = raw_frames_error(tuple(frames.shape))
+    if size_error:
+        raise HTTPException(status_code=413, detail=size_error)
+
+    count, height, width, _ = frames.shape
+    try:
+        slots = limiter.acquire(count)
+    except ServerBusyError as e:
+        raise busy_error(e)
+
+    try:
+        results = await run_in_inference_pool(
+            run_profiled,
+            [timer],
+            "detect-raw",
+            run_frame_inference,
+            frames,
+            resolution,
+            timer,
+            detector,
+        )
+    except Exception as e:
+        logger.error(f"Error processing raw frames: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Error processing frames: {str(e)}"
+        )
+    finally:
+        limiter.release(slots)
+
+    with timer.stage("format"):
+        response = {
+            "success": True,
+            "total_frames": count,
+            "image_size": {"width": width, "height": height},
+            "results": [
+                format_detections_columnar(result, confidence_threshold)
+                for result in results
+            ],
+            "confidence_threshold": confidence_threshold,
+            "model": detector.name,
+            "format": "columnar",
+            "classes": detector.classes,
+        }
+
+    with timer.stage("serialize"):
+        return FastJSONResponse(response)
+
+
+@app.websocket("/ws/detect")
+async def detect_websocket(
+    websocket: WebSocket,
+    confidence_threshold: float = 0.7,
+    response_format: str = Query("detailed", alias="format"),
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    model_name: str = Query(None, alias="model"),
+):
+    """
+    Detect objects in live frames pushed over one WebSocket connection
+
+    Args:
+        confidence_threshold: Minimum confidence score for detections (0.0-1.0)
+        response_format: "detailed" or "columnar" (class names are sent once,
+            in the opening "ready" message)
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+    """
+    # Invalid settings close the handshake: 1013 (try again later) until the
+    # model is ready, 1008 for bad parameters or models that can't be loaded
+    if startup_status["status"] != "ready":
+        raise WebSocketException(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason="Model is not ready yet"
+        )
+    try:
+        check_response_format(response_format)
+        resolution = resolve_resolution(shortest_edge, max_size)
+        detector = await resolve_detector(model_name)
+    except HTTPException as e:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail)
+        )
+
+    await websocket.accept()
+    live_connections.inc()
+    slot = LatestFrameSlot()
+    stats = LiveStats()
+    send_lock = asyncio.Lock()
+
+    async def send(message: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_text(json_dumps(message).decode("utf-8"))
+
+    async def send_error(frame_index: Optional[int], error: str):
+        await send(
+            {
+                "type": "error",
+                "frame": frame_index,
+                "error": error,
+                "stats": stats.snapshot(),
+            }
+        )
+
+    async def receive_frames():
+        """Put incoming frames in the slot, counting the frames they replace"""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                data = message.get("bytes")
+                if data is None:
+                    await send_error(None, "Frames must be sent as binary messages")
+                    continue
+
+                frame_index = stats.received
+                stats.received += 1
+                if MAX_UPLOAD_BYTES and len(data) > MAX_UPLOAD_BYTES:
+                    stats.failed += 1
+                    live_frames.inc(outcome="failed")
+                    await send_error(
+                        frame_index,
+                        f"Frame exceeds the {MAX_UPLOAD_BYTES} byte upload limit",
+                    )
+                    continue
+                if (
+                    slot.put(LiveFrame(frame_index, data, time.perf_counter()))
+                    is not None
+                ):
+                    stats.dropped += 1
+                    live_frames.inc(outcome="dropped")
+        finally:
+            slot.close()
+
+    async def process_frames():
+        """Run the newest frame through the model and send its result"""
+        while True:
+            frame = await slot.get()
+            if frame is None:
+                return
+            try:
+                slots = limiter.acquire(1)
+            except ServerBusyError:
+                # The server is saturated: skip this frame rather than queue it
+                stats.dropped += 1
+                live_frames.inc(outcome="dropped")
+                continue
+
+            timer = StageTimer()
+            try:
+                with timer.stage("decode"):
+                    image, (width, height) = await run_in_worker(
+                        decode_image, frame.data, resolution, MAX_IMAGE_PIXELS
+                    )
+                results = await submit_to_batcher(
+                    InferenceRequest(
+                        image, (width, height), resolution, timer, detector
+                    )
+                )
+                del image
+            except QueueFullError:
+                stats.dropped += 1
+                live_frames.inc(outcome="dropped")
+                continue
+            except Exception as e:
+                stats.failed += 1
+                live_frames.inc(outcome="failed")
+                await send_error(frame.index, str(e))
+                continue
+            finally:
+                limiter.release(slots)
+
+            message = {
+                "type": "result",
+                "frame": frame.index,
+                "image_size": {"width": width, "height": height},
+            }
+            with timer.stage("format"):
+                if response_format == "columnar":
+                    message.update(
+                        format_detections_columnar(results, confidence_threshold)
+                    )
+                else:
+                    detections = format_detections(
+                        results, confidence_threshold, detector
+                    )
+                    message["detections"] = detections
+                    message["total_detections"] = len(detections)
+            # WebSockets bypass the metrics middleware, so each frame is recorded here
+            request_metrics.observe_stages(timer, "/ws/detect")
+            latency = time.perf_counter() - frame.received_at
+            stats.record(latency)
+            live_frames.inc(outcome="processed")
+            live_latency.observe(latency)
+            message["latency_ms"] = round(latency * 1000.0, 1)
+            message["stats"] = stats.snapshot()
+            await send(message)
+
+    ready_message = {
+        "type": "ready",
+        "model": detector.name,
+        "format": response_format,
+        "confidence_threshold": confidence_threshold,
+    }
+    if response_format == "columnar":
+        ready_message["classes"] = detector.classes
+
+    receiver = asyncio.ensure_future(receive_frames())
+    try:
+        await send(ready_message)
+        await process_frames()
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away while a result was being sent
+        pass
+    finally:
+        receiver.cancel()
+        live_connections.dec()
+        logger.info(f"Live connection closed: {stats.snapshot()}")
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    files: List[UploadFile] = File(None),
+    directory: str = Query(None),
+    recursive: bool = True,
+    confidence_threshold: float = 0.7,
+    response_format: str = Query("detailed", alias="format"),
+    shortest_edge: int = Query(None, ge=32, le=4096),
+    max_size: int = Query(None, ge=32, le=4096),
+    parquet: bool = False,
+    model_name: str = Query(None, alias="model"),
+):
+    """
+    Queue a bulk detection job over uploaded images or a server-side directory
+
+    Args:
+        files: Images to process (either files or directory)
+        directory: Server-side directory to scan for images, below JOBS_INPUT_ROOTS
+        recursive: Include subdirectories of directory
+        confidence_threshold: Minimum confidence score for detections
+        response_format: "detailed" or "columnar" (see /detect)
+        shortest_edge: Shortest image edge for inference (default: server setting)
+        max_size: Longest image edge for inference (default: server setting)
+        parquet: Also write results as Parquet (needs pyarrow)
+        model_name: Model to run, one of GET /models (default: DEFAULT_MODEL)
+
+    Returns:
+        The queued job's id and progress
+    """
+    check_jobs_enabled()
+    check_response_format(response_format)
+    resolution = resolve_resolution(shortest_edge, max_size)
+    if bool(files) == bool(directory):
+        raise HTTPException(status_code=400, detail="Provide either files or directory")
+    if model_name and model_name not in registry.sources:
+        available = ", ".join(registry.names())
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model {model_name!r}; available: {available}",
+        )
+    if parquet and not parquet_available():
+        raise HTTPException(
+            status_code=400,
+            detail="Parquet output needs pyarrow installed on the server",
+        )
+
+    loop = asyncio.get_running_loop()
+    job_id = uuid.uuid4().hex
+
+    if directory:
+        if not JOBS_INPUT_ROOTS:
+            raise HTTPException(
+                status_code=403,
+                detail="Directory jobs are disabled (set JOBS_INPUT_ROOTS)",
+            )
+        if not is_within(directory, JOBS_INPUT_ROOTS):
+            raise HTTPException(
+                status_code=403, detail="Directory is outside JOBS_INPUT_ROOTS"
+            )
+        if not os.path.isdir(directory):
+            raise HTTPException(
+                status_code=404, detail=f"Directory {directory} not found"
+            )
+        source = os.path.realpath(directory)
+        items = await loop.run_in_executor(None, scan_directory, source, recursive)
+    else:
+        for file in files:
+            size_error = upload_size_error(file)
+            if size_error:
+                raise HTTPException(
+                    status_code=413, detail=f"{file.filename}: {size_error}"
+                )
+        source = "upload"
+        items = None
+
+    if items is not None and not items:
+        raise HTTPException(status_code=400, detail="No images found in directory")
+    if len(items if items is not None else files) > JOB_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400, detail=f"Jobs are limited to {JOB_MAX_IMAGES} images"
+        )
+
+    if items is None:
+        items = await loop.run_in_executor(
+            None, save_job_uploads, files, job_runner.inputs_dir(job_id)
+        )
+
+    params = {
+        "confidence_threshold": confidence_threshold,
+        "format": response_format,
+        "resolution": list(resolution),
+        "parquet": parquet,
+        "model": model_name or DEFAULT_MODEL,
+    }
+    job = await loop.run_in_executor(
+        None, job_store.create, source, params, items, job_id
+    )
+    job_runner.wake()
+    logger.info(f"Queued job {job.id} with {job.total} images from {source}")
+    return job.summary()
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """List jobs, newest first"""
+    check_jobs_enabled()
+    jobs = await asyncio.get_running_loop().run_in_executor(
+        None, job_store.list, limit, offset
+    )
+    return {"jobs": [job.summary() for job in jobs], "offset": offset, "limit": limit}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Progress of a job"""
+    job = await get_job(job_id)
+    response = job.summary()
+    response["results_path"] = job_runner.results_path(job_id)
+    return response
+
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Page through a job's results in upload/directory order
+
+    Args:
+        offset: Number of finished images to skip
+        limit: Maximum number of results to return
+
+    Returns:
+        The page of result records and the offset of the next page (null when
+        no more results are available yet)
+    """
+    job = await get_job(job_id)
+    loop = asyncio.get_running_loop()
+    ranges = await loop.run_in_executor(
+        None, job_store.result_ranges, job_id, offset, limit
+    )
+    results_path = job_runner.results_path(job_id)
+    results = (
+        await loop.run_in_executor(None, JobOutput.read_ranges, results_path, ranges)
+        if ranges
+        else []
+    )
+
+    response = {
+        "job_id": job_id,
+        "status": job.status,
+        "offset": offset,
+        "limit": limit,
+        "processed_images": job.processed,
+        "results": results,
+        "next_offset": (
+            offset + len(results) if offset + len(results) < job.processed else None
+        ),
+        "confidence_threshold": job.params["confidence_threshold"],
     }
+    if job.params["format"] == "columnar":
+        response["format"] = "columnar"
+        response["classes"] = (await resolve_detector(job.params.get("model"))).classes
+    return FastJSONResponse(response)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; results written so far are kept"""
+    await get_job(job_id)
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, job_store.cancel, job_id)
+    if job.status == CANCELLED:
+        # A batch still running finds its files gone, but can no longer commit
+        await loop.run_in_executor(None, job_runner.remove_inputs, job_id)
+    return job.summary()
+
+
+@app.get("/search")
+async def search_results(
+    class_name: str = Query(None, alias="class"),
+    class_id: int = Query(None, ge=0),
+    min_score: float = Query(0.0, ge=0.0, le=1.0),
+    max_score: float = Query(None, ge=0.0, le=1.0),
+    min_count: int = Query(1, ge=1),
+    max_count: int = Query(None, ge=1),
+    min_area: float = Query(None, ge=0.0),
+    max_area: float = Query(None, ge=0.0),
+    model_name: str = Query(None, alias="model"),
+    image_hash: str = Query(None, min_length=64, max_length=64),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=SEARCH_MAX_LIMIT),
+    include_detections: bool = True,
+):
+    """
+    Find stored images by what was detected in them, newest first
+
+    Args:
+        class_name: Class name, e.g. "person"
+        class_id: Class id (instead of a name)
+        min_score: Lowest detection score
+        max_score: Highest detection score
+        min_count: Fewest matching detections per image
+        max_count: Most matching detections per image
+        min_area: Smallest box area in pixels of the original image
+        max_area: Largest box area in pixels of the original image
+        model_name: Only results from this model
+        image_hash: Only this image (SHA-256 of its bytes)
+        offset: Number of matching images to skip
+        limit: Maximum number of images to return
+        include_detections: Include each image's matching detections
+
+    Returns:
+        The page of matching images and the offset of the next page (null on
+        the last page)
+    """
+    if result_store is None:
+        raise HTTPException(
+            status_code=404,
+            detail="The result store is disabled (set RESULT_STORE_PATH)",
+        )
+    if class_name is not None and class_id is not None:
+        raise HTTPException(status_code=400, detail="Pass class or class_id, not both")
+    if max_count is not None and max_count < min_count:
+        raise HTTPException(
+            status_code=400, detail="max_count must be at least min_count"
+        )
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    query = SearchQuery(
+        class_ids=[class_id] if class_id is not None else None,
+        min_score=min_score,
+        max_score=max_score,
+        min_area=min_area,
+        max_area=max_area,
+        min_count=min_count,
+        max_count=max_count,
+        model=model_name,
+        image_hash=image_hash.lower() if image_hash else None,
+        offset=offset,
+        limit=limit,
+        include_detections=include_detections,
+    )
+    if class_name is not None:
+        query.class_ids = await loop.run_in_executor(
+            None, result_store.class_ids, class_name, model_name
+        )
+    page = await loop.run_in_executor(None, result_store.search, query)
+
+    return FastJSONResponse(
+        {
+            "offset": offset,
+            "limit": limit,
+            "results": page["results"],
+            "next_offset": page["next_offset"],
+            "min_stored_score": result_store.min_score,
+            "query_ms": round((time.perf_counter() - started) * 1000.0, 2),
+        }
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
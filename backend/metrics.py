@@ -0,0 +1,361 @@
+"""Request metrics in the Prometheus text exposition format"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from cache hits to large tiled requests
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [
+        f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(metric name with suffix, formatted labels, value) for every series"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(
+            f"{name}{labels} {format_value(value)}"
+            for name, labels, value in self.samples()
+        )
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            (self.name, format_labels(self.labelnames, key), value)
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """Value that goes up and down, or is read from a function at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Optional[Callable[[], object]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.function is not None:
+            value = self.function()
+            values = value if isinstance(value, dict) else {(): value}
+            values = {
+                key if isinstance(key, tuple) else (key,): value
+                for key, value in values.items()
+            }
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [
+            (self.name, format_labels(self.labelnames, key), value)
+            for key, value in sorted(values.items())
+            if value is not None
+        ]
+
+
+class Histogram(Metric):
+    """Distribution of observed values over cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: [count per bucket (+Inf last), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._series.items()
+            )
+
+        samples = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = format_labels(
+                    self.labelnames + ("le",), key + (format_value(float(bound)),)
+                )
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function=None,
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets=DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Time the stages of one request"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        # Set when this request was picked for profiling (see profiling.py)
+        self.profile = False
+        self.profile_path: Optional[str] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, other: "StageTimer"):
+        """Add another timer's stages to this one"""
+        for name, seconds in other.stages.items():
+            self.add(name, seconds)
+
+    def total(self) -> float:
+        """Sum of the recorded stage durations"""
+        return sum(self.stages.values())
+
+    def elapsed(self) -> float:
+        """Wall time since the timer was created"""
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self) -> str:
+        """Format the stages as a Server-Timing header value (durations in ms)"""
+        entries = [
+            f"{name};dur={seconds * 1000.0:.2f}"
+            for name, seconds in self.stages.items()
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000.0:.2f}")
+        if self.profile_path:
+            entries.append(f'profile;desc="{self.profile_path}"')
+        return ", ".join(entries)
+
+
+class RequestMetrics:
+    """Standard per-endpoint request metrics"""
+
+    def __init__(self, registry: MetricsRegistry, prefix: str):
+        self.in_flight = registry.gauge(
+            f"{prefix}_requests_in_flight",
+            "Requests currently being processed",
+            ["endpoint"],
+        )
+        self.requests = registry.counter(
+            f"{prefix}_requests_total",
+            "Requests completed, by response status",
+            ["endpoint", "status"],
+        )
+        self.latency = registry.histogram(
+            f"{prefix}_request_seconds",
+            "Request latency, until the last body byte was sent",
+            ["endpoint"],
+        )
+        self.stages = registry.histogram(
+            f"{prefix}_stage_seconds",
+            "Time spent in each stage of a request",
+            ["endpoint", "stage"],
+        )
+
+    def observe_stages(self, timer: StageTimer, endpoint: str):
+        """Record the stages of a request (or of one WebSocket frame)"""
+        for stage, seconds in timer.stages.items():
+            self.stages.observe(seconds, endpoint=endpoint, stage=stage)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording RequestMetrics for a set of paths"""
+
+    def __init__(
+        self,
+        app,
+        metrics: RequestMetrics,
+        paths: Iterable[str],
+        server_timing: bool = False,
+    ):
+        self.app = app
+        self.metrics = metrics
+        self.paths = set(paths)
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"]
+        timer = StageTimer()
+        scope.setdefault("state", {})["timer"] = timer
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append(
+                        (b"server-timing", timer.server_timing().encode("latin-1"))
+                    )
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        self.metrics.in_flight.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            self.metrics.in_flight.dec(endpoint=endpoint)
+            self.metrics.requests.inc(endpoint=endpoint, status=status)
+            self.metrics.latency.observe(timer.elapsed(), endpoint=endpoint)
+            self.metrics.observe_stages(timer, endpoint)
@@ -0,0 +1,223 @@
+"""Image-to-tensor preprocessing for DETR with minimal intermediate buffers"""
+
+import io
+import math
+import warnings
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+# Longest .npy header numpy reads (its max_header_size default) plus the preamble
+NPY_MAX_HEADER_BYTES = 10000 + 12
+
+
+class RawFrameError(ValueError):
+    """Raised when a raw buffer doesn't hold uint8 RGB frames of the stated shape"""
+
+
+def resized_size(size: Tuple[int, int], resolution: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Size DETR's processor resizes an image to
+
+    Args:
+        size: Image (width, height)
+        resolution: (shortest_edge, longest_edge)
+
+    Returns:
+        Resized (width, height)
+    """
+    width, height = size
+    shortest_edge, longest_edge = resolution
+    raw_size = None
+
+    min_original = float(min(width, height))
+    max_original = float(max(width, height))
+    if max_original / min_original * shortest_edge > longest_edge:
+        raw_size = longest_edge * min_original / max_original
+        shortest_edge = int(round(raw_size))
+
+    if (height <= width and height == shortest_edge) or (
+        width <= height and width == shortest_edge
+    ):
+        return width, height
+    if width < height:
+        return shortest_edge, int((raw_size or shortest_edge) * height / width)
+    return int((raw_size or shortest_edge) * width / height), shortest_edge
+
+
+def pixel_tensor(image: Image.Image) -> torch.Tensor:
+    """View an RGB image's pixels as a (3, height, width) uint8 tensor"""
+    # The array is read-only; it is only ever copied from, never written
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return torch.from_numpy(np.asarray(image)).permute(2, 0, 1)
+
+
+def preprocess(
+    images: List[Image.Image],
+    resolution: Tuple[int, int],
+    image_mean: Sequence[float],
+    image_std: Sequence[float],
+    resample: int = Image.BILINEAR,
+) -> Dict[str, torch.Tensor]:
+    """
+    Resize, normalize and pad a batch of RGB images into model inputs
+
+    Args:
+        images: RGB images
+        resolution: (shortest_edge, longest_edge) to resize to
+        image_mean: Per-channel mean on the 0-1 scale
+        image_std: Per-channel standard deviation on the 0-1 scale
+        resample: PIL resampling filter
+
+    Returns:
+        Dict with "pixel_values" (N, 3, H, W) float32 and "pixel_mask" (N, H, W)
+        int64, padded at the bottom/right to the largest image in the batch
+    """
+    sizes = [resized_size(image.size, resolution) for image in images]
+    height = max(size[1] for size in sizes)
+    width = max(size[0] for size in sizes)
+
+    pixel_values = torch.zeros((len(images), 3, height, width), dtype=torch.float32)
+    pixel_mask = torch.zeros((len(images), height, width), dtype=torch.int64)
+
+    # (x / 255 - mean) / std == (x - 255 * mean) / (255 * std)
+    mean = torch.tensor(image_mean, dtype=torch.float32).view(3, 1, 1) * 255.0
+    std = torch.tensor(image_std, dtype=torch.float32).view(3, 1, 1) * 255.0
+
+    for index, (image, (image_width, image_height)) in enumerate(zip(images, sizes)):
+        if image.size != (image_width, image_height):
+            image = image.resize((image_width, image_height), resample)
+
+        values = pixel_values[index, :, :image_height, :image_width]
+        values.copy_(pixel_tensor(image))
+        values.sub_(mean).div_(std)
+        pixel_mask[index, :image_height, :image_width] = 1
+
+    return {"pixel_values": pixel_values, "pixel_mask": pixel_mask}
+
+
+def check_frame_shape(shape: Tuple[int, ...]):
+    if len(shape) not in (3, 4) or shape[-1] != 3 or min(shape) < 1:
+        raise RawFrameError(
+            "Frames must be HEIGHT x WIDTH x 3 or COUNT x HEIGHT x WIDTH x 3 "
+            f"uint8 RGB, got shape {tuple(shape)}"
+        )
+
+
+def parse_frame_shape(value: str) -> Tuple[int, ...]:
+    """Parse a "height,width,3" or "count,height,width,3" shape"""
+    try:
+        shape = tuple(int(part) for part in value.split(","))
+    except ValueError:
+        raise RawFrameError(
+            f"Invalid shape {value!r}; expected HEIGHT,WIDTH,3 or COUNT,HEIGHT,WIDTH,3"
+        )
+    check_frame_shape(shape)
+    return shape
+
+
+def frames_from_buffer(
+    buffer: bytearray, shape: Tuple[int, ...], offset: int = 0
+) -> torch.Tensor:
+    """
+    View a raw buffer as (count, height, width, 3) uint8 frames without copying
+
+    Args:
+        buffer: Writable buffer holding the pixels (row-major, RGB interleaved)
+        shape: (height, width, 3) or (count, height, width, 3)
+        offset: Bytes to skip at the start of the buffer
+
+    Raises:
+        RawFrameError: If the buffer size doesn't match the shape
+    """
+    check_frame_shape(shape)
+    size = math.prod(shape)
+    received = len(buffer) - offset
+    if received != size:
+        raise RawFrameError(
+            f"Shape {tuple(shape)} needs {size} bytes of pixels, got {received}"
+        )
+    frames = torch.frombuffer(buffer, dtype=torch.uint8, count=size, offset=offset)
+    return frames.view(shape if len(shape) == 4 else (1, *shape))
+
+
+def frames_from_npy(buffer: bytearray) -> torch.Tensor:
+    """
+    View the uint8 array of a .npy file as frames without copying
+
+    Raises:
+        RawFrameError: If the file is not a C-ordered uint8 array of frames
+    """
+    header = io.BytesIO(bytes(buffer[:NPY_MAX_HEADER_BYTES]))
+    try:
+        version = np.lib.format.read_magic(header)
+        read_header = {
+            (1, 0): np.lib.format.read_array_header_1_0,
+            (2, 0): np.lib.format.read_array_header_2_0,
+        }.get(version)
+        if read_header is None:
+            raise RawFrameError(
+                f"Unsupported .npy format version {version[0]}.{version[1]}"
+            )
+        shape, fortran_order, dtype = read_header(header)
+    except ValueError as e:
+        raise RawFrameError(f"Invalid .npy file: {e}")
+    if dtype != np.uint8 or fortran_order:
+        order = " (Fortran order)" if fortran_order else ""
+        raise RawFrameError(f"Expected a C-ordered uint8 array, got {dtype}{order}")
+    return frames_from_buffer(buffer, shape, offset=header.tell())
+
+
+def resize_frames(pixels: torch.Tensor, size: Tuple[int, int]) -> torch.Tensor:
+    """Antialiased bilinear resize of (N, 3, H, W) frames, in uint8 if supported"""
+    try:
+        return torch.nn.functional.interpolate(
+            pixels, size=size, mode="bilinear", align_corners=False, antialias=True
+        )
+    except RuntimeError:
+        # torch before 2.1 only resizes float tensors
+        return torch.nn.functional.interpolate(
+            pixels.float(),
+            size=size,
+            mode="bilinear",
+            align_corners=False,
+            antialias=True,
+        )
+
+
+def preprocess_frames(
+    frames: torch.Tensor,
+    resolution: Tuple[int, int],
+    image_mean: Sequence[float],
+    image_std: Sequence[float],
+) -> Dict[str, torch.Tensor]:
+    """
+    Resize and normalize raw frames into model inputs, without PIL
+
+    Args:
+        frames: (count, height, width, 3) uint8 RGB frames
+        resolution: (shortest_edge, longest_edge) to resize to
+        image_mean: Per-channel mean on the 0-1 scale
+        image_std: Per-channel standard deviation on the 0-1 scale
+
+    Returns:
+        Dict with "pixel_values" (N, 3, H, W) float32 and "pixel_mask" (N, H, W) int64
+    """
+    count, height, width, _ = frames.shape
+    image_width, image_height = resized_size((width, height), resolution)
+
+    pixels = frames.permute(0, 3, 1, 2)
+    if (image_width, image_height) != (width, height):
+        pixels = resize_frames(pixels, (image_height, image_width))
+    # A float32 input from the fallback resize is used as is, without a copy
+    pixel_values = pixels.to(torch.float32, memory_format=torch.contiguous_format)
+
+    mean = torch.tensor(image_mean, dtype=torch.float32).view(3, 1, 1) * 255.0
+    std = torch.tensor(image_std, dtype=torch.float32).view(3, 1, 1) * 255.0
+    pixel_values.sub_(mean).div_(std)
+
+    pixel_mask = torch.ones((count, image_height, image_width), dtype=torch.int64)
+    return {"pixel_values": pixel_values, "pixel_mask": pixel_mask}
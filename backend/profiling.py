@@ -0,0 +1,108 @@
+"""Sampled profiling of inference work with cProfile or torch.profiler"""
+
+import cProfile
+import glob
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_MODES = ("cprofile", "torch")
+
+
+class ProfileSampler:
+    """Pick one in every N requests for profiling and write their profiles"""
+
+    def __init__(
+        self,
+        every_n: int = 0,
+        mode: str = "cprofile",
+        output_dir: str = "./profiles",
+        keep: int = 20,
+    ):
+        """
+        Args:
+            every_n: Profile one request in every_n (0 disables profiling)
+            mode: "cprofile" or "torch"
+            output_dir: Directory profiles are written to
+            keep: Number of most recent profiles to keep
+        """
+        self.output_dir = output_dir
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        # Keeps profiles written in the same second apart
+        self._sequence = itertools.count(1)
+        self.configure(every_n, mode)
+
+    def configure(self, every_n: int, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode must be one of: {', '.join(PROFILE_MODES)}")
+        if every_n < 0:
+            raise ValueError("every_n must not be negative")
+        with self._lock:
+            self.every_n = every_n
+            self.mode = mode
+            self._counter = itertools.count(1)
+
+    def sample(self) -> bool:
+        """Return True for the request that should be profiled"""
+        if not self.every_n:
+            return False
+        with self._lock:
+            return next(self._counter) % self.every_n == 0
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the enclosed block; the yielded dict's "path" is set on exit"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            sequence = next(self._sequence)
+        stem = os.path.join(
+            self.output_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{sequence:06d}-{label}",
+        )
+        result = {"path": None}
+
+        if self.mode == "torch":
+            import torch
+
+            with torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+            ) as profiler:
+                yield result
+            result["path"] = f"{stem}.json"
+            profiler.export_chrome_trace(result["path"])
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+            result["path"] = f"{stem}.prof"
+            profiler.dump_stats(result["path"])
+
+        self._prune()
+
+    def _prune(self):
+        """Delete all but the newest `keep` profiles"""
+        paths = sorted(
+            glob.glob(os.path.join(self.output_dir, "*.prof"))
+            + glob.glob(os.path.join(self.output_dir, "*.json")),
+            key=os.path.getmtime,
+        )
+        for path in paths[: -self.keep] if self.keep > 0 else []:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "every_n": self.every_n,
+            "mode": self.mode,
+            "output_dir": self.output_dir,
+            "keep": self.keep,
+        }
@@ -0,0 +1,221 @@
+"""Registry of detection models loaded on demand and evicted LRU"""
+
+import itertools
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Labels transformers generates when a config has no label map
+GENERATED_LABEL = re.compile(r"^LABEL_\d+$")
+
+
+class UnknownModelError(KeyError):
+    """Raised when a request names a model that is not configured"""
+
+    def __str__(self):
+        return self.args[0]
+
+
+@dataclass
+class Detector:
+    """A loaded model with everything needed to run and label it"""
+
+    name: str
+    model: Any
+    processor: Any
+    classes: List[str]  # Class name per label id
+    variant: str  # Identifies the weights/backend/precision, for cache keys
+    memory_bytes: int = 0
+    load_seconds: float = 0.0
+    last_used: float = field(default_factory=time.time)
+
+    def class_name(self, label: int) -> str:
+        return self.classes[label] if label < len(self.classes) else f"class_{label}"
+
+
+def model_memory_bytes(model) -> int:
+    """Bytes held by a PyTorch model's parameters and buffers (0 for other backends)"""
+    if not isinstance(model, torch.nn.Module):
+        return 0
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for tensor in itertools.chain(model.parameters(), model.buffers())
+    )
+
+
+def classes_from_config(config, fallback: List[str]) -> List[str]:
+    """Class names indexed by label id from a model config's id2label"""
+    id2label = getattr(config, "id2label", None) or {}
+    # transformers names the labels LABEL_n when a config has no label map
+    if not id2label or all(
+        GENERATED_LABEL.match(str(label)) for label in id2label.values()
+    ):
+        return list(fallback)
+    id2label = {int(label_id): label for label_id, label in id2label.items()}
+    # Missing ids are named "N/A", like the gaps in COCO's 91 ids
+    return [id2label.get(label_id, "N/A") for label_id in range(max(id2label) + 1)]
+
+
+class ModelRegistry:
+    """Configured models by name, loaded lazily and evicted LRU under a memory budget"""
+
+    def __init__(
+        self,
+        sources: Dict[str, str],
+        default: str,
+        loader: Callable[[str, str], Detector],
+        memory_budget_bytes: int = 0,
+    ):
+        """
+        Args:
+            sources: Model name -> model id or local path, including the default
+            default: Name of the default model, registered with register() once
+                loaded and never evicted
+            loader: Loads and warms up a model, given its name and source
+            memory_budget_bytes: Unload least recently used models above this
+                many bytes of weights (0 for no limit)
+        """
+        self.sources = dict(sources)
+        self.default = default
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[str, Detector]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+
+    def names(self) -> List[str]:
+        return list(self.sources)
+
+    def register(self, detector: Detector) -> Detector:
+        """Add an already loaded model (such as the default one)"""
+        detector.memory_bytes = detector.memory_bytes or model_memory_bytes(
+            detector.model
+        )
+        with self._lock:
+            self._loaded[detector.name] = detector
+            self._loaded.move_to_end(detector.name)
+            self._evict(keep=detector.name)
+        return detector
+
+    def loaded_names(self) -> List[str]:
+        """Loaded models, least recently used first"""
+        with self._lock:
+            return list(self._loaded)
+
+    def loaded(self, name: str) -> Optional[Detector]:
+        """The model if it is loaded, without loading it"""
+        with self._lock:
+            return self._loaded.get(name)
+
+    def get(self, name: str) -> Detector:
+        """
+        Return a model, loading it first if needed (blocks while it loads)
+
+        Raises:
+            UnknownModelError: If the name is not configured
+        """
+        with self._lock:
+            detector = self._loaded.get(name)
+            if detector is not None:
+                self._loaded.move_to_end(name)
+                detector.last_used = time.time()
+                return detector
+            if name not in self.sources:
+                raise UnknownModelError(
+                    f"Unknown model {name!r}; available: {', '.join(self.sources)}"
+                )
+
+            future = self._loading.get(name)
+            loading = future is None
+            if loading:
+                future = self._loading[name] = Future()
+
+        if not loading:
+            return future.result()
+
+        try:
+            start = time.perf_counter()
+            detector = self.loader(name, self.sources[name])
+            detector.load_seconds = time.perf_counter() - start
+            detector.memory_bytes = detector.memory_bytes or model_memory_bytes(
+                detector.model
+            )
+        except BaseException as e:
+            with self._lock:
+                del self._loading[name]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[name]
+            self._loaded[name] = detector
+            self._evict(keep=name)
+        future.set_result(detector)
+        megabytes = detector.memory_bytes / 1e6
+        logger.info(
+            f"Loaded model {name} in {detector.load_seconds:.1f}s ({megabytes:.0f}MB)"
+        )
+        return detector
+
+    def _evict(self, keep: str):
+        """Unload least recently used models until within budget (lock held)"""
+        if not self.memory_budget_bytes:
+            return
+        for name in list(self._loaded):
+            if self.memory_bytes() <= self.memory_budget_bytes:
+                return
+            if name in (self.default, keep):
+                continue
+            detector = self._loaded.pop(name)
+            self.evictions += 1
+            megabytes = detector.memory_bytes / 1e6
+            logger.info(
+                f"Unloaded model {name} ({megabytes:.0f}MB) to stay within the budget"
+            )
+
+    def memory_bytes(self) -> int:
+        return sum(detector.memory_bytes for detector in self._loaded.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "default": self.default,
+                "memory_bytes": self.memory_bytes(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "evictions": self.evictions,
+                "models": [
+                    {
+                        "name": name,
+                        "source": source,
+                        "loaded": name in self._loaded,
+                        "loading": name in self._loading,
+                        "memory_bytes": (
+                            self._loaded[name].memory_bytes
+                            if name in self._loaded
+                            else None
+                        ),
+                        "load_seconds": (
+                            self._loaded[name].load_seconds
+                            if name in self._loaded
+                            else None
+                        ),
+                        "classes": (
+                            len(self._loaded[name].classes)
+                            if name in self._loaded
+                            else None
+                        ),
+                    }
+                    for name, source in self.sources.items()
+                ],
+            }
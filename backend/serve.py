@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Production server: load the model once into shared memory, then fork workers
+Example: python backend/serve.py --workers 4 --threads 2
+"""
+
+import argparse
+import gc
+import itertools
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import torch
+import uvicorn
+
+import main
+from tuning import apply_thread_settings
+
+logger = logging.getLogger("serve")
+
+
+def available_cpus() -> list:
+    """CPUs this process may run on (respects container CPU sets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def share_model_memory(model) -> int:
+    """
+    Move a module's parameters and buffers into shared memory
+
+    Returns:
+        Number of bytes moved
+    """
+    if not isinstance(model, torch.nn.Module):
+        return 0
+
+    nbytes = 0
+    for tensor in itertools.chain(model.parameters(), model.buffers()):
+        tensor.share_memory_()
+        nbytes += tensor.element_size() * tensor.nelement()
+
+    packed_bytes = packed_weight_bytes(model)
+    if packed_bytes:
+        logger.warning(
+            f"{packed_bytes / 1024 / 1024:.1f}MB of packed int8 weights can't be "
+            "moved to shared memory; workers share them copy-on-write only and may "
+            "end up with their own copies"
+        )
+    return nbytes
+
+
+def packed_weight_bytes(model: torch.nn.Module) -> int:
+    """Bytes of weights and biases held in quantized layers' packed params"""
+    nbytes = 0
+    for module in model.modules():
+        packed = getattr(module, "_packed_params", None)
+        if packed is None or not hasattr(packed, "_weight_bias"):
+            continue
+        for tensor in packed._weight_bias():
+            if tensor is not None:
+                nbytes += tensor.element_size() * tensor.nelement()
+    return nbytes
+
+
+def run_worker(listener: socket.socket, args: argparse.Namespace, cpus: list):
+    """Serve requests in a forked worker until it is told to stop"""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    apply_thread_settings(args.threads, args.interop_threads)
+
+    config = uvicorn.Config(
+        main.app, log_level=args.log_level, timeout_keep_alive=args.keep_alive
+    )
+    uvicorn.Server(config).run(sockets=[listener])
+
+
+def spawn_worker(
+    index: int, listener: socket.socket, args: argparse.Namespace, cpus: list
+) -> int:
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            run_worker(listener, args, cpus)
+        except Exception:
+            logger.exception(f"Worker {index} crashed")
+            status = 1
+        finally:
+            # Skip the parent's atexit handlers and buffered output
+            os._exit(status)
+
+    logger.info(
+        f"Started worker {index} (pid {pid}, {args.threads} torch thread(s)"
+        f"{', cpus ' + ','.join(map(str, cpus)) if cpus else ''})"
+    )
+    return pid
+
+
+def main_loop(args: argparse.Namespace):
+    cpus = available_cpus()
+    profile = main.read_tuning_profile()
+    if profile is not None:
+        logger.info(
+            f"Tuning profile from {profile.tuned_at}: {profile.workers} worker(s) x "
+            f"{profile.torch_threads} thread(s), batch size {profile.batch_size}"
+        )
+    if args.workers <= 0:
+        args.workers = profile.workers if profile else max(1, len(cpus) // 2)
+    if args.threads <= 0:
+        args.threads = (
+            profile.torch_threads if profile else max(1, len(cpus) // args.workers)
+        )
+    if args.interop_threads <= 0:
+        args.interop_threads = profile.interop_threads if profile else 1
+    # The inter-op pool can only be sized once; load_models() sizes it before
+    # the fork and the workers inherit it
+    main.TORCH_INTEROP_THREADS = args.interop_threads
+
+    # ONNX Runtime starts its thread pools when the session is created, and
+    # they don't survive a fork, so those workers load their own session.
+    if main.INFERENCE_BACKEND != "onnx":
+        start = time.perf_counter()
+        main.load_models()
+        main.startup_status["load_seconds"] = time.perf_counter() - start
+        shared = share_model_memory(main.model)
+        logger.info(
+            f"Preloaded model in {main.startup_status['load_seconds']:.1f}s "
+            f"({shared / 1024 / 1024:.0f}MB of weights shared with workers)"
+        )
+    else:
+        logger.warning(
+            "INFERENCE_BACKEND=onnx: every worker loads its own ONNX Runtime session"
+        )
+
+    listener = socket.socket(
+        socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM
+    )
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(args.backlog)
+    listener.set_inheritable(True)
+
+    # Objects allocated so far are never collected, so the collector doesn't
+    # touch (and copy) their pages in every worker
+    gc.freeze()
+
+    def worker_cpus(index):
+        if not args.pin_cpus:
+            return []
+        start = (index * args.threads) % len(cpus)
+        return [cpus[(start + offset) % len(cpus)] for offset in range(args.threads)]
+
+    children = {}
+    for index in range(args.workers):
+        children[spawn_worker(index, listener, args, worker_cpus(index))] = index
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(
+        f"🚀 Serving on http://{args.host}:{args.port} with {args.workers} worker(s)"
+    )
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+
+        exit_code = os.waitstatus_to_exitcode(status)
+        logger.warning(
+            f"Worker {index} (pid {pid}) exited with status {exit_code}, restarting"
+        )
+        time.sleep(1)
+        children[spawn_worker(index, listener, args, worker_cpus(index))] = index
+
+    listener.close()
+    logger.info("🛑 All workers stopped")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve the detection API from preforked workers sharing one model"
+    )
+    parser.add_argument(
+        "--host", default=os.getenv("HOST", "0.0.0.0"), help="Bind address"
+    )
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("PORT", "8000")), help="Bind port"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("SERVER_WORKERS", "0")),
+        help="Worker processes (default: tuning profile, or half the available CPUs)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=int(os.getenv("TORCH_THREADS_PER_WORKER", "0")),
+        help="Torch threads per worker (default: tuning profile, or CPUs / workers)",
+    )
+    parser.add_argument(
+        "--interop-threads",
+        type=int,
+        default=int(os.getenv("TORCH_INTEROP_THREADS", "0")),
+        help="Torch inter-op threads per worker (default: tuning profile, or 1)",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        default=os.getenv("PIN_WORKER_CPUS", "0") == "1",
+        help="Pin each worker to its own set of --threads CPUs",
+    )
+    parser.add_argument("--backlog", type=int, default=2048, help="Listen backlog")
+    parser.add_argument(
+        "--keep-alive", type=int, default=5, help="Keep-alive timeout in seconds"
+    )
+    parser.add_argument("--log-level", default="info", help="Uvicorn log level")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if not hasattr(os, "fork"):
+        logger.error(
+            "❌ serve.py needs os.fork(); use uvicorn directly on this platform"
+        )
+        sys.exit(1)
+    main_loop(parse_args())
@@ -0,0 +1,421 @@
+"""Persistent, indexed store of detection results"""
+
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    image_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    source TEXT NOT NULL,
+    filename TEXT,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    detections INTEGER NOT NULL,
+    detected_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS images_hash ON images (image_hash, model);
+CREATE TABLE IF NOT EXISTS detections (
+    image_id INTEGER NOT NULL,
+    class_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    xmin REAL NOT NULL,
+    ymin REAL NOT NULL,
+    xmax REAL NOT NULL,
+    ymax REAL NOT NULL,
+    area REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_class
+    ON detections (class_id, score, area, image_id);
+CREATE INDEX IF NOT EXISTS detections_image ON detections (image_id);
+CREATE TABLE IF NOT EXISTS model_classes (
+    model TEXT NOT NULL,
+    class_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (model, class_id)
+);
+"""
+
+# Chunk size used to hash job images read from disk
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class StoredResult:
+    """A detection result waiting to be written"""
+
+    model: str
+    classes: Sequence[str]
+    source: str  # "detect", "detect-batch" or "job:<id>"
+    filename: Optional[str]
+    image_size: Tuple[int, int]  # (width, height)
+    result: Dict[str, torch.Tensor]  # Raw post-processed output
+    image_hash: Optional[str] = None
+    path: Optional[str] = None  # File to hash when image_hash is not known yet
+    detected_at: float = 0.0
+
+
+@dataclass
+class SearchQuery:
+    """Images with min_count to max_count detections matching every filter"""
+
+    class_ids: Optional[List[int]] = None
+    min_score: float = 0.0
+    max_score: Optional[float] = None
+    min_area: Optional[float] = None
+    max_area: Optional[float] = None
+    min_count: int = 1
+    max_count: Optional[int] = None
+    model: Optional[str] = None
+    image_hash: Optional[str] = None
+    offset: int = 0
+    limit: int = 50
+    include_detections: bool = True
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file, matching the upload hash of the same bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DetectionStore:
+    """SQLite store of detection results, written in bulk by a background thread"""
+
+    def __init__(
+        self,
+        path: str,
+        min_score: float = 0.3,
+        max_queue: int = 10000,
+        max_batch: int = 1000,
+    ):
+        """
+        Args:
+            path: SQLite database file
+            min_score: Detections scoring lower are not stored
+            max_queue: Results waiting to be written before new ones are dropped
+            max_batch: Most results written in one transaction
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.min_score = min_score
+        self.max_batch = max_batch
+
+        self._queue: "queue.Queue[Optional[StoredResult]]" = queue.Queue(
+            maxsize=max_queue
+        )
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript(SCHEMA)
+        self._writer = self._connect()
+        self._known_models = set()
+
+        # Metrics
+        self.stored_images = 0
+        self.stored_detections = 0
+        self.dropped = 0
+        self.write_batches = 0
+        self.write_seconds = 0.0
+        self.last_error = None
+
+        # Started last, as the writer uses everything above
+        self._thread = threading.Thread(
+            target=self._run, name="result-store-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        db.row_factory = sqlite3.Row
+        # WAL lets searches run while the writer commits
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def add(self, record: StoredResult) -> bool:
+        """Queue a result for writing; False if the queue is full and it was dropped"""
+        record.detected_at = record.detected_at or time.time()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float = 30.0):
+        """Write everything queued, then stop the writer"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._writer.close()
+        with self._read_lock:
+            self._reader.close()
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            # Take whatever else queued up while the last batch was written
+            while records[-1] is not None and len(records) < self.max_batch:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = records[-1] is None
+            records = [record for record in records if record is not None]
+            if records:
+                try:
+                    self._write(records)
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(
+                        f"Could not store {len(records)} detection result(s): {e}"
+                    )
+            if stopping:
+                return
+
+    def _rows(self, record: StoredResult) -> List[Tuple]:
+        """Detection rows (without image id) scoring at least min_score"""
+        keep = record.result["scores"] >= self.min_score
+        boxes = record.result["boxes"][keep]
+        areas = (boxes[:, 2] - boxes[:, 0]).clamp(min=0) * (
+            boxes[:, 3] - boxes[:, 1]
+        ).clamp(min=0)
+        return [
+            (label, score, *box, area)
+            for label, score, box, area in zip(
+                record.result["labels"][keep].tolist(),
+                record.result["scores"][keep].tolist(),
+                boxes.tolist(),
+                areas.tolist(),
+            )
+        ]
+
+    def _write(self, records: List[StoredResult]):
+        started = time.perf_counter()
+        prepared = []
+        for record in records:
+            if record.image_hash is None:
+                try:
+                    record.image_hash = file_hash(record.path)
+                except OSError as e:
+                    logger.warning(f"Not storing results for {record.path}: {e}")
+                    continue
+            prepared.append((record, self._rows(record)))
+
+        db = self._writer
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for record, rows in prepared:
+                if record.model not in self._known_models:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO model_classes (model, class_id, name) "
+                        "VALUES (?, ?, ?)",
+                        [
+                            (record.model, class_id, name)
+                            for class_id, name in enumerate(record.classes)
+                        ],
+                    )
+                previous = db.execute(
+                    "SELECT id FROM images WHERE image_hash = ? AND model = ?",
+                    (record.image_hash, record.model),
+                ).fetchone()
+                if previous is not None:
+                    db.execute(
+                        "DELETE FROM detections WHERE image_id = ?", (previous["id"],)
+                    )
+                    db.execute("DELETE FROM images WHERE id = ?", (previous["id"],))
+                image_id = db.execute(
+                    "INSERT INTO images (image_hash, model, source, filename, width, "
+                    "height, detections, detected_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record.image_hash,
+                        record.model,
+                        record.source,
+                        record.filename,
+                        record.image_size[0],
+                        record.image_size[1],
+                        len(rows),
+                        record.detected_at,
+                    ),
+                ).lastrowid
+                db.executemany(
+                    "INSERT INTO detections (image_id, class_id, score, xmin, ymin, "
+                    "xmax, ymax, area) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(image_id, *row) for row in rows],
+                )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+        self._known_models.update(record.model for record, _ in prepared)
+        self.stored_images += len(prepared)
+        self.stored_detections += sum(len(rows) for _, rows in prepared)
+        self.write_batches += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def class_ids(self, name: str, model: Optional[str] = None) -> List[int]:
+        """Class ids stored under a class name (in one model, or any)"""
+        sql = "SELECT DISTINCT class_id FROM model_classes WHERE name = ?"
+        params = [name]
+        if model:
+            sql += " AND model = ?"
+            params.append(model)
+        with self._read_lock:
+            return [row["class_id"] for row in self._reader.execute(sql, params)]
+
+    def search(self, query: SearchQuery) -> Dict[str, Any]:
+        """
+        Find images by their detections, newest first
+
+        Returns:
+            Dict with "results" (one entry per image with its matching
+            detections) and "next_offset" (None on the last page)
+        """
+        if query.class_ids is not None and not query.class_ids:
+            # A class name no stored model has
+            return {"results": [], "next_offset": None}
+        conditions = ["d.score >= ?"]
+        params: List[Any] = [max(query.min_score, self.min_score)]
+        if query.class_ids is not None:
+            conditions.append(
+                f"d.class_id IN ({', '.join('?' * len(query.class_ids))})"
+            )
+            params.extend(query.class_ids)
+        if query.max_score is not None:
+            conditions.append("d.score <= ?")
+            params.append(query.max_score)
+        if query.min_area is not None:
+            conditions.append("d.area >= ?")
+            params.append(query.min_area)
+        if query.max_area is not None:
+            conditions.append("d.area <= ?")
+            params.append(query.max_area)
+        image_filters = []
+        if query.model:
+            image_filters.append(("model", query.model))
+        if query.image_hash:
+            image_filters.append(("image_hash", query.image_hash))
+        for column, value in image_filters:
+            conditions.append(
+                f"d.image_id IN (SELECT id FROM images WHERE {column} = ?)"
+            )
+            params.append(value)
+        where = " AND ".join(conditions)
+
+        having = "COUNT(*) >= ?"
+        having_params = [max(1, query.min_count)]
+        if query.max_count is not None:
+            having += " AND COUNT(*) <= ?"
+            having_params.append(query.max_count)
+
+        with self._read_lock:
+            matches = self._reader.execute(
+                "SELECT d.image_id, COUNT(*) AS matches FROM detections d "
+                f"WHERE {where} GROUP BY d.image_id HAVING {having} "
+                "ORDER BY d.image_id DESC LIMIT ? OFFSET ?",
+                params + having_params + [query.limit + 1, query.offset],
+            ).fetchall()
+            has_more = len(matches) > query.limit
+            matches = matches[: query.limit]
+            image_ids = [row["image_id"] for row in matches]
+            placeholders = ", ".join("?" * len(image_ids))
+
+            images = {
+                row["id"]: row
+                for row in self._reader.execute(
+                    f"SELECT * FROM images WHERE id IN ({placeholders})", image_ids
+                )
+            }
+            detections: Dict[int, List[sqlite3.Row]] = {}
+            if query.include_detections and image_ids:
+                for row in self._reader.execute(
+                    f"SELECT d.* FROM detections d WHERE {where} "
+                    f"AND d.image_id IN ({placeholders}) "
+                    "ORDER BY d.image_id, d.score DESC",
+                    params + image_ids,
+                ):
+                    detections.setdefault(row["image_id"], []).append(row)
+            class_names = self._class_names({row["model"] for row in images.values()})
+
+        results = []
+        for match in matches:
+            image = images[match["image_id"]]
+            entry = {
+                "image_hash": image["image_hash"],
+                "filename": image["filename"],
+                "source": image["source"],
+                "model": image["model"],
+                "image_size": {"width": image["width"], "height": image["height"]},
+                "detected_at": image["detected_at"],
+                "total_detections": image["detections"],
+                "matches": match["matches"],
+            }
+            if query.include_detections:
+                names = class_names.get(image["model"], {})
+                entry["detections"] = [
+                    {
+                        "class": names.get(row["class_id"], f"class_{row['class_id']}"),
+                        "class_id": row["class_id"],
+                        "confidence": row["score"],
+                        "bbox": {
+                            "xmin": row["xmin"],
+                            "ymin": row["ymin"],
+                            "xmax": row["xmax"],
+                            "ymax": row["ymax"],
+                        },
+                        "area": row["area"],
+                    }
+                    for row in detections.get(image["id"], [])
+                ]
+            results.append(entry)
+
+        return {
+            "results": results,
+            "next_offset": query.offset + query.limit if has_more else None,
+        }
+
+    def _class_names(self, models) -> Dict[str, Dict[int, str]]:
+        """Class names per model (call with the read lock held)"""
+        models = list(models)
+        names: Dict[str, Dict[int, str]] = {}
+        if models:
+            placeholders = ", ".join("?" * len(models))
+            for row in self._reader.execute(
+                f"SELECT * FROM model_classes WHERE model IN ({placeholders})", models
+            ):
+                names.setdefault(row["model"], {})[row["class_id"]] = row["name"]
+        return names
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "min_score": self.min_score,
+            "queue_depth": self._queue.qsize(),
+            "stored_images": self.stored_images,
+            "stored_detections": self.stored_detections,
+            "dropped": self.dropped,
+            "write_batches": self.write_batches,
+            "avg_batch_write_ms": (
+                round(self.write_seconds / self.write_batches * 1000.0, 2)
+                if self.write_batches
+                else 0.0
+            ),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,275 @@
+"""Incremental multipart parsing and streamed response encoding"""
+
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+
+from serialization import json_dumps
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartError(Exception):
+    """Raised when a streamed multipart body is malformed"""
+
+
+class UploadLimitError(MultipartError):
+    """Raised when a streamed body has more bytes or files than allowed"""
+
+
+@dataclass
+class StreamedFile:
+    """A single file part read from a multipart body"""
+
+    field_name: str
+    filename: str
+    content_type: str
+    data: bytes
+    # Set instead of data when the part was larger than the size limit
+    error: Optional[str] = None
+
+
+class _PartCollector:
+    """MultipartParser callbacks that collect finished file parts"""
+
+    def __init__(self, max_part_bytes: Optional[int] = None):
+        self.max_part_bytes = max_part_bytes
+        self.finished: List[StreamedFile] = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._data: Optional[bytearray] = None
+        self._oversized = False
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._data = None
+        self._oversized = False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        # Only file parts are collected; plain form fields are skipped
+        if b"filename" in options:
+            self._data = bytearray()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._data is None or self._oversized:
+            return
+        self._data.extend(data[start:end])
+        # Oversized parts are dropped as they arrive instead of being buffered in full
+        if self.max_part_bytes and len(self._data) > self.max_part_bytes:
+            self._oversized = True
+            self._data = bytearray()
+
+    def on_part_end(self):
+        if self._data is None:
+            return
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        self.finished.append(
+            StreamedFile(
+                field_name=options.get(b"name", b"").decode("utf-8", "replace"),
+                filename=options[b"filename"].decode("utf-8", "replace"),
+                content_type=self._headers.get(
+                    b"content-type", b"application/octet-stream"
+                ).decode("latin-1"),
+                data=bytes(self._data),
+                error=(
+                    f"File exceeds the {self.max_part_bytes}-byte upload limit"
+                    if self._oversized
+                    else None
+                ),
+            )
+        )
+        self._data = None
+
+
+async def iter_multipart_files(
+    content_type: str,
+    body: AsyncIterator[bytes],
+    max_part_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    max_files: Optional[int] = None,
+) -> AsyncIterator[StreamedFile]:
+    """
+    Yield file parts from a multipart body as soon as each one is complete
+
+    Args:
+        content_type: The request's Content-Type header
+        body: Async iterator over the raw request body
+        max_part_bytes: Files larger than this are yielded without data and
+            with an error instead (None or 0 for no limit)
+        max_total_bytes: Largest body size (None or 0 for no limit)
+        max_files: Most file parts in the body (None or 0 for no limit)
+
+    Raises:
+        MultipartError: If the body is not valid multipart/form-data
+        UploadLimitError: If the body exceeds max_total_bytes or max_files
+    """
+    _, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise MultipartError("Missing boundary in multipart body")
+
+    collector = _PartCollector(max_part_bytes)
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": collector.on_part_begin,
+            "on_part_data": collector.on_part_data,
+            "on_part_end": collector.on_part_end,
+            "on_header_field": collector.on_header_field,
+            "on_header_value": collector.on_header_value,
+            "on_header_end": collector.on_header_end,
+            "on_headers_finished": collector.on_headers_finished,
+        },
+    )
+
+    def feed(chunk: Optional[bytes]):
+        try:
+            if chunk is None:
+                parser.finalize()
+            else:
+                parser.write(chunk)
+        except Exception as e:
+            raise MultipartError(f"Invalid multipart body: {e}")
+
+    received = 0
+    files = 0
+
+    def take_finished() -> StreamedFile:
+        nonlocal files
+        files += 1
+        if max_files and files > max_files:
+            raise UploadLimitError(f"Upload has more than {max_files} files")
+        return collector.finished.pop(0)
+
+    async for chunk in body:
+        received += len(chunk)
+        if max_total_bytes and received > max_total_bytes:
+            raise UploadLimitError(f"Upload exceeds the {max_total_bytes}-byte limit")
+        feed(chunk)
+        while collector.finished:
+            yield take_finished()
+    feed(None)
+
+    while collector.finished:
+        yield take_finished()
+
+
+@dataclass
+class SpooledPart:
+    """Where UploadSpool keeps one part: in memory (data) or in a segment file"""
+
+    length: int
+    data: Optional[bytes] = None
+    segment: Optional["_SpoolSegment"] = None
+    offset: int = 0
+
+
+class _SpoolSegment:
+    """One temporary file of an UploadSpool"""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+        self.parts = 0  # Parts written but not taken yet
+
+
+class UploadSpool:
+    """Upload parts waiting to be processed, in memory and then in temporary files"""
+
+    def __init__(self, max_memory_bytes: int, segment_bytes: int = 16 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.segment_bytes = segment_bytes
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self._segments: List[_SpoolSegment] = []
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes) -> SpooledPart:
+        """Add a part; called from a worker thread as it may write to disk"""
+        with self._lock:
+            if self.memory_bytes + len(data) <= self.max_memory_bytes:
+                self.memory_bytes += len(data)
+                return SpooledPart(len(data), data=data)
+
+            if not self._segments or self._segments[-1].size >= self.segment_bytes:
+                self._segments.append(_SpoolSegment())
+            segment = self._segments[-1]
+            part = SpooledPart(len(data), segment=segment, offset=segment.size)
+            segment.file.seek(segment.size)
+            segment.file.write(data)
+            segment.size += len(data)
+            segment.parts += 1
+            self.disk_bytes += len(data)
+            return part
+
+    def take(self, part: SpooledPart) -> bytes:
+        """Return a part's bytes, deleting its segment once all its parts are taken"""
+        with self._lock:
+            if part.segment is None:
+                self.memory_bytes -= part.length
+                return part.data
+
+            segment = part.segment
+            segment.file.seek(part.offset)
+            data = segment.file.read(part.length)
+            segment.parts -= 1
+            if segment.parts == 0:
+                self.disk_bytes -= segment.size
+                if segment is self._segments[-1]:
+                    segment.file.truncate(0)
+                    segment.size = 0
+                else:
+                    segment.file.close()
+                    self._segments.remove(segment)
+            return data
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                segment.file.close()
+            self._segments = []
+            self.disk_bytes = 0
+
+
+def encode_ndjson(payload: dict) -> bytes:
+    """Encode one newline-delimited JSON record"""
+    return json_dumps(payload) + b"\n"
+
+
+def encode_sse(payload: dict, event: str = "result") -> bytes:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: ".encode() + json_dumps(payload) + b"\n\n"
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """StreamingResponse for handlers that are still reading the request body"""
+
+    async def __call__(self, scope, receive, send):
+        # StreamingResponse would listen for a disconnect on receive, swallowing
+        # body chunks; the handler's body reader notices disconnects instead
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
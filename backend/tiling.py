@@ -0,0 +1,118 @@
+"""Tiled inference helpers for very large images"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from PIL import Image
+from torchvision.ops import batched_nms
+
+from imaging import ImageSource, open_image, to_rgb
+
+# (left, top, right, bottom) in decoded-image pixels
+TileBox = Tuple[int, int, int, int]
+
+
+def tile_starts(length: int, tile_size: int, stride: int) -> List[int]:
+    """Start offsets along one axis, with the last tile ending at the edge"""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size + 1, stride))
+    if starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+    return starts
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: float) -> List[TileBox]:
+    """
+    Cover an image with square tiles that overlap by a fraction of their size
+
+    Args:
+        width: Image width
+        height: Image height
+        tile_size: Tile side in pixels (tiles are smaller only when the image is)
+        overlap: Fraction of tile_size shared by neighbouring tiles
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (left, top, min(left + tile_size, width), min(top + tile_size, height))
+        for top in tile_starts(height, tile_size, stride)
+        for left in tile_starts(width, tile_size, stride)
+    ]
+
+
+def plan_tiles(
+    size: Tuple[int, int], tile_size: int, overlap: float, max_tiles: int
+) -> Tuple[float, List[TileBox]]:
+    """
+    Choose the decode scale and tile grid, scaling down to stay within max_tiles
+
+    Returns:
+        Tuple of (scale applied to the image, tiles in scaled-image pixels)
+    """
+    scale = 1.0
+    while True:
+        width = max(1, round(size[0] * scale))
+        height = max(1, round(size[1] * scale))
+        tiles = tile_grid(width, height, tile_size, overlap)
+        if len(tiles) <= max_tiles:
+            return scale, tiles
+        scale *= min(0.95, math.sqrt(max_tiles / len(tiles)))
+
+
+def decode_for_tiling(
+    source: ImageSource, scale: float, max_pixels: Optional[int] = None
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode an upload at the scale chosen by plan_tiles
+
+    Returns:
+        Tuple of (RGB image, original (width, height))
+
+    Raises:
+        ImageTooLargeError: If the image exceeds max_pixels
+    """
+    image = open_image(source, max_pixels)
+    original_size = image.size
+    if scale >= 1:
+        return to_rgb(image), original_size
+
+    target = (
+        max(1, round(original_size[0] * scale)),
+        max(1, round(original_size[1] * scale)),
+    )
+    if image.format == "JPEG":
+        image.draft("RGB", target)
+    image = to_rgb(image)
+    if image.size != target:
+        image = image.resize(target, Image.BILINEAR, reducing_gap=2.0)
+    return image, original_size
+
+
+def merge_detections(
+    results: List[Dict[str, torch.Tensor]],
+    offsets: List[Tuple[float, float]],
+    scale: float,
+    iou_threshold: float,
+) -> Dict[str, torch.Tensor]:
+    """
+    Map per-tile detections back to the original image and merge them with NMS
+
+    Args:
+        results: Raw results, with boxes relative to each tile
+        offsets: (left, top) of each tile in scaled-image pixels
+        scale: Scale the tiles were cut at
+        iou_threshold: IoU above which same-class boxes are merged
+    """
+    shifts = torch.tensor(
+        [[left, top, left, top] for left, top in offsets], dtype=torch.float32
+    )
+    boxes = (
+        torch.cat([result["boxes"] + shift for result, shift in zip(results, shifts)])
+        / scale
+    )
+    scores = torch.cat([result["scores"] for result in results])
+    labels = torch.cat([result["labels"] for result in results])
+
+    keep = batched_nms(boxes, scores, labels, iou_threshold)
+    return {"scores": scores[keep], "labels": labels[keep], "boxes": boxes[keep]}
@@ -0,0 +1,123 @@
+"""Measured runtime settings per host type"""
+
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Inter-op thread count already set in this process (it can only be set once)
+_interop_threads = None
+
+
+@dataclass
+class TuningProfile:
+    """The best settings measured on one host type"""
+
+    torch_threads: int  # Intra-op threads per worker
+    interop_threads: int
+    workers: int  # Worker processes (backend/serve.py)
+    batch_size: int  # MAX_BATCH_SIZE
+    images_per_second: float = 0.0
+    p95_ms: float = 0.0
+    host: Dict[str, Any] = field(default_factory=dict)
+    details: Dict[str, Any] = field(default_factory=dict)  # How it was measured
+    tuned_at: str = ""
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (respects container CPU sets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.partition(":")[2].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def host_signature(backend: str, precision: str) -> Dict[str, Any]:
+    """What the measured optimum depends on"""
+    return {
+        "cpu": cpu_model(),
+        "cpus": cpu_count(),
+        "torch": torch.__version__.split("+")[0],
+        "backend": backend,
+        "precision": precision,
+    }
+
+
+def host_key(signature: Dict[str, Any]) -> str:
+    return (
+        f"{signature['cpu']}|{signature['cpus']} cpus|torch {signature['torch']}|"
+        f"{signature['backend']}:{signature['precision']}"
+    )
+
+
+def read_profiles(path: str) -> Dict[str, Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("profiles", {})
+
+
+def load_profile(path: str, signature: Dict[str, Any]) -> Optional[TuningProfile]:
+    """The profile measured on this host type, or None"""
+    try:
+        entry = read_profiles(path).get(host_key(signature))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable tuning profile {path}: {e}")
+        return None
+    if entry is None:
+        return None
+    return TuningProfile(
+        **{
+            key: value
+            for key, value in entry.items()
+            if key in TuningProfile.__dataclass_fields__
+        }
+    )
+
+
+def save_profile(path: str, profile: TuningProfile):
+    """Store a profile under its host type, keeping other hosts' profiles"""
+    profiles = read_profiles(path)
+    profile.tuned_at = profile.tuned_at or time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    profiles[host_key(profile.host)] = asdict(profile)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=directory, suffix=".tmp", delete=False
+    ) as f:
+        json.dump({"profiles": profiles}, f, indent=2)
+    # Replaced atomically, so other processes never read a half-written file
+    os.replace(f.name, path)
+
+
+def apply_thread_settings(torch_threads: int, interop_threads: int):
+    """Set torch's intra-op and inter-op thread counts (0 keeps the current one)"""
+    global _interop_threads
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    # The inter-op pool can only be sized once, before it first runs
+    if interop_threads and interop_threads != _interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+            _interop_threads = interop_threads
+        except RuntimeError as e:
+            logger.warning(f"Could not set {interop_threads} inter-op thread(s): {e}")
@@ -0,0 +1,261 @@
+"""Frame sources, sampling and near-duplicate detection for video detection"""
+
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from imaging import to_rgb
+
+# Frame files picked up from zip archives
+FRAME_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+# (frame index, timestamp in seconds, function returning the decoded frame)
+FrameSource = Iterator[Tuple[int, float, Callable[[], Image.Image]]]
+
+
+class VideoDecodeError(Exception):
+    """Raised when an upload can't be read as a video or frame archive"""
+
+
+@dataclass
+class Frame:
+    """A sampled frame"""
+
+    index: int
+    timestamp: float
+    image: Optional[Image.Image]
+
+
+@dataclass
+class FrameBatch:
+    """Consecutive sampled frames and the ones among them that need inference"""
+
+    frames: List[Frame]
+    keyframes: List[int]
+    # Frame position of the keyframe each frame reuses (-1: the previous batch's last)
+    sources: List[int]
+
+
+def check_frame_pixels(width: int, height: int, max_pixels: Optional[int]):
+    if max_pixels and width * height > max_pixels:
+        raise VideoDecodeError(
+            f"Frames are {width}x{height}; "
+            f"the limit is {max_pixels / 1e6:.1f} megapixels"
+        )
+
+
+def iter_video_frames(
+    fileobj: BinaryIO, max_pixels: Optional[int] = None
+) -> FrameSource:
+    """
+    Decode the first video stream of a container frame by frame
+
+    Raises:
+        VideoDecodeError: If PyAV is missing, the file is not a readable video
+            or its frames have more than max_pixels pixels
+    """
+    try:
+        import av
+    except ImportError:
+        raise VideoDecodeError(
+            "Video decoding needs PyAV (pip install av); upload a zip of frames instead"
+        )
+
+    try:
+        container = av.open(fileobj, mode="r")
+    except Exception as e:
+        raise VideoDecodeError(f"Invalid video file: {e}")
+
+    with container:
+        if not container.streams.video:
+            raise VideoDecodeError("File has no video stream")
+        stream = container.streams.video[0]
+        check_frame_pixels(
+            stream.codec_context.width, stream.codec_context.height, max_pixels
+        )
+        stream.thread_type = "AUTO"
+        fallback_rate = float(stream.average_rate or 30)
+
+        try:
+            for index, frame in enumerate(container.decode(stream)):
+                timestamp = (
+                    float(frame.time)
+                    if frame.time is not None
+                    else index / fallback_rate
+                )
+                yield index, timestamp, frame.to_image
+        except av.error.FFmpegError as e:
+            raise VideoDecodeError(f"Error decoding video: {e}")
+
+
+def natural_key(name: str) -> list:
+    """Sort key that orders frame2.jpg before frame10.jpg"""
+    return [
+        int(part) if part.isdigit() else part.lower()
+        for part in re.split(r"(\d+)", name)
+    ]
+
+
+def iter_zip_frames(
+    fileobj: BinaryIO, source_fps: float, max_pixels: Optional[int] = None
+) -> FrameSource:
+    """
+    Read image members of a zip archive in natural filename order
+
+    Args:
+        fileobj: Seekable archive file
+        source_fps: Frame rate the sequence was captured at, for timestamps
+        max_pixels: Largest frame (width * height) accepted, checked before decoding
+
+    Raises:
+        VideoDecodeError: If the file is not a zip archive, holds no images or
+            a frame has more than max_pixels pixels
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise VideoDecodeError(f"Invalid zip file: {e}")
+
+    with archive:
+        names = sorted(
+            (
+                name
+                for name in archive.namelist()
+                if os.path.splitext(name)[1].lower() in FRAME_EXTENSIONS
+                and not name.startswith("__MACOSX/")
+            ),
+            key=natural_key,
+        )
+        if not names:
+            raise VideoDecodeError("Zip file contains no image frames")
+
+        def loader(name):
+            def load():
+                with archive.open(name) as member:
+                    image = Image.open(member)
+                    check_frame_pixels(image.width, image.height, max_pixels)
+                    image.load()
+                    return image
+
+            return load
+
+        for index, name in enumerate(names):
+            yield index, index / source_fps, loader(name)
+
+
+def sample_frames(
+    source: FrameSource,
+    every_n: int = 1,
+    target_fps: Optional[float] = None,
+    max_frames: Optional[int] = None,
+) -> Iterator[Frame]:
+    """
+    Keep every Nth frame, or frames spaced 1/target_fps seconds apart
+
+    Args:
+        source: Frames to sample from
+        every_n: Keep one frame in every_n (ignored when target_fps is set)
+        target_fps: Keep frames at about this rate, based on their timestamps
+        max_frames: Stop after this many sampled frames
+    """
+    next_time = None
+    sampled = 0
+
+    for index, timestamp, load in source:
+        if target_fps:
+            if next_time is not None and timestamp < next_time:
+                continue
+            step = 1.0 / target_fps
+            next_time = timestamp + step if next_time is None else next_time + step
+            while next_time <= timestamp:
+                next_time += step
+        elif index % every_n:
+            continue
+
+        yield Frame(index, timestamp, to_rgb(load()))
+        sampled += 1
+        if max_frames and sampled >= max_frames:
+            return
+
+
+def thumbnail(image: Image.Image, hash_size: int = 8) -> np.ndarray:
+    """Tiny grayscale copy of a frame used for hashing and pixel comparison"""
+    small = image.resize(
+        (hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0
+    ).convert("L")
+    return np.asarray(small, dtype=np.int16)
+
+
+def dhash(pixels: np.ndarray) -> int:
+    """Difference hash of a thumbnail, one bit per neighbouring-pixel comparison"""
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class DuplicateFilter:
+    """Flag frames that look the same as the last frame sent to the model"""
+
+    def __init__(self, max_distance: int, max_mean_diff: float = 8.0):
+        """
+        Args:
+            max_distance: Largest Hamming distance between dHashes that still
+                counts as a duplicate (negative disables deduplication)
+            max_mean_diff: Largest mean absolute thumbnail difference (0-255)
+                that still counts as a duplicate, to catch lighting changes
+        """
+        self.max_distance = max_distance
+        self.max_mean_diff = max_mean_diff
+        self._keyframe_pixels: Optional[np.ndarray] = None
+        self._keyframe_hash: Optional[int] = None
+
+    def is_duplicate(self, image: Image.Image) -> bool:
+        """Check a frame, making it the new reference when it is not a duplicate"""
+        if self.max_distance < 0:
+            return False
+
+        pixels = thumbnail(image)
+        frame_hash = dhash(pixels)
+        if (
+            self._keyframe_hash is not None
+            and (frame_hash ^ self._keyframe_hash).bit_count() <= self.max_distance
+            and np.abs(pixels - self._keyframe_pixels).mean() <= self.max_mean_diff
+        ):
+            return True
+        self._keyframe_pixels = pixels
+        self._keyframe_hash = frame_hash
+        return False
+
+
+def next_frame_batch(
+    frames: Iterator[Frame],
+    duplicates: DuplicateFilter,
+    max_keyframes: int,
+    max_frames: int,
+) -> Optional[FrameBatch]:
+    """
+    Pull sampled frames until max_keyframes need inference or max_frames were read
+
+    Returns:
+        The next batch, or None when the frames are exhausted
+    """
+    batch = FrameBatch(frames=[], keyframes=[], sources=[])
+    last_keyframe = -1
+
+    for frame in frames:
+        if duplicates.is_duplicate(frame.image):
+            frame.image = None
+        else:
+            last_keyframe = len(batch.frames)
+            batch.keyframes.append(last_keyframe)
+        batch.frames.append(frame)
+        batch.sources.append(last_keyframe)
+
+        if len(batch.keyframes) >= max_keyframes or len(batch.frames) >= max_frames:
+            break
+
+    return batch if batch.frames else None
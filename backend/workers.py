@@ -0,0 +1,61 @@
+"""Worker pools and admission control for CPU-bound request stages"""
+
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ServerBusyError(Exception):
+    """Raised when the in-flight request limit has been reached"""
+
+
+def create_executor(kind: str, max_workers: int) -> Executor:
+    """Create a thread pool, or a process pool using the spawn start method"""
+    if kind == "thread":
+        return ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="cpu-worker"
+        )
+    if kind == "process":
+        return ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    raise ValueError(
+        f"Unknown executor kind: {kind!r} (expected 'thread' or 'process')"
+    )
+
+
+class InFlightLimiter:
+    """Bound the number of images being processed at once"""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        """
+        Reserve capacity for count images (at most the whole limit)
+
+        Raises:
+            ServerBusyError: If the reservation would exceed the limit
+        """
+        count = min(count, self.max_in_flight)
+        with self._lock:
+            if self.in_flight + count > self.max_in_flight:
+                self.rejected += 1
+                raise ServerBusyError("Server is busy, please retry later")
+            self.in_flight += count
+        return count
+
+    def release(self, count: int = 1):
+        """Release capacity reserved by acquire"""
+        with self._lock:
+            self.in_flight -= count
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected_requests": self.rejected,
+        }
@@ -1,177 +1,357 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
-import requests
-import os
 import base64
-from werkzeug.utils import secure_filename
 import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+from flask import (
+    Flask,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_template,
+    url_for,
+)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-in-production'
+app.secret_key = "your-secret-key-change-in-production"
 
 # Configuration
-BACKEND_URL = "http://localhost:8000"
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000").rstrip("/")
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "10"))
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "3"))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3.05"))
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+UPLOAD_FOLDER = "uploads"
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "bmp", "webp"}
 
 # Create upload directory
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def create_backend_session():
+    """Build the pooled, retrying session used for every backend call"""
+    # Connection failures are retried for every method (nothing was sent yet),
+    # other failures only for idempotent GET/HEAD requests
+    retry = Retry(
+        total=BACKEND_RETRIES,
+        connect=BACKEND_RETRIES,
+        read=BACKEND_RETRIES,
+        status=BACKEND_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=BACKEND_POOL_SIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+backend = create_backend_session()
+
+# Last backend readiness answer, shared by all requests for HEALTH_CACHE_SECONDS
+_health = {"available": False, "checked_at": None}
+_health_lock = threading.Lock()
+
+
+def set_backend_health(available):
+    """Record what the backend's state is known to be"""
+    with _health_lock:
+        _health["available"] = available
+        _health["checked_at"] = time.monotonic()
+
+
+def forget_backend_health():
+    """Make the next health check ask the backend instead of reusing the last answer"""
+    with _health_lock:
+        _health["checked_at"] = None
+
 
 def check_backend_health():
-    """Check if backend is running"""
+    """Check if backend is ready, reusing an answer from the last few seconds"""
+    with _health_lock:
+        checked_at = _health["checked_at"]
+        if (
+            checked_at is not None
+            and time.monotonic() - checked_at < HEALTH_CACHE_SECONDS
+        ):
+            return _health["available"]
+
     try:
-        response = requests.get(f"{BACKEND_URL}/health", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+        response = backend.get(
+            f"{BACKEND_URL}/ready", timeout=(BACKEND_CONNECT_TIMEOUT, 5)
+        )
+        available = response.status_code == 200
+    except requests.exceptions.RequestException:
+        available = False
+
+    set_backend_health(available)
+    return available
+
+
+def iter_multipart(files, boundary, chunk_size=64 * 1024):
+    """
+    Encode uploads as a multipart/form-data body, one chunk at a time
+
+    Args:
+        files: (field name, filename, stream, content type) tuples
+        boundary: Multipart boundary string
+    """
+    # requests would read every file into memory to build the body
+    for field, filename, stream, content_type in files:
+        filename = filename.replace('"', "%22").replace("\r", "").replace("\n", "")
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type or "application/octet-stream"}\r\n\r\n'
+        ).encode()
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+def post_files(path, files, params, timeout, stream=False):
+    """Stream uploads to a backend endpoint over the pooled session"""
+    boundary = uuid.uuid4().hex
+    try:
+        response = backend.post(
+            f"{BACKEND_URL}{path}",
+            data=iter_multipart(files, boundary),
+            params=params,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=(BACKEND_CONNECT_TIMEOUT, timeout),
+            stream=stream,
+        )
+    except requests.exceptions.ConnectionError:
+        # A refused connection and a transfer that broke off midway look
+        # the same from here, so re-check readiness rather than assume the
+        # backend is down
+        forget_backend_health()
+        raise
+
+    return response
+
 
-@app.route('/')
+class StreamedBatch:
+    """Iterate over streamed backend results, keeping them for the export data"""
+
+    def __init__(self, response):
+        self.response = response
+        self.results = []
+
+    def __iter__(self):
+        try:
+            for line in self.response.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if item.get("done"):
+                    break
+                if "filename" not in item:
+                    # Errors reading the upload are reported as a failed row
+                    item = {
+                        "filename": "Upload",
+                        "success": False,
+                        "error": item.get("error", "Unknown error"),
+                    }
+                self.results.append(item)
+                yield item
+        except requests.exceptions.RequestException as e:
+            item = {
+                "filename": "Connection",
+                "success": False,
+                "error": f"Lost connection to backend: {e}",
+            }
+            self.results.append(item)
+            yield item
+        finally:
+            self.response.close()
+
+
+@app.route("/")
 def index():
     """Main page with upload form"""
     backend_status = check_backend_health()
-    return render_template('index.html', backend_status=backend_status)
+    return render_template("index.html", backend_status=backend_status)
+
 
-@app.route('/upload', methods=['POST'])
+@app.route("/upload", methods=["POST"])
 def upload_file():
     """Handle file upload and object detection"""
-    if 'file' not in request.files:
-        flash('No file selected')
+    if "file" not in request.files:
+        flash("No file selected")
         return redirect(request.url)
-    
-    file = request.files['file']
-    confidence_threshold = float(request.form.get('confidence', 0.7))
-    
-    if file.filename == '':
-        flash('No file selected')
-        return redirect(url_for('index'))
-    
+
+    file = request.files["file"]
+    confidence_threshold = float(request.form.get("confidence", 0.7))
+
+    if file.filename == "":
+        flash("No file selected")
+        return redirect(url_for("index"))
+
     if file and allowed_file(file.filename):
         try:
             # Check if backend is running
             if not check_backend_health():
-                flash('Backend service is not available. Please start the FastAPI backend.')
-                return redirect(url_for('index'))
-            
-            # Prepare file for API request
-            files = {'file': (file.filename, file.stream, file.content_type)}
-            data = {'confidence_threshold': confidence_threshold}
-            
-            # Send request to FastAPI backend
-            response = requests.post(
-                f"{BACKEND_URL}/detect",
-                files=files,
-                data=data,
-                timeout=30
+                flash(
+                    "Backend service is not available. "
+                    "Please start the FastAPI backend."
+                )
+                return redirect(url_for("index"))
+
+            # Stream the upload to the FastAPI backend
+            response = post_files(
+                "/detect",
+                [("file", file.filename, file.stream, file.content_type)],
+                params={"confidence_threshold": confidence_threshold},
+                timeout=30,
             )
-            
+
             if response.status_code == 200:
                 result = response.json()
-                return render_template('results.html', 
-                                     result=result, 
-                                     confidence_threshold=confidence_threshold)
+
+                # Display the uploaded bytes instead of having the backend
+                # send the image back
+                file.stream.seek(0)
+                encoded = base64.b64encode(file.stream.read()).decode()
+                image_data_url = f"data:{file.content_type};base64,{encoded}"
+                return render_template(
+                    "results.html",
+                    result=result,
+                    image_data_url=image_data_url,
+                    confidence_threshold=confidence_threshold,
+                )
             else:
-                error_detail = response.json().get('detail', 'Unknown error')
-                flash(f'Error processing image: {error_detail}')
-                return redirect(url_for('index'))
-                
+                error_detail = response.json().get("detail", "Unknown error")
+                flash(f"Error processing image: {error_detail}")
+                return redirect(url_for("index"))
+
         except requests.exceptions.Timeout:
-            flash('Request timed out. The image might be too large or the backend is busy.')
-            return redirect(url_for('index'))
+            flash(
+                "Request timed out. "
+                "The image might be too large or the backend is busy."
+            )
+            return redirect(url_for("index"))
         except requests.exceptions.ConnectionError:
-            flash('Cannot connect to backend service. Please ensure FastAPI backend is running.')
-            return redirect(url_for('index'))
+            flash(
+                "Cannot connect to backend service. "
+                "Please ensure FastAPI backend is running."
+            )
+            return redirect(url_for("index"))
         except Exception as e:
-            flash(f'Error: {str(e)}')
-            return redirect(url_for('index'))
+            flash(f"Error: {str(e)}")
+            return redirect(url_for("index"))
     else:
-        flash('Invalid file type. Please upload an image file.')
-        return redirect(url_for('index'))
+        flash("Invalid file type. Please upload an image file.")
+        return redirect(url_for("index"))
 
-@app.route('/batch-upload', methods=['POST'])
+
+@app.route("/batch-upload", methods=["POST"])
 def batch_upload():
     """Handle multiple file upload"""
-    if 'files' not in request.files:
-        flash('No files selected')
-        return redirect(url_for('index'))
-    
-    files = request.files.getlist('files')
-    confidence_threshold = float(request.form.get('confidence', 0.7))
-    
-    if not files or all(f.filename == '' for f in files):
-        flash('No files selected')
-        return redirect(url_for('index'))
-    
+    if "files" not in request.files:
+        flash("No files selected")
+        return redirect(url_for("index"))
+
+    files = request.files.getlist("files")
+    confidence_threshold = float(request.form.get("confidence", 0.7))
+
+    if not files or all(f.filename == "" for f in files):
+        flash("No files selected")
+        return redirect(url_for("index"))
+
     # Filter valid files
     valid_files = [f for f in files if f and allowed_file(f.filename)]
-    
+
     if not valid_files:
-        flash('No valid image files found')
-        return redirect(url_for('index'))
-    
+        flash("No valid image files found")
+        return redirect(url_for("index"))
+
     try:
         # Check if backend is running
         if not check_backend_health():
-            flash('Backend service is not available. Please start the FastAPI backend.')
-            return redirect(url_for('index'))
-        
-        # Prepare files for API request
-        files_data = []
-        for f in valid_files:
-            files_data.append(('files', (f.filename, f.stream, f.content_type)))
-        
-        data = {'confidence_threshold': confidence_threshold}
-        
-        # Send batch request to FastAPI backend
-        response = requests.post(
-            f"{BACKEND_URL}/detect-batch",
-            files=files_data,
-            data=data,
-            timeout=60
+            flash("Backend service is not available. Please start the FastAPI backend.")
+            return redirect(url_for("index"))
+
+        # Send batch request to the streaming FastAPI endpoint; the timeout
+        # applies between results rather than to the whole batch
+        response = post_files(
+            "/detect-batch/stream",
+            [("files", f.filename, f.stream, f.content_type) for f in valid_files],
+            params={"confidence_threshold": confidence_threshold},
+            timeout=60,
+            stream=True,
         )
-        
+
         if response.status_code == 200:
-            result = response.json()
-            return render_template('batch_results.html', 
-                                 result=result, 
-                                 confidence_threshold=confidence_threshold)
+            # Render result rows as the backend finishes each image
+            return app.response_class(
+                stream_template(
+                    "batch_results.html",
+                    batch=StreamedBatch(response),
+                    total_images=len(valid_files),
+                    confidence_threshold=confidence_threshold,
+                )
+            )
         else:
-            error_detail = response.json().get('detail', 'Unknown error')
-            flash(f'Error processing images: {error_detail}')
-            return redirect(url_for('index'))
-            
+            error_detail = response.json().get("detail", "Unknown error")
+            flash(f"Error processing images: {error_detail}")
+            return redirect(url_for("index"))
+
     except requests.exceptions.Timeout:
-        flash('Request timed out. Try uploading fewer or smaller images.')
-        return redirect(url_for('index'))
+        flash("Request timed out. Try uploading fewer or smaller images.")
+        return redirect(url_for("index"))
     except requests.exceptions.ConnectionError:
-        flash('Cannot connect to backend service. Please ensure FastAPI backend is running.')
-        return redirect(url_for('index'))
+        flash(
+            "Cannot connect to backend service. "
+            "Please ensure FastAPI backend is running."
+        )
+        return redirect(url_for("index"))
     except Exception as e:
-        flash(f'Error: {str(e)}')
-        return redirect(url_for('index'))
+        flash(f"Error: {str(e)}")
+        return redirect(url_for("index"))
+
 
-@app.route('/api/status')
+@app.route("/api/status")
 def api_status():
     """API endpoint to check backend status"""
     backend_status = check_backend_health()
-    return jsonify({
-        'backend_available': backend_status,
-        'frontend_status': 'running'
-    })
+    return jsonify({"backend_available": backend_status, "frontend_status": "running"})
+
 
 @app.errorhandler(413)
 def too_large(e):
     flash("File is too large. Please upload a smaller image.")
-    return redirect(url_for('index'))
+    return redirect(url_for("index"))
+
 
 @app.errorhandler(500)
 def internal_error(e):
     flash("An internal error occurred. Please try again.")
-    return redirect(url_for('index'))
+    return redirect(url_for("index"))
+
 
-if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+if __name__ == "__main__":
+    app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Measure the fastest thread, worker and batch-size settings for this host
+
+Example:
+    python scripts/autotune.py --duration 10 --max-p95-ms 2000
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+
+from benchmark import install_stub_model, parse_size, percentile
+from tuning import (
+    TuningProfile,
+    apply_thread_settings,
+    cpu_count,
+    host_signature,
+    save_profile,
+)
+
+
+def powers_of_two(limit):
+    """1, 2, 4, ... up to limit, plus limit itself"""
+    values = [1 << power for power in range(limit.bit_length()) if 1 << power <= limit]
+    return sorted(set(values + [limit]))
+
+
+def configurations(args, cpus):
+    """Grid points that don't use more threads than there are CPUs"""
+    return [
+        {
+            "workers": workers,
+            "torch_threads": threads,
+            "interop_threads": interop,
+            "batch_size": batch_size,
+        }
+        for workers, threads, interop, batch_size in itertools.product(
+            args.workers or powers_of_two(cpus),
+            args.threads or powers_of_two(cpus),
+            args.interop_threads,
+            args.batch_sizes,
+        )
+        if workers * threads <= cpus
+    ]
+
+
+def synthetic_images(count, size, seed=0):
+    """Noisy RGB images, so preprocessing does as much work as on photos"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    return [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def run_worker(backend, detector, config, args, start_barrier, results):
+    """Time batches in a forked worker and report (images, seconds, batch latencies)"""
+    try:
+        apply_thread_settings(config["torch_threads"], config["interop_threads"])
+        backend.MAX_BATCH_SIZE = config["batch_size"]
+        images = synthetic_images(config["batch_size"], args.image_size)
+        resolution = backend.resolve_resolution(args.shortest_edge, args.max_size)
+
+        for _ in range(args.warmup):
+            backend.run_inference(images, None, resolution, None, detector)
+
+        start_barrier.wait()
+        latencies = []
+        started = time.perf_counter()
+        while (
+            time.perf_counter() - started < args.duration
+            or len(latencies) < args.min_batches
+        ):
+            batch_started = time.perf_counter()
+            backend.run_inference(images, None, resolution, None, detector)
+            latencies.append(time.perf_counter() - batch_started)
+        results.put(
+            (
+                len(latencies) * config["batch_size"],
+                time.perf_counter() - started,
+                latencies,
+                None,
+            )
+        )
+    except Exception as e:
+        start_barrier.abort()
+        results.put((0, 0.0, [], f"{type(e).__name__}: {e}"))
+
+
+def measure(backend, detector, config, args):
+    """Run one grid point in fresh worker processes and summarize it"""
+    context = multiprocessing.get_context("fork")
+    start_barrier = context.Barrier(config["workers"])
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=run_worker,
+            args=(backend, detector, config, args, start_barrier, results),
+        )
+        for _ in range(config["workers"])
+    ]
+    for worker in workers:
+        worker.start()
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    errors = [error for _, _, _, error in reports if error]
+    if errors:
+        return {**config, "error": errors[0]}
+    latencies_ms = sorted(
+        latency * 1000.0 for _, _, latencies, _ in reports for latency in latencies
+    )
+    return {
+        **config,
+        "images_per_second": sum(images for images, _, _, _ in reports)
+        / max(seconds for _, seconds, _, _ in reports),
+        "p50_ms": percentile(latencies_ms, 0.50),
+        "p95_ms": percentile(latencies_ms, 0.95),
+        "batches": len(latencies_ms),
+    }
+
+
+def pick_best(runs, max_p95_ms):
+    """Highest throughput within the latency limit, else the lowest latency"""
+    measured = [run for run in runs if "error" not in run]
+    if not measured:
+        return None
+    eligible = [
+        run for run in measured if max_p95_ms is None or run["p95_ms"] <= max_p95_ms
+    ]
+    if not eligible:
+        print(
+            f"⚠️  No configuration met --max-p95-ms {max_p95_ms:g}; "
+            "using the one with the lowest p95"
+        )
+        return min(measured, key=lambda run: run["p95_ms"])
+    # Prefer fewer threads when throughput is within 2%
+    best_rate = max(run["images_per_second"] for run in eligible)
+    close = [run for run in eligible if run["images_per_second"] >= best_rate * 0.98]
+    return min(
+        close,
+        key=lambda run: (
+            run["workers"] * run["torch_threads"],
+            -run["images_per_second"],
+        ),
+    )
+
+
+def print_runs(runs, best):
+    print("\n📊 Results")
+    print("=" * 72)
+    print(
+        f"{'Workers':>8}{'Threads':>9}{'Inter-op':>10}{'Batch':>7}"
+        f"{'img/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+    )
+    for run in runs:
+        settings = (
+            f"{run['workers']:>8}{run['torch_threads']:>9}"
+            f"{run['interop_threads']:>10}{run['batch_size']:>7}"
+        )
+        if "error" in run:
+            print(f"{settings}   error: {run['error']}")
+            continue
+        marker = "  ⭐" if run is best else ""
+        print(
+            f"{settings}{run['images_per_second']:>10.2f}"
+            f"{run['p50_ms']:>10.1f}{run['p95_ms']:>10.1f}{marker}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the fastest thread/worker/batch settings for this host"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        help="Torch threads per worker to try (default: 1, 2, 4, ... CPUs)",
+    )
+    parser.add_argument(
+        "--interop-threads",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="Torch inter-op threads to try",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        help="Worker processes to try (default: 1, 2, 4, ... CPUs)",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Batch sizes to try",
+    )
+    parser.add_argument(
+        "--image-size",
+        type=parse_size,
+        default=(640, 480),
+        help="Synthetic image WIDTHxHEIGHT",
+    )
+    parser.add_argument(
+        "--shortest-edge",
+        type=int,
+        help="Inference resolution: shortest edge (default: server setting)",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="Inference resolution: longest edge (default: server setting)",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Seconds to time each configuration"
+    )
+    parser.add_argument(
+        "--min-batches", type=int, default=3, help="Batches each worker runs at least"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Untimed batches per worker first"
+    )
+    parser.add_argument(
+        "--max-p95-ms",
+        type=float,
+        help="Only pick configurations with a lower p95 batch latency",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Tuning profile to update (default: the backend's TUNING_PROFILE)",
+    )
+    parser.add_argument(
+        "--report", help="Also write every measured configuration to this JSON file"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Measure and print, but don't save the profile",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Backend environment setting, e.g. MODEL_PRECISION=int8 (repeatable)",
+    )
+    parser.add_argument(
+        "--stub-model",
+        action="store_true",
+        help="Use an instant stand-in model (pipeline testing)",
+    )
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("❌ autotune.py needs os.fork(), like backend/serve.py")
+        sys.exit(1)
+    for setting in args.set:
+        key, _, value = setting.partition("=")
+        os.environ[key] = value
+
+    # The backend reads its settings when imported
+    import main as backend
+
+    profile_path = args.profile or backend.TUNING_PROFILE
+    if not profile_path:
+        parser.error("TUNING_PROFILE is empty; pass --profile")
+    if args.stub_model and not args.profile and not args.dry_run:
+        # Timings of the stand-in model say nothing about the real one
+        print(
+            "ℹ️  --stub-model without --profile: measuring only, "
+            "the profile is not updated"
+        )
+        args.dry_run = True
+    # Measure from torch's defaults: no earlier profile, and the inter-op
+    # pool left unsized so each forked worker can size its own
+    backend.TUNING_PROFILE = ""
+    backend.TORCH_THREADS = backend.TORCH_INTEROP_THREADS = 0
+
+    if args.stub_model:
+        install_stub_model(backend)
+    print("Loading DETR model and processor...")
+    backend.load_models()
+    detector = backend.default_detector()
+
+    cpus = cpu_count()
+    grid = configurations(args, cpus)
+    if not grid:
+        print(f"❌ No configuration fits {cpus} CPU(s)")
+        sys.exit(1)
+    print(
+        f"🔬 Timing {len(grid)} configuration(s) on {cpus} CPU(s), "
+        f"{args.duration:g}s each..."
+    )
+
+    runs = []
+    for config in grid:
+        print(
+            f"🔄 {config['workers']} worker(s) x {config['torch_threads']} thread(s), "
+            f"{config['interop_threads']} inter-op, batch {config['batch_size']}..."
+        )
+        runs.append(measure(backend, detector, config, args))
+
+    best = pick_best(runs, args.max_p95_ms)
+    print_runs(runs, best)
+    if best is None:
+        print("\n❌ Every configuration failed")
+        sys.exit(1)
+
+    signature = host_signature(backend.INFERENCE_BACKEND, backend.MODEL_PRECISION)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"host": signature, "runs": runs, "best": best}, f, indent=2)
+        print(f"\n✅ Report written to {args.report}")
+    if args.dry_run:
+        return
+
+    resolution = backend.resolve_resolution(args.shortest_edge, args.max_size)
+    save_profile(
+        profile_path,
+        TuningProfile(
+            torch_threads=best["torch_threads"],
+            interop_threads=best["interop_threads"],
+            workers=best["workers"],
+            batch_size=best["batch_size"],
+            images_per_second=round(best["images_per_second"], 3),
+            p95_ms=round(best["p95_ms"], 1),
+            host=signature,
+            details={
+                "model": backend.MODEL_PATH or backend.MODEL_ID,
+                "stub_model": args.stub_model,
+                "image_size": list(args.image_size),
+                "resolution": list(resolution),
+                "duration": args.duration,
+                "max_p95_ms": args.max_p95_ms,
+                "configurations": len(grid),
+            },
+        ),
+    )
+    print(
+        f"\n✅ Best: {best['workers']} worker(s) x {best['torch_threads']} "
+        f"thread(s), batch {best['batch_size']} "
+        f"({best['images_per_second']:.2f} images/s, p95 {best['p95_ms']:.0f}ms). "
+        f"Saved to {profile_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
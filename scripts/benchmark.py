@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Load-test the detection API and report latency, throughput and resource use
+
+Examples:
+    python scripts/benchmark.py --stub-model --concurrency 1 8 32 --output bench.json
+    python scripts/benchmark.py --url http://localhost:8000 --endpoint detect-batch
+    python scripts/benchmark.py --stub-model --baseline bench.json --max-regression 0.1
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(PROJECT_ROOT, "backend")
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+
+def parse_size(value):
+    """Parse WIDTHxHEIGHT (e.g. 1280x720)"""
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got {value!r}")
+    return width, height
+
+
+def synthetic_image(size, seed):
+    """A noisy JPEG, so its encoded size and decode cost resemble a photo's"""
+    rng = random.Random(seed)
+    image = Image.effect_noise(size, 40).convert("RGB")
+    overlay = Image.new(
+        "RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+    )
+    buffer = io.BytesIO()
+    Image.blend(image, overlay, 0.5).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def load_payloads(image_dir, sizes):
+    """Collect (filename, bytes, content type) uploads to send"""
+    payloads = []
+    if image_dir and os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir)):
+            extension = os.path.splitext(name)[1].lower()
+            if extension in IMAGE_EXTENSIONS:
+                with open(os.path.join(image_dir, name), "rb") as f:
+                    content_type = (
+                        "image/jpeg"
+                        if extension in (".jpg", ".jpeg")
+                        else f"image/{extension[1:]}"
+                    )
+                    payloads.append((name, f.read(), content_type))
+    for index, size in enumerate(sizes):
+        payloads.append(
+            (
+                f"synthetic_{size[0]}x{size[1]}.jpg",
+                synthetic_image(size, index),
+                "image/jpeg",
+            )
+        )
+    return payloads
+
+
+def unique(payload, cache_busting):
+    """Append random bytes (ignored by image decoders) so the upload misses the cache"""
+    name, contents, content_type = payload
+    if cache_busting:
+        contents = contents + uuid.uuid4().bytes
+    return name, contents, content_type
+
+
+def install_stub_model(main):
+    """Replace load_models() with a stand-in DETR that answers instantly"""
+    import torch
+    from transformers import DetrImageProcessor
+    from transformers.models.detr.modeling_detr import DetrObjectDetectionOutput
+
+    class StubDetr(torch.nn.Module):
+        """Returns five confident "person" boxes per image without running a network"""
+
+        def forward(self, pixel_values, pixel_mask=None, **kwargs):
+            batch_size = pixel_values.shape[0]
+            logits = torch.full((batch_size, 100, 92), -10.0)
+            logits[:, :5, 1] = 10.0
+            pred_boxes = torch.tensor([0.5, 0.5, 0.2, 0.3]).repeat(batch_size, 100, 1)
+            return DetrObjectDetectionOutput(logits=logits, pred_boxes=pred_boxes)
+
+    def load_stub_models():
+        main.model = StubDetr().eval()
+        main.processor = DetrImageProcessor()
+
+    main.load_models = load_stub_models
+
+
+def start_in_process_server(port, stub_model):
+    """Serve the app from a background thread and return its URL"""
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+
+    import main
+
+    if stub_model:
+        install_stub_model(main)
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/ready", timeout=5).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def process_usage():
+    """CPU seconds used and current/peak RSS (MB) of this process"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss_mb = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak_divisor = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return usage.ru_utime + usage.ru_stime, rss_mb, usage.ru_maxrss / peak_divisor
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1)))
+    )
+    return sorted_values[index]
+
+
+def run_level(url, endpoint, concurrency, total_requests, payloads, args):
+    """Send total_requests requests from `concurrency` threads and summarize them"""
+    path = "/detect" if endpoint == "detect" else "/detect-batch"
+    images_per_request = 1 if endpoint == "detect" else args.batch_size
+    params = {"confidence_threshold": args.confidence_threshold, "format": args.format}
+    local = threading.local()
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = {}
+    results_lock = threading.Lock()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def worker(worker_index):
+        rng = random.Random(worker_index)
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return
+            field = "file" if endpoint == "detect" else "files"
+            files = [
+                (field, unique(rng.choice(payloads), args.cache_busting))
+                for _ in range(images_per_request)
+            ]
+            start = time.perf_counter()
+            try:
+                response = session().post(
+                    f"{url}{path}", params=params, files=files, timeout=args.timeout
+                )
+                response.content
+                status = response.status_code
+            except requests.exceptions.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            with results_lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+    cpu_before, _, _ = process_usage()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    duration = time.perf_counter() - start
+    cpu_after, rss_mb, peak_rss_mb = process_usage()
+
+    latencies_ms = sorted(latency * 1000.0 for latency in latencies)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "images_per_request": images_per_request,
+        "duration_s": duration,
+        "requests_per_s": len(latencies) / duration,
+        "images_per_s": len(latencies) * images_per_request / duration,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 0.50),
+            "p95": percentile(latencies_ms, 0.95),
+            "p99": percentile(latencies_ms, 0.99),
+            "mean": statistics.mean(latencies_ms) if latencies_ms else None,
+            "max": latencies_ms[-1] if latencies_ms else None,
+        },
+        # Only meaningful in-process, where the server shares this process
+        "cpu_cores": (cpu_after - cpu_before) / duration if args.url is None else None,
+        "rss_mb": rss_mb if args.url is None else None,
+        "peak_rss_mb": peak_rss_mb if args.url is None else None,
+    }
+
+
+def compare_with_baseline(report, baseline, max_regression):
+    """Describe the runs that got slower or lost throughput since the baseline"""
+    previous = {(run["endpoint"], run["concurrency"]): run for run in baseline["runs"]}
+    regressions = []
+    for run in report["runs"]:
+        old = previous.get((run["endpoint"], run["concurrency"]))
+        if old is None or not run["succeeded"] or not old["succeeded"]:
+            continue
+        label = f"{run['endpoint']} @ concurrency {run['concurrency']}"
+        if run["latency_ms"]["p95"] > old["latency_ms"]["p95"] * (1 + max_regression):
+            regressions.append(
+                f"{label}: p95 {old['latency_ms']['p95']:.1f}ms -> "
+                f"{run['latency_ms']['p95']:.1f}ms"
+            )
+        if run["images_per_s"] < old["images_per_s"] * (1 - max_regression):
+            regressions.append(
+                f"{label}: {old['images_per_s']:.1f} -> "
+                f"{run['images_per_s']:.1f} images/s"
+            )
+    return regressions
+
+
+def print_report(report):
+    print("\n📊 Results")
+    print("=" * 96)
+    print(
+        f"{'Endpoint':<14}{'Conc':>6}{'OK':>7}{'Err':>6}{'img/s':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'CPU':>8}{'RSS MB':>9}"
+    )
+    for run in report["runs"]:
+        latency = run["latency_ms"]
+
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+
+        errors = sum(run["errors"].values())
+        print(
+            f"{run['endpoint']:<14}{run['concurrency']:>6}{run['succeeded']:>7}"
+            f"{errors:>6}{run['images_per_s']:>9.1f}"
+            f"{fmt(latency['p50'], '>10.1f')}{fmt(latency['p95'], '>10.1f')}"
+            f"{fmt(latency['p99'], '>10.1f')}{fmt(run['cpu_cores'], '>8.2f')}"
+            f"{fmt(run['rss_mb'], '>9.0f')}"
+        )
+        if run["errors"]:
+            print(f"{'':<14}errors: {run['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the detection API")
+    parser.add_argument(
+        "--url", help="Target a running server instead of starting the app in-process"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8765, help="Port for the in-process server"
+    )
+    parser.add_argument(
+        "--stub-model",
+        action="store_true",
+        help="Replace the model with an instant stand-in (in-process only)",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Backend environment setting for the in-process server (repeatable)",
+    )
+    parser.add_argument(
+        "--endpoint", choices=["detect", "detect-batch", "both"], default="both"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16],
+        help="Concurrency levels to run",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=50,
+        help="Requests per endpoint and concurrency level",
+    )
+    parser.add_argument(
+        "--warmup-requests",
+        type=int,
+        default=5,
+        help="Untimed requests before each endpoint",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=4, help="Images per /detect-batch request"
+    )
+    parser.add_argument(
+        "--images",
+        default=os.path.join(PROJECT_ROOT, "assets", "sample_images"),
+        help="Folder of real images to include",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=parse_size,
+        nargs="*",
+        default=[(640, 480), (1280, 720), (1920, 1080)],
+        help="Synthetic image sizes to include, as WIDTHxHEIGHT",
+    )
+    parser.add_argument(
+        "--no-cache-busting",
+        dest="cache_busting",
+        action="store_false",
+        help="Send identical bytes so repeated images can hit the result cache",
+    )
+    parser.add_argument("--confidence-threshold", type=float, default=0.7)
+    parser.add_argument(
+        "--format", choices=["detailed", "columnar"], default="detailed"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120.0, help="Per-request timeout in seconds"
+    )
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.10,
+        help="Allowed relative p95 latency increase / throughput drop vs. the baseline",
+    )
+    args = parser.parse_args()
+
+    if args.stub_model and args.url:
+        parser.error("--stub-model only applies to the in-process server")
+
+    payloads = load_payloads(args.images, args.sizes)
+    if not payloads:
+        print("❌ No images to send (empty --images folder and no --sizes)")
+        sys.exit(1)
+
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        for setting in args.set:
+            key, _, value = setting.partition("=")
+            os.environ[key] = value
+        stub = " with a stub model" if args.stub_model else ""
+        print(f"🚀 Starting the API in-process{stub}...")
+        url = start_in_process_server(args.port, args.stub_model)
+
+    if not wait_until_ready(url, timeout=600):
+        print(f"❌ {url} did not become ready")
+        sys.exit(1)
+
+    endpoints = (
+        ["detect", "detect-batch"] if args.endpoint == "both" else [args.endpoint]
+    )
+    print(
+        f"🔬 Benchmarking {', '.join(endpoints)} at {url} "
+        f"with {len(payloads)} image(s)..."
+    )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "url": args.url,
+            "in_process": args.url is None,
+            "stub_model": args.stub_model,
+            "settings": args.set,
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "images": [name for name, _, _ in payloads],
+            "batch_size": args.batch_size,
+            "cache_busting": args.cache_busting,
+        },
+        "runs": [],
+    }
+    for endpoint in endpoints:
+        if args.warmup_requests:
+            run_level(url, endpoint, 1, args.warmup_requests, payloads, args)
+        for concurrency in args.concurrency:
+            print(f"🔄 {endpoint} @ concurrency {concurrency}...")
+            report["runs"].append(
+                run_level(url, endpoint, concurrency, args.requests, payloads, args)
+            )
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.max_regression)
+        if regressions:
+            print(
+                f"\n❌ Regressions beyond {args.max_regression:.0%} vs. {args.baseline}:"
+            )
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(
+            f"\n✅ No regressions beyond {args.max_regression:.0%} vs. {args.baseline}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Measure the latency/accuracy trade-off of lower inference resolutions
+Example: python scripts/benchmark_resolution.py --resolutions 640x1066 512x853
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+from transformers import DetrForObjectDetection, DetrImageProcessor
+
+# Also puts backend/ on sys.path
+from evaluate_precision import MODEL_ID, PROJECT_ROOT, compare_detections, find_images
+from imaging import decode_image
+
+DEFAULT_RESOLUTION = (800, 1333)
+
+
+def parse_resolution(value):
+    """Parse SHORTESTxLONGEST (e.g. 640x1066)"""
+    try:
+        shortest_edge, longest_edge = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected SHORTESTxLONGEST, got {value!r}")
+    if shortest_edge > longest_edge:
+        raise argparse.ArgumentTypeError(
+            f"Shortest edge must not exceed longest edge in {value!r}"
+        )
+    return shortest_edge, longest_edge
+
+
+def time_call(function, runs):
+    """Median wall time of function() in milliseconds, and its last result"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000.0, result
+
+
+def run_resolution(model, processor, contents, resolution, runs, threshold):
+    """Decode and detect one image at one resolution, timing each stage"""
+    full_decode_ms, _ = time_call(lambda: decode_image(contents), runs)
+    reduced_decode_ms, (image, original_size) = time_call(
+        lambda: decode_image(contents, resolution), runs
+    )
+
+    size = {"shortest_edge": resolution[0], "longest_edge": resolution[1]}
+    inputs = processor(images=image, size=size, return_tensors="pt")
+    with torch.no_grad():
+        # The first pass warms up kernels and is not timed
+        model(**inputs)
+        forward_ms, outputs = time_call(lambda: model(**inputs), runs)
+
+    width, height = original_size
+    result = processor.post_process_object_detection(
+        outputs, threshold=threshold, target_sizes=torch.tensor([(height, width)])
+    )[0]
+    detections = {
+        "scores": result["scores"].tolist(),
+        "labels": result["labels"].tolist(),
+        "boxes": result["boxes"].tolist(),
+    }
+    return {
+        "full_decode_ms": full_decode_ms,
+        "reduced_decode_ms": reduced_decode_ms,
+        "forward_ms": forward_ms,
+        "input_size": list(inputs["pixel_values"].shape[-2:]),
+        "detections": detections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark inference latency and accuracy across resolutions"
+    )
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        type=parse_resolution,
+        default=[(640, 1066), (512, 853), (400, 666)],
+        help="Resolutions to compare against 800x1333, as SHORTESTxLONGEST",
+    )
+    parser.add_argument(
+        "--images",
+        default=os.path.join(PROJECT_ROOT, "assets", "sample_images"),
+        help="Folder of evaluation images",
+    )
+    parser.add_argument("--cache-dir", default="./models", help="Model cache directory")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Timed repetitions per stage"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Score threshold for compared detections",
+    )
+    parser.add_argument(
+        "--iou", type=float, default=0.5, help="IoU needed to match two detections"
+    )
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    paths = find_images(args.images)
+    if not paths:
+        print(f"❌ No images found in {args.images}")
+        sys.exit(1)
+
+    print("Loading DETR model and processor...")
+    model = DetrForObjectDetection.from_pretrained(
+        MODEL_ID, cache_dir=args.cache_dir
+    ).eval()
+    processor = DetrImageProcessor.from_pretrained(MODEL_ID, cache_dir=args.cache_dir)
+
+    resolutions = [DEFAULT_RESOLUTION] + [
+        r for r in args.resolutions if r != DEFAULT_RESOLUTION
+    ]
+    print(f"🔬 Benchmarking {len(resolutions)} resolution(s) on {len(paths)} image(s)")
+
+    runs = {resolution: [] for resolution in resolutions}
+    for path in paths:
+        with open(path, "rb") as f:
+            contents = f.read()
+        for resolution in resolutions:
+            runs[resolution].append(
+                run_resolution(
+                    model, processor, contents, resolution, args.runs, args.threshold
+                )
+            )
+
+    reference = runs[DEFAULT_RESOLUTION]
+    summary = {"images": len(paths), "iou_threshold": args.iou, "resolutions": []}
+    for resolution in resolutions:
+        matched = reference_total = candidate_total = 0
+        for reference_run, candidate_run in zip(reference, runs[resolution]):
+            image_matched, image_reference, image_candidate, _ = compare_detections(
+                reference_run["detections"], candidate_run["detections"], args.iou
+            )
+            matched += image_matched
+            reference_total += image_reference
+            candidate_total += image_candidate
+
+        summary["resolutions"].append(
+            {
+                "shortest_edge": resolution[0],
+                "longest_edge": resolution[1],
+                "median_full_decode_ms": statistics.median(
+                    r["full_decode_ms"] for r in runs[resolution]
+                ),
+                "median_reduced_decode_ms": statistics.median(
+                    r["reduced_decode_ms"] for r in runs[resolution]
+                ),
+                "median_forward_ms": statistics.median(
+                    r["forward_ms"] for r in runs[resolution]
+                ),
+                "detections": candidate_total,
+                "recall_vs_default": (
+                    matched / reference_total if reference_total else 1.0
+                ),
+                "precision_vs_default": (
+                    matched / candidate_total if candidate_total else 1.0
+                ),
+            }
+        )
+
+    print("\n📊 Results")
+    print("=" * 78)
+    print(
+        f"{'Resolution':>12}{'Decode':>10}{'Reduced':>10}{'Forward':>10}"
+        f"{'Speedup':>10}{'Recall':>10}{'Precision':>12}"
+    )
+    baseline_ms = (
+        summary["resolutions"][0]["median_full_decode_ms"]
+        + summary["resolutions"][0]["median_forward_ms"]
+    )
+    for row in summary["resolutions"]:
+        total_ms = row["median_reduced_decode_ms"] + row["median_forward_ms"]
+        print(
+            f"{row['shortest_edge']:>6}x{row['longest_edge']:<5}"
+            f"{row['median_full_decode_ms']:>10.1f}"
+            f"{row['median_reduced_decode_ms']:>10.1f}"
+            f"{row['median_forward_ms']:>10.1f}{baseline_ms / total_ms:>9.2f}x"
+            f"{row['recall_vs_default']:>10.1%}{row['precision_vs_default']:>12.1%}"
+        )
+    print(
+        "\nTimes are medians in ms. Speedup is reduced decode + forward vs. "
+        "full decode + forward at 800x1333."
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
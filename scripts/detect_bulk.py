@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Run object detection over large image collections without the HTTP server
+
+Example:
+    python scripts/detect_bulk.py --input /data/archive --output out.jsonl --shard 0/8
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zlib
+from functools import partial
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from imaging import decode_image_file
+from jobs import scan_directory
+from preprocessing import preprocess
+from registry import UnknownModelError
+from serialization import json_dumps
+
+CSV_COLUMNS = [
+    "path",
+    "success",
+    "error",
+    "width",
+    "height",
+    "class_id",
+    "class",
+    "score",
+    "xmin",
+    "ymin",
+    "xmax",
+    "ymax",
+]
+
+
+class ImageDataset(Dataset):
+    """Decodes one image per item; failures are returned, not raised"""
+
+    def __init__(self, paths, root, resolution, max_pixels):
+        self.paths = paths
+        self.root = root
+        self.resolution = resolution
+        self.max_pixels = max_pixels
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        path = self.paths[index]
+        try:
+            image, original_size = decode_image_file(
+                os.path.join(self.root, path), self.resolution, self.max_pixels
+            )
+        except Exception as e:
+            return path, None, None, str(e)
+        return path, image, original_size, None
+
+
+def collate(samples, resolution, image_mean, image_std, resample):
+    """Build a batch's model inputs in the DataLoader worker"""
+    images = [image for _, image, _, _ in samples if image is not None]
+    return {
+        "paths": [path for path, _, _, _ in samples],
+        "sizes": [size for _, _, size, _ in samples],
+        "errors": [error for _, _, _, error in samples],
+        "inputs": (
+            preprocess(images, resolution, image_mean, image_std, resample)
+            if images
+            else None
+        ),
+    }
+
+
+def limit_worker_threads(worker_id):
+    # Workers run side by side; one torch thread each avoids oversubscribing the CPUs
+    torch.set_num_threads(1)
+
+
+def parse_shard(value):
+    """Parse i/n (0 <= i < n)"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected INDEX/COUNT, got {value!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            f"Shard index must be in [0, {count}) in {value!r}"
+        )
+    return index, count
+
+
+def in_shard(path, shard):
+    """Assign paths to shards by a stable hash of the path"""
+    index, count = shard
+    return zlib.crc32(path.encode("utf-8")) % count == index
+
+
+def list_images(args):
+    """
+    Paths to process, in a stable order
+
+    Returns:
+        Tuple of (root directory, paths relative to it)
+    """
+    if args.input:
+        return args.input, [
+            name
+            for _, name in scan_directory(args.input, recursive=not args.no_recursive)
+        ]
+    with open(args.file_list) as f:
+        return "", [line.strip() for line in f if line.strip()]
+
+
+class Manifest:
+    """Progress of a run, one JSON line per finished batch"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """
+        Read finished paths, dropping a partly written last line
+
+        Returns:
+            Tuple of (finished paths, output size to keep, failed image count)
+        """
+        done = set()
+        output_bytes = failed = 0
+        if not os.path.exists(self.path):
+            return done, output_bytes, failed
+
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                done.update(entry["paths"])
+                output_bytes = entry["output_bytes"]
+                failed += entry["failed"]
+
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_bytes)
+        return done, output_bytes, failed
+
+    def append(self, paths, output_bytes, failed):
+        with open(self.path, "ab") as f:
+            f.write(
+                json_dumps(
+                    {"paths": paths, "output_bytes": output_bytes, "failed": failed}
+                )
+                + b"\n"
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def format_jsonl(main, detector, batch, results, args):
+    """One JSON line per image, in the shape of /detect-batch entries"""
+    lines = []
+    result_iter = iter(results)
+    for path, size, error in zip(batch["paths"], batch["sizes"], batch["errors"]):
+        if error is not None:
+            record = {"path": path, "success": False, "error": error}
+        else:
+            result = next(result_iter)
+            record = {
+                "path": path,
+                "success": True,
+                "image_size": {"width": size[0], "height": size[1]},
+            }
+            if args.format == "columnar":
+                record.update(
+                    main.format_detections_columnar(result, args.confidence_threshold)
+                )
+            else:
+                detections = main.format_detections(
+                    result, args.confidence_threshold, detector
+                )
+                record["detections"] = detections
+                record["total_detections"] = len(detections)
+        lines.append(json_dumps(record) + b"\n")
+    return b"".join(lines)
+
+
+def format_csv(main, detector, batch, results, args):
+    """One CSV row per detection; an image without any gets a row of empty fields"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    result_iter = iter(results)
+    for path, size, error in zip(batch["paths"], batch["sizes"], batch["errors"]):
+        if error is not None:
+            writer.writerow([path, False, error] + [""] * (len(CSV_COLUMNS) - 3))
+            continue
+
+        labels, scores, boxes = main.filter_detections(
+            next(result_iter), args.confidence_threshold
+        )
+        rows = [
+            [
+                path,
+                True,
+                "",
+                size[0],
+                size[1],
+                label,
+                detector.class_name(label),
+                score,
+                *box,
+            ]
+            for label, score, box in zip(
+                labels.tolist(), scores.tolist(), boxes.tolist()
+            )
+        ]
+        writer.writerows(
+            rows or [[path, True, "", size[0], size[1]] + [""] * (len(CSV_COLUMNS) - 5)]
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detect objects in many images without the API server"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Directory to scan for images")
+    source.add_argument("--file-list", help="Text file with one image path per line")
+    parser.add_argument(
+        "--no-recursive",
+        action="store_true",
+        help="Don't descend into subdirectories of --input",
+    )
+    parser.add_argument("--output", required=True, help="Results file (.jsonl or .csv)")
+    parser.add_argument(
+        "--output-format",
+        choices=["jsonl", "csv"],
+        help="Results file format (default: from the --output extension)",
+    )
+    parser.add_argument(
+        "--manifest", help="Progress manifest for resuming (default: OUTPUT.manifest)"
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        help="Process only shard INDEX/COUNT",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="Images per forward pass (default: MAX_BATCH_SIZE)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) - 1),
+        help="Decode/preprocess worker processes (0 decodes in the main process)",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=2, help="Batches each worker prepares ahead"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="Torch threads for the model (default: torch's choice)",
+    )
+    parser.add_argument(
+        "--model",
+        help="Registry model to run (default: the backend's DEFAULT_MODEL; see MODELS)",
+    )
+    parser.add_argument("--confidence-threshold", type=float, default=0.7)
+    parser.add_argument(
+        "--format",
+        choices=["detailed", "columnar"],
+        default="detailed",
+        help="JSONL record layout",
+    )
+    parser.add_argument(
+        "--shortest-edge",
+        type=int,
+        help="Inference resolution: shortest edge (default: server setting)",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="Inference resolution: longest edge (default: server setting)",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Backend environment setting, e.g. MODEL_PRECISION=int8 (repeatable)",
+    )
+    parser.add_argument(
+        "--stub-model",
+        action="store_true",
+        help="Use an instant stand-in model (pipeline testing)",
+    )
+    parser.add_argument(
+        "--log-every", type=int, default=50, help="Batches between progress lines"
+    )
+    args = parser.parse_args()
+
+    output_format = args.output_format or (
+        "csv" if args.output.lower().endswith(".csv") else "jsonl"
+    )
+    manifest = Manifest(args.manifest or f"{args.output}.manifest")
+
+    for setting in args.set:
+        key, _, value = setting.partition("=")
+        os.environ[key] = value
+    if (
+        not os.path.exists(manifest.path)
+        and os.path.exists(args.output)
+        and os.path.getsize(args.output)
+    ):
+        print(
+            f"❌ {args.output} exists but has no manifest to resume from; "
+            "remove it or pick another --output"
+        )
+        sys.exit(1)
+
+    # The backend reads its settings when imported
+    import main as backend
+
+    root, paths = list_images(args)
+    total_listed = len(paths)
+    paths = [path for path in paths if in_shard(path, args.shard)]
+    done, output_bytes, failed = manifest.load()
+    pending = [path for path in paths if path not in done]
+    shard = f"{args.shard[0]}/{args.shard[1]}"
+    print(
+        f"🔍 {total_listed} image(s) listed, {len(paths)} in shard {shard}, "
+        f"{len(paths) - len(pending)} already done"
+    )
+    if not pending:
+        print("✅ Nothing left to do")
+        return
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.stub_model:
+        from benchmark import install_stub_model
+
+        install_stub_model(backend)
+    print("Loading DETR model and processor...")
+    backend.load_models()
+    try:
+        detector = backend.registry.get(args.model or backend.DEFAULT_MODEL)
+    except UnknownModelError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    resolution = backend.resolve_resolution(args.shortest_edge, args.max_size)
+    processor = detector.processor
+    loader = DataLoader(
+        ImageDataset(pending, root, resolution, backend.MAX_IMAGE_PIXELS),
+        batch_size=args.batch_size or backend.MAX_BATCH_SIZE,
+        num_workers=args.workers,
+        collate_fn=partial(
+            collate,
+            resolution=resolution,
+            image_mean=processor.image_mean,
+            image_std=processor.image_std,
+            resample=processor.resample,
+        ),
+        prefetch_factor=args.prefetch if args.workers else None,
+        worker_init_fn=limit_worker_threads if args.workers else None,
+    )
+    format_batch = format_csv if output_format == "csv" else format_jsonl
+
+    processed = 0
+    started = time.perf_counter()
+    with open(args.output, "ab") as output:
+        # Drop anything written after the last batch the manifest recorded
+        output.truncate(output_bytes)
+        output.seek(output_bytes)
+        if output_format == "csv" and output_bytes == 0:
+            output.write(",".join(CSV_COLUMNS).encode("utf-8") + b"\n")
+
+        for batch_index, batch in enumerate(loader, 1):
+            sizes = [size for size in batch["sizes"] if size is not None]
+            results = (
+                backend.run_model(batch["inputs"], sizes, detector=detector)
+                if sizes
+                else []
+            )
+            output.write(format_batch(backend, detector, batch, results, args))
+            output.flush()
+            os.fsync(output.fileno())
+
+            batch_failed = sum(error is not None for error in batch["errors"])
+            manifest.append(batch["paths"], output.tell(), batch_failed)
+            processed += len(batch["paths"])
+            failed += batch_failed
+
+            if batch_index % args.log_every == 0:
+                rate = processed / (time.perf_counter() - started)
+                print(f"   {processed}/{len(pending)} images ({rate:.1f} images/s)")
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"✅ Processed {processed} image(s) in {elapsed:.1f}s "
+        f"({processed / elapsed:.1f} images/s); "
+        f"{failed} failed in this shard so far. Results: {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Compare fp32 DETR inference with int8 or bf16: latency, memory and detection agreement
+Example: python scripts/evaluate_precision.py --mode int8 --images assets/sample_images
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "backend"))
+
+MODEL_ID = "facebook/detr-resnet-50"
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+
+def run_mode(precision, paths, cache_dir, runs, threshold):
+    """Load the model at a precision and time it on every image (in a child process)"""
+    import torch
+    from PIL import Image
+    from transformers import DetrForObjectDetection, DetrImageProcessor
+
+    from backends import apply_precision, precision_context
+
+    model = DetrForObjectDetection.from_pretrained(MODEL_ID, cache_dir=cache_dir).eval()
+    processor = DetrImageProcessor.from_pretrained(MODEL_ID, cache_dir=cache_dir)
+    model = apply_precision(model, precision)
+
+    latencies = []
+    detections = []
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        inputs = processor(images=image, return_tensors="pt")
+
+        timings = []
+        with torch.no_grad(), precision_context(precision):
+            # The first pass warms up kernels and is not timed
+            outputs = model(**inputs)
+            for _ in range(runs):
+                start = time.perf_counter()
+                outputs = model(**inputs)
+                timings.append(time.perf_counter() - start)
+        latencies.append(statistics.median(timings) * 1000.0)
+
+        outputs.logits = outputs.logits.float()
+        outputs.pred_boxes = outputs.pred_boxes.float()
+        result = processor.post_process_object_detection(
+            outputs, threshold=threshold, target_sizes=torch.tensor([image.size[::-1]])
+        )[0]
+        detections.append(
+            {
+                "scores": result["scores"].tolist(),
+                "labels": result["labels"].tolist(),
+                "boxes": result["boxes"].tolist(),
+            }
+        )
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return {
+        "latencies_ms": latencies,
+        "detections": detections,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def compare_detections(reference, candidate, iou_threshold):
+    """
+    Greedily match candidate detections to reference ones with the same class
+
+    Returns:
+        Tuple of (matched count, reference count, candidate count, score drifts)
+    """
+    import torch
+    from torchvision.ops import box_iou
+
+    ref_boxes = torch.tensor(reference["boxes"]).reshape(-1, 4)
+    cand_boxes = torch.tensor(candidate["boxes"]).reshape(-1, 4)
+    if len(ref_boxes) == 0 or len(cand_boxes) == 0:
+        return 0, len(ref_boxes), len(cand_boxes), []
+
+    ious = box_iou(ref_boxes, cand_boxes)
+    same_class = (
+        torch.tensor(reference["labels"])[:, None]
+        == torch.tensor(candidate["labels"])[None, :]
+    )
+    ious = torch.where(same_class, ious, torch.zeros_like(ious))
+
+    matched = 0
+    drifts = []
+    used = set()
+    for ref_index in (
+        torch.tensor(reference["scores"]).argsort(descending=True).tolist()
+    ):
+        best = None
+        for cand_index in ious[ref_index].argsort(descending=True).tolist():
+            if ious[ref_index, cand_index] < iou_threshold:
+                break
+            if cand_index not in used:
+                best = cand_index
+                break
+        if best is not None:
+            used.add(best)
+            matched += 1
+            drifts.append(candidate["scores"][best] - reference["scores"][ref_index])
+
+    return matched, len(ref_boxes), len(cand_boxes), drifts
+
+
+def find_images(image_dir):
+    paths = sorted(
+        path
+        for path in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+        if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+    )
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare fp32 inference with int8 or bf16"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["int8", "bf16"],
+        required=True,
+        help="Reduced-precision mode to evaluate",
+    )
+    parser.add_argument(
+        "--images",
+        default=os.path.join(PROJECT_ROOT, "assets", "sample_images"),
+        help="Folder of evaluation images",
+    )
+    parser.add_argument("--cache-dir", default="./models", help="Model cache directory")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Timed forward passes per image"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Score threshold for compared detections",
+    )
+    parser.add_argument(
+        "--iou", type=float, default=0.5, help="IoU needed to match two detections"
+    )
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    paths = find_images(args.images)
+    if not paths:
+        print(f"❌ No images found in {args.images}")
+        sys.exit(1)
+
+    print(f"🔬 Evaluating fp32 vs {args.mode} on {len(paths)} image(s)...")
+
+    context = multiprocessing.get_context("spawn")
+    reports = {}
+    for precision in ("fp32", args.mode):
+        print(f"🔄 Running {precision}...")
+        with context.Pool(1) as pool:
+            reports[precision] = pool.apply(
+                run_mode, (precision, paths, args.cache_dir, args.runs, args.threshold)
+            )
+
+    matched = reference_total = candidate_total = 0
+    drifts = []
+    for reference, candidate in zip(
+        reports["fp32"]["detections"], reports[args.mode]["detections"]
+    ):
+        image_matched, image_reference, image_candidate, image_drifts = (
+            compare_detections(reference, candidate, args.iou)
+        )
+        matched += image_matched
+        reference_total += image_reference
+        candidate_total += image_candidate
+        drifts.extend(image_drifts)
+
+    summary = {"images": len(paths), "mode": args.mode}
+    for precision, report in reports.items():
+        summary[precision] = {
+            "median_latency_ms": statistics.median(report["latencies_ms"]),
+            "mean_latency_ms": statistics.mean(report["latencies_ms"]),
+            "peak_rss_mb": report["peak_rss_mb"],
+            "detections": sum(len(d["scores"]) for d in report["detections"]),
+        }
+    summary["agreement"] = {
+        "iou_threshold": args.iou,
+        "matched": matched,
+        "recall_vs_fp32": matched / reference_total if reference_total else 1.0,
+        "precision_vs_fp32": matched / candidate_total if candidate_total else 1.0,
+        "mean_abs_score_drift": (
+            statistics.mean(abs(d) for d in drifts) if drifts else 0.0
+        ),
+        "max_abs_score_drift": max((abs(d) for d in drifts), default=0.0),
+    }
+
+    fp32, reduced = summary["fp32"], summary[args.mode]
+    agreement = summary["agreement"]
+    print("\n📊 Results")
+    print("=" * 50)
+    print(f"{'':20}{'fp32':>14}{args.mode:>14}")
+    for label, key in (
+        ("Median latency (ms)", "median_latency_ms"),
+        ("Peak RSS (MB)", "peak_rss_mb"),
+    ):
+        print(f"{label:20}{fp32[key]:>14.1f}{reduced[key]:>14.1f}")
+    print(f"{'Detections':20}{fp32['detections']:>14}{reduced['detections']:>14}")
+    print(f"\nSpeedup: {fp32['median_latency_ms'] / reduced['median_latency_ms']:.2f}x")
+    print(f"Matched detections (IoU ≥ {args.iou}): {agreement['matched']}")
+    print(f"Recall vs fp32: {agreement['recall_vs_fp32']:.1%}")
+    print(f"Precision vs fp32: {agreement['precision_vs_fp32']:.1%}")
+    print(
+        f"Score drift: mean {agreement['mean_abs_score_drift']:.4f}, "
+        f"max {agreement['max_abs_score_drift']:.4f}"
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
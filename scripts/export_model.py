@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Export the DETR model to ONNX and/or TorchScript for faster CPU inference
+Serve the files with INFERENCE_BACKEND=onnx or INFERENCE_BACKEND=torchscript
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import torch
+from PIL import Image
+from transformers import DetrForObjectDetection, DetrImageProcessor
+
+MODEL_ID = "facebook/detr-resnet-50"
+
+
+class DetrExportWrapper(torch.nn.Module):
+    """Expose DETR as (pixel_values, pixel_mask) -> (logits, pred_boxes)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values, pixel_mask):
+        outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+        return outputs.logits, outputs.pred_boxes
+
+
+def load_sample_inputs(processor, image_dir):
+    """Build a padded batch from the sample images (or two synthetic ones)"""
+    paths = sorted(glob.glob(os.path.join(image_dir, "*")))[:2]
+    images = [Image.open(path).convert("RGB") for path in paths]
+
+    # Two images of different sizes make sure padding and the pixel mask are exercised
+    while len(images) < 2:
+        size = (640, 480) if not images else (480, 640)
+        images.append(Image.new("RGB", size, (127, 127, 127)))
+
+    inputs = processor(images=images, return_tensors="pt")
+    return inputs["pixel_values"], inputs["pixel_mask"]
+
+
+def export_onnx(wrapper, pixel_values, pixel_mask, path, opset):
+    print(f"📦 Exporting ONNX model to {path}...")
+    torch.onnx.export(
+        wrapper,
+        (pixel_values, pixel_mask),
+        path,
+        input_names=["pixel_values", "pixel_mask"],
+        output_names=["logits", "pred_boxes"],
+        dynamic_axes={
+            "pixel_values": {0: "batch", 2: "height", 3: "width"},
+            "pixel_mask": {0: "batch", 1: "height", 2: "width"},
+            "logits": {0: "batch"},
+            "pred_boxes": {0: "batch"},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+
+
+def export_torchscript(wrapper, pixel_values, pixel_mask, path):
+    print(f"📦 Exporting TorchScript model to {path}...")
+    traced = torch.jit.trace(wrapper, (pixel_values, pixel_mask), check_trace=False)
+    traced.save(path)
+
+
+def check_onnx(path, pixel_values, pixel_mask):
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    logits, pred_boxes = session.run(
+        None, {"pixel_values": pixel_values.numpy(), "pixel_mask": pixel_mask.numpy()}
+    )
+    return torch.from_numpy(logits), torch.from_numpy(pred_boxes)
+
+
+def check_torchscript(path, pixel_values, pixel_mask):
+    traced = torch.jit.load(path)
+    return traced(pixel_values, pixel_mask)
+
+
+def report_parity(name, outputs, reference, tolerance):
+    """Print the largest output differences and whether they are in tolerance"""
+    logits_diff = (outputs[0] - reference[0]).abs().max().item()
+    boxes_diff = (outputs[1] - reference[1]).abs().max().item()
+    ok = logits_diff <= tolerance and boxes_diff <= tolerance
+    status = "✅" if ok else "❌"
+    print(
+        f"{status} {name} parity: max |Δlogits| = {logits_diff:.2e}, "
+        f"max |Δboxes| = {boxes_diff:.2e}"
+    )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export DETR to ONNX and/or TorchScript"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["onnx", "torchscript", "all"],
+        default="all",
+        help="Export format (default: all)",
+    )
+    parser.add_argument("--cache-dir", default="./models", help="Model cache directory")
+    parser.add_argument(
+        "--output-dir", default="./models", help="Where to write exported models"
+    )
+    parser.add_argument(
+        "--sample-dir",
+        default="./assets/sample_images",
+        help="Images used for tracing and the parity check",
+    )
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1e-3,
+        help="Maximum allowed difference from the eager model",
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("Loading DETR model and processor...")
+    model = DetrForObjectDetection.from_pretrained(
+        MODEL_ID, cache_dir=args.cache_dir
+    ).eval()
+    processor = DetrImageProcessor.from_pretrained(MODEL_ID, cache_dir=args.cache_dir)
+    wrapper = DetrExportWrapper(model).eval()
+
+    pixel_values, pixel_mask = load_sample_inputs(processor, args.sample_dir)
+
+    all_ok = True
+    with torch.no_grad():
+        reference = wrapper(pixel_values, pixel_mask)
+
+        if args.format in ("onnx", "all"):
+            path = os.path.join(args.output_dir, "detr-resnet-50.onnx")
+            export_onnx(wrapper, pixel_values, pixel_mask, path, args.opset)
+            outputs = check_onnx(path, pixel_values, pixel_mask)
+            all_ok &= report_parity("ONNX", outputs, reference, args.tolerance)
+
+        if args.format in ("torchscript", "all"):
+            path = os.path.join(args.output_dir, "detr-resnet-50.torchscript.pt")
+            export_torchscript(wrapper, pixel_values, pixel_mask, path)
+            outputs = check_torchscript(path, pixel_values, pixel_mask)
+            all_ok &= report_parity("TorchScript", outputs, reference, args.tolerance)
+
+    if not all_ok:
+        print("❌ Exported model output differs from the eager model")
+        sys.exit(1)
+
+    print("🎉 Export completed successfully!")
+    print(
+        "Start the backend with INFERENCE_BACKEND=onnx or "
+        "INFERENCE_BACKEND=torchscript to use it."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,40 +2,90 @@
 """
 Start the FastAPI backend server for Object Detection
 """
+
+import argparse
 import os
-import sys
 import subprocess
+import sys
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Start the FastAPI backend server")
+    parser.add_argument(
+        "--backend",
+        choices=["pytorch", "onnx", "torchscript"],
+        help="Inference backend (overrides INFERENCE_BACKEND)",
+    )
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="Preload the model once and fork workers sharing it (no auto-reload)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes in production mode (overrides SERVER_WORKERS)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help=(
+            "Torch threads per worker in production mode "
+            "(overrides TORCH_THREADS_PER_WORKER)"
+        ),
+    )
+    args = parser.parse_args()
+
+    env = os.environ.copy()
+    if args.backend:
+        env["INFERENCE_BACKEND"] = args.backend
+    if args.workers:
+        env["SERVER_WORKERS"] = str(args.workers)
+    if args.threads:
+        env["TORCH_THREADS_PER_WORKER"] = str(args.threads)
+
     # Change to backend directory (go up one level from scripts)
     project_root = os.path.dirname(os.path.dirname(__file__))
-    backend_dir = os.path.join(project_root, 'backend')
-    
+    backend_dir = os.path.join(project_root, "backend")
+
     if not os.path.exists(backend_dir):
         print("❌ Backend directory not found!")
         print("Please ensure the backend folder exists with main.py")
         sys.exit(1)
-    
+
     print("🚀 Starting FastAPI Backend Server...")
     print("📍 Backend will be available at: http://localhost:8000")
     print("📖 API Documentation: http://localhost:8000/docs")
-    print("🔄 Health Check: http://localhost:8000/health")
-    print("\n" + "="*50)
-    
+    print("🔄 Health Check: http://localhost:8000/health (ready: /ready)")
+    print(f"🧠 Inference backend: {env.get('INFERENCE_BACKEND', 'pytorch')}")
+    if args.production:
+        print("🏭 Production mode: preforked workers sharing one model")
+    print("\n" + "=" * 50)
+
+    if args.production:
+        command = [sys.executable, "serve.py", "--host", "0.0.0.0", "--port", "8000"]
+    else:
+        command = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "0.0.0.0",
+            "--port",
+            "8000",
+            "--reload",
+        ]
+
     try:
         # Start the FastAPI server
-        subprocess.run([
-            sys.executable, "-m", "uvicorn", 
-            "main:app", 
-            "--host", "0.0.0.0", 
-            "--port", "8000", 
-            "--reload"
-        ], cwd=backend_dir)
+        subprocess.run(command, cwd=backend_dir, env=env)
     except KeyboardInterrupt:
         print("\n🛑 Backend server stopped by user")
     except Exception as e:
         print(f"❌ Error starting backend: {e}")
         sys.exit(1)
 
+
 if __name__ == "__main__":
     main()
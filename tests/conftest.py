@@ -0,0 +1,44 @@
+"""Shared test setup: backend imports and a stub-model API client"""
+
+import io
+import os
+import sys
+import time
+
+import pytest
+from PIL import Image
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "frontend"))
+
+
+def image_bytes(width=64, height=48, color=(200, 30, 30), fmt="PNG") -> bytes:
+    """Encode a solid-colour test image"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """API client backed by the stub model, storing jobs and results under tmp_path"""
+    from fastapi.testclient import TestClient
+
+    import main
+    from benchmark import install_stub_model
+
+    # Restored after the test, as install_stub_model() replaces it for good
+    monkeypatch.setattr(main, "load_models", main.load_models)
+    install_stub_model(main)
+    monkeypatch.setattr(main, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(main, "RESULT_STORE_PATH", str(tmp_path / "results.sqlite3"))
+    monkeypatch.setattr(main, "RESULT_STORE_MIN_SCORE", 0.3)
+
+    with TestClient(main.app) as test_client:
+        deadline = time.time() + 30
+        while test_client.get("/ready").status_code != 200:
+            assert time.time() < deadline, "backend did not become ready"
+            time.sleep(0.05)
+        yield test_client
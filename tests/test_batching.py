@@ -0,0 +1,89 @@
+"""Tests for dynamic micro-batching"""
+
+import asyncio
+import threading
+
+import pytest
+
+from batching import MicroBatcher, QueueFullError
+
+
+def test_concurrent_requests_share_batches():
+    batches = []
+
+    def process_batch(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(process_batch, max_batch_size=4, batch_window_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.gather(
+                *(batcher.submit(item) for item in range(10))
+            )
+        finally:
+            await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(run())
+
+    # Every caller gets its own result back, in any batch arrangement
+    assert results == [item * 10 for item in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert stats["batch_size_histogram"] == {2: 1, 4: 2}
+    assert stats["total_requests"] == 10
+    assert stats["total_batches"] == 3
+
+
+def test_batch_error_reaches_every_caller():
+    def process_batch(items):
+        raise ValueError("model failed")
+
+    async def run():
+        batcher = MicroBatcher(process_batch, max_batch_size=4, batch_window_ms=10)
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(item) for item in range(3)), return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_full_queue_rejects_requests():
+    release = threading.Event()
+
+    def process_batch(items):
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = MicroBatcher(
+            process_batch, max_batch_size=1, batch_window_ms=0, max_queue_size=2
+        )
+        await batcher.start()
+        try:
+            # The first request is taken into a (blocked) batch, the next two
+            # fill the queue
+            pending = [asyncio.create_task(batcher.submit(0))]
+            await asyncio.sleep(0.1)
+            pending += [asyncio.create_task(batcher.submit(item)) for item in (1, 2)]
+            await asyncio.sleep(0)
+            with pytest.raises(QueueFullError):
+                await batcher.submit(3)
+            release.set()
+            return await asyncio.gather(*pending), batcher.stats()
+        finally:
+            release.set()
+            await batcher.stop()
+
+    results, stats = asyncio.run(run())
+
+    assert results == [0, 1, 2]
+    assert stats["rejected_requests"] == 1
@@ -0,0 +1,107 @@
+"""Tests for the detection result cache"""
+
+import asyncio
+
+import pytest
+import torch
+
+import cache
+from cache import DetectionCache, result_nbytes
+
+
+def make_result(value=0.9, count=4):
+    return {
+        "scores": torch.full((count,), value),
+        "labels": torch.ones(count, dtype=torch.int64),
+        "boxes": torch.zeros((count, 4)),
+    }
+
+
+def get(result_cache, key):
+    return asyncio.run(result_cache.get(key))
+
+
+def put(result_cache, key, result):
+    asyncio.run(result_cache.put(key, result))
+
+
+class Clock:
+    """Stand-in for time.time() that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(cache.time, "time", fake)
+    return fake
+
+
+def test_key_depends_on_content_and_model():
+    def key(contents, model_id):
+        return DetectionCache.variant_key(
+            DetectionCache.content_hash(contents), model_id
+        )
+
+    assert key(b"image", "detr-resnet-50") == key(b"image", "detr-resnet-50")
+    assert key(b"image", "detr-resnet-50") != key(b"other image", "detr-resnet-50")
+    assert key(b"image", "detr-resnet-50") != key(b"image", "detr-resnet-101")
+
+
+def test_entries_expire_after_ttl(clock):
+    result_cache = DetectionCache(ttl_seconds=60)
+    put(result_cache, "a", make_result())
+
+    clock.now += 59
+    assert get(result_cache, "a") is not None
+
+    clock.now += 2
+    assert get(result_cache, "a") is None
+    assert result_cache.stats()["entries"] == 0
+    assert result_cache.hits == 1
+    assert result_cache.misses == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entry_bytes = result_nbytes(make_result())
+    result_cache = DetectionCache(max_bytes=entry_bytes * 2)
+    put(result_cache, "a", make_result())
+    put(result_cache, "b", make_result())
+
+    # Reading "a" makes "b" the least recently used entry
+    assert get(result_cache, "a") is not None
+    put(result_cache, "c", make_result())
+
+    assert get(result_cache, "b") is None
+    assert get(result_cache, "a") is not None
+    assert get(result_cache, "c") is not None
+    assert result_cache.evictions == 1
+    assert result_cache.stats()["bytes"] == entry_bytes * 2
+
+
+def test_oversized_result_is_not_cached(clock):
+    result_cache = DetectionCache(max_bytes=result_nbytes(make_result()) - 1)
+    put(result_cache, "a", make_result())
+
+    assert get(result_cache, "a") is None
+    assert result_cache.evictions == 0
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path, clock):
+    put(DetectionCache(disk_dir=str(tmp_path), ttl_seconds=60), "a", make_result(0.75))
+
+    restarted = DetectionCache(disk_dir=str(tmp_path), ttl_seconds=60)
+    result = get(restarted, "a")
+
+    assert torch.equal(result["scores"], make_result(0.75)["scores"])
+    assert restarted.disk_hits == 1
+
+    # Files are aged by their modification time, so this one is long expired
+    clock.now += 10**10
+    assert get(DetectionCache(disk_dir=str(tmp_path), ttl_seconds=60), "a") is None
+    assert not list(tmp_path.glob("*.pt"))
@@ -0,0 +1,92 @@
+"""Tests for the frontend's backend client"""
+
+import asyncio
+import io
+import json
+
+import pytest
+
+from streaming import iter_multipart_files
+
+
+@pytest.fixture(scope="module")
+def frontend(tmp_path_factory):
+    # The app creates its upload folder in the working directory on import
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.chdir(tmp_path_factory.mktemp("frontend"))
+    try:
+        import app
+
+        yield app
+    finally:
+        monkeypatch.undo()
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, lines=()):
+        self.status_code = status_code
+        self.lines = [json.dumps(line).encode() for line in lines]
+        self.closed = False
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+def test_streamed_upload_body_is_valid_multipart(frontend):
+    files = [
+        ("files", 'a"b.png', io.BytesIO(b"x" * 100), "image/png"),
+        ("files", "c.jpg", io.BytesIO(b"y" * 10), None),
+    ]
+    body = b"".join(frontend.iter_multipart(files, "boundary", chunk_size=16))
+
+    async def parse():
+        async def chunks():
+            yield body
+
+        content_type = "multipart/form-data; boundary=boundary"
+        return [part async for part in iter_multipart_files(content_type, chunks())]
+
+    parts = asyncio.run(parse())
+
+    assert [(part.filename, part.content_type, part.data) for part in parts] == [
+        ("a%22b.png", "image/png", b"x" * 100),
+        ("c.jpg", "application/octet-stream", b"y" * 10),
+    ]
+
+
+def test_backend_health_is_cached(frontend, monkeypatch):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return FakeResponse()
+
+    monkeypatch.setattr(frontend.backend, "get", get)
+    frontend.forget_backend_health()
+
+    assert frontend.check_backend_health() and frontend.check_backend_health()
+    assert len(calls) == 1
+    frontend.forget_backend_health()
+    assert frontend.check_backend_health()
+    assert len(calls) == 2
+
+
+def test_streamed_batch_reports_upload_errors_and_stops_at_done(frontend):
+    response = FakeResponse(
+        lines=[
+            {"filename": "a.png", "success": True},
+            {"success": False, "error": "Upload exceeds the 10-byte limit"},
+            {"done": True, "total_images": 1},
+        ]
+    )
+    batch = frontend.StreamedBatch(response)
+
+    rows = list(batch)
+
+    assert [row["filename"] for row in rows] == ["a.png", "Upload"]
+    assert rows[1]["error"] == "Upload exceeds the 10-byte limit"
+    assert batch.results == rows
+    assert response.closed
@@ -0,0 +1,34 @@
+"""Tests for image previews in /detect responses"""
+
+import base64
+import io
+
+from PIL import Image
+
+from conftest import image_bytes
+from imaging import encode_preview
+
+
+def test_image_is_only_returned_on_request(client):
+    contents = image_bytes()
+    upload = {"file": ("a.png", contents, "image/png")}
+
+    plain = client.post("/detect", files=upload).json()
+    with_image = client.post(
+        "/detect", files=upload, params={"return_image": True}
+    ).json()
+
+    assert "image_base64" not in plain
+    # Formats browsers display are echoed back without re-encoding
+    assert with_image["image_mime_type"] == "image/png"
+    assert base64.b64decode(with_image["image_base64"]) == contents
+
+
+def test_other_formats_get_a_downscaled_jpeg_preview():
+    contents = image_bytes(width=400, height=200, fmt="TIFF")
+
+    mime_type, data = encode_preview(contents, max_side=100)
+    preview = Image.open(io.BytesIO(base64.b64decode(data)))
+
+    assert mime_type == "image/jpeg"
+    assert (preview.format, preview.size) == ("JPEG", (100, 50))
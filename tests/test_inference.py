@@ -0,0 +1,99 @@
+"""Tests for batched inference"""
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import (
+    DetrConfig,
+    DetrForObjectDetection,
+    DetrImageProcessor,
+    ResNetConfig,
+)
+
+import main
+
+RESOLUTION = (64, 96)
+
+
+@pytest.fixture(scope="module")
+def detector():
+    """A tiny randomly initialised DETR, so padding changes what it sees"""
+    torch.manual_seed(0)
+    config = DetrConfig(
+        use_timm_backbone=False,
+        use_pretrained_backbone=False,
+        backbone_config=ResNetConfig(
+            embedding_size=8,
+            hidden_sizes=[8, 16, 16, 32],
+            depths=[1, 1, 1, 1],
+            out_features=["stage4"],
+        ),
+        d_model=32,
+        encoder_layers=1,
+        decoder_layers=1,
+        encoder_ffn_dim=32,
+        decoder_ffn_dim=32,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        num_queries=10,
+    )
+    model = DetrForObjectDetection(config).eval()
+    return main.make_detector("tiny-detr", model, DetrImageProcessor(), "tiny-detr")
+
+
+def random_images(sizes):
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for width, height in sizes
+    ]
+
+
+def test_padded_batch_matches_single_images(detector, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 4)
+    images = random_images([(64, 48), (40, 80), (96, 32)])
+
+    batched = main.run_inference(images, resolution=RESOLUTION, detector=detector)
+    single = [
+        main.run_inference([image], resolution=RESOLUTION, detector=detector)[0]
+        for image in images
+    ]
+
+    # The mask hides padding from the transformer, but convolutions near each
+    # image's edge still see it, so scores can move slightly
+    for batch_result, single_result in zip(batched, single):
+        assert torch.equal(batch_result["labels"], single_result["labels"])
+        torch.testing.assert_close(
+            batch_result["scores"], single_result["scores"], atol=0.02, rtol=0
+        )
+        # Boxes are in pixels of the original image
+        torch.testing.assert_close(
+            batch_result["boxes"], single_result["boxes"], atol=0.05, rtol=0
+        )
+
+
+def test_images_are_split_into_mini_batches(detector, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    batch_sizes = []
+    model = detector.model
+
+    def forward(**inputs):
+        batch_sizes.append(inputs["pixel_values"].shape[0])
+        return model(**inputs)
+
+    monkeypatch.setattr(detector, "model", forward)
+    images = random_images([(64, 48), (40, 80), (96, 32)])
+
+    results = main.run_inference(
+        images,
+        original_sizes=[(640, 480)] * 3,
+        resolution=RESOLUTION,
+        detector=detector,
+    )
+
+    assert batch_sizes == [2, 1]
+    assert len(results) == 3
+    # Boxes are mapped back to the original size, not the decoded one
+    assert results[0]["boxes"][:, 2].max() <= 640
+    assert results[0]["boxes"][:, 3].max() <= 480
@@ -0,0 +1,145 @@
+"""Tests for job leases and resuming from checkpoints"""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from jobs import (
+    COMPLETED,
+    QUEUED,
+    RESULTS_FILE,
+    RUNNING,
+    JobOutput,
+    JobRunner,
+    JobStore,
+    LeaseLostError,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield job_store
+    job_store.close()
+
+
+def create_job(store, count):
+    return store.create(
+        "upload", {}, [(f"/images/{i}.png", f"{i}.png") for i in range(count)]
+    )
+
+
+def test_claim_takes_queued_job(store):
+    job = create_job(store, 3)
+    assert store.get(job.id).status == QUEUED
+
+    claimed = store.claim("runner-a", lease_seconds=60)
+
+    assert claimed.id == job.id
+    assert claimed.status == RUNNING
+    assert store.claim("runner-b", lease_seconds=60) is None
+
+
+def test_expired_lease_is_taken_over(store):
+    job = create_job(store, 5)
+    store.claim("runner-a", lease_seconds=0.05)
+    store.checkpoint(job.id, "runner-a", [(0, True, 0, 10), (1, True, 10, 10)], 20, 0)
+
+    time.sleep(0.1)
+    resumed = store.claim("runner-b", lease_seconds=60)
+
+    assert resumed.id == job.id
+    assert resumed.processed == 2
+    assert resumed.output_bytes == 20
+    assert [item.position for item in store.pending_items(job.id, 10)] == [2, 3, 4]
+
+    # The runner that lost the lease can neither renew nor record results
+    assert not store.renew(job.id, "runner-a", 60)
+    with pytest.raises(LeaseLostError):
+        store.checkpoint(job.id, "runner-a", [(2, True, 20, 10)], 30, 0)
+    assert store.renew(job.id, "runner-b", 60)
+
+
+def test_output_rolls_back_to_checkpoint(tmp_path, store):
+    job = create_job(store, 2)
+    committed = b'{"position": 0}\n'
+    directory = tmp_path / job.id
+    directory.mkdir()
+    (directory / RESULTS_FILE).write_bytes(committed + b'{"position": 1, "uncommit')
+    job.output_bytes = len(committed)
+
+    output = JobOutput(str(directory), job)
+    ranges, size = output.write([{"position": 1}])
+    output.close()
+
+    assert ranges == [(len(committed), size - len(committed))]
+    assert (directory / RESULTS_FILE).read_bytes().startswith(committed)
+    assert JobOutput.read_ranges(
+        output.results_path, [(0, len(committed))] + ranges
+    ) == [{"position": 0}, {"position": 1}]
+
+
+def test_runner_resumes_from_checkpoint(tmp_path, store):
+    job = create_job(store, 5)
+    jobs_dir = tmp_path / "jobs"
+
+    # A runner that died after checkpointing the first two images, with part
+    # of an uncommitted third batch left in the results file
+    store.claim("dead-runner", lease_seconds=0.05)
+    output = JobOutput(str(jobs_dir / job.id), store.get(job.id))
+    ranges, size = output.write(
+        [
+            {"success": True, "filename": "0.png", "position": 0},
+            {"success": True, "filename": "1.png", "position": 1},
+        ]
+    )
+    store.checkpoint(
+        job.id, "dead-runner", [(0, True, *ranges[0]), (1, True, *ranges[1])], size, 0
+    )
+    output.write([{"success": True, "filename": "2.png", "position": 2}])
+    output.close()
+    time.sleep(0.1)
+
+    processed = []
+
+    async def process_batch(job, items):
+        processed.extend(item.position for item in items)
+        return [{"success": True, "filename": item.name} for item in items]
+
+    async def run():
+        runner = JobRunner(
+            store,
+            str(jobs_dir),
+            process_batch,
+            batch_size=2,
+            lease_seconds=60,
+            poll_seconds=0.05,
+        )
+        await runner.start()
+        try:
+            for _ in range(200):
+                if store.get(job.id).status == COMPLETED:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await runner.stop()
+        return runner
+
+    runner = asyncio.run(run())
+
+    finished = store.get(job.id)
+    assert finished.status == COMPLETED
+    assert finished.processed == 5
+    assert processed == [2, 3, 4]
+    with open(runner.results_path(job.id)) as f:
+        positions = [json.loads(line)["position"] for line in f]
+    assert positions == [0, 1, 2, 3, 4]
+    assert JobOutput.read_ranges(
+        runner.results_path(job.id), store.result_ranges(job.id, 0, 10)
+    ) == [
+        {"success": True, "filename": f"{position}.png", "position": position}
+        for position in range(5)
+    ]
@@ -0,0 +1,64 @@
+"""Tests for live-stream detection"""
+
+import asyncio
+
+from conftest import image_bytes
+from live import LatestFrameSlot, LiveFrame
+
+
+def frame(index):
+    return LiveFrame(index, b"", 0.0)
+
+
+def test_newer_frame_replaces_an_unprocessed_one():
+    async def run():
+        slot = LatestFrameSlot()
+        assert slot.put(frame(0)) is None
+        replaced = slot.put(frame(1))
+        return replaced, await slot.get()
+
+    replaced, latest = asyncio.run(run())
+
+    assert replaced.index == 0
+    assert latest.index == 1
+
+
+def test_get_waits_for_the_next_frame():
+    async def run():
+        slot = LatestFrameSlot()
+        waiting = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        slot.put(frame(0))
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(run()).index == 0
+
+
+def test_closed_slot_hands_out_its_last_frame_then_none():
+    async def run():
+        slot = LatestFrameSlot()
+        slot.put(frame(0))
+        slot.close()
+        return await slot.get(), await slot.get()
+
+    last, after = asyncio.run(run())
+
+    assert last.index == 0
+    assert after is None
+
+
+def test_websocket_answers_each_frame(client):
+    with client.websocket_connect("/ws/detect?confidence_threshold=0.5") as websocket:
+        assert websocket.receive_json()["type"] == "ready"
+
+        websocket.send_bytes(image_bytes())
+        result = websocket.receive_json()
+        websocket.send_text("not a frame")
+        error = websocket.receive_json()
+
+    assert result["type"] == "result"
+    assert result["frame"] == 0
+    assert result["total_detections"] == 5
+    assert result["stats"]["frames_processed"] == 1
+    assert (error["type"], error["frame"]) == ("error", None)
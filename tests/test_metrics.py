@@ -0,0 +1,54 @@
+"""Tests for stage timings and the Prometheus endpoint"""
+
+import re
+
+from conftest import image_bytes
+from metrics import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ["endpoint"], [0.1, 1.0])
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, endpoint="/detect")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+    ]
+    assert lines[2:] == [
+        'latency_seconds_bucket{endpoint="/detect",le="0.1"} 1',
+        'latency_seconds_bucket{endpoint="/detect",le="1.0"} 2',
+        'latency_seconds_bucket{endpoint="/detect",le="+Inf"} 3',
+        'latency_seconds_sum{endpoint="/detect"} 5.55',
+        'latency_seconds_count{endpoint="/detect"} 3',
+    ]
+
+
+def stage_counts(client):
+    """Observations per (endpoint, stage) in /metrics"""
+    pattern = re.compile(
+        r'^detection_stage_seconds_count\{endpoint="([^"]+)",stage="([^"]+)"\} (\S+)$',
+        re.MULTILINE,
+    )
+    text = client.get("/metrics").text
+    return {
+        (endpoint, stage): float(count)
+        for endpoint, stage, count in pattern.findall(text)
+    }
+
+
+def test_endpoints_record_their_stages(client):
+    client.post("/detect", files={"file": ("a.png", image_bytes(), "image/png")})
+    with client.websocket_connect("/ws/detect") as websocket:
+        websocket.receive_json()
+        websocket.send_bytes(image_bytes())
+        websocket.receive_json()
+
+    counts = stage_counts(client)
+
+    for endpoint in ("/detect", "/ws/detect"):
+        for stage in ("decode", "forward", "format"):
+            assert counts.get((endpoint, stage), 0) >= 1, (endpoint, stage)
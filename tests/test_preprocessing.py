@@ -0,0 +1,72 @@
+"""Tests for upload limits and image preprocessing"""
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import DetrImageProcessor
+
+import main
+from conftest import image_bytes
+from imaging import ImageTooLargeError, open_image
+from preprocessing import preprocess
+
+
+def test_preprocess_matches_the_processor():
+    processor = DetrImageProcessor()
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for width, height in [(120, 90), (60, 140)]
+    ]
+    size = {"shortest_edge": 64, "longest_edge": 128}
+
+    expected = processor(images=images, size=size, return_tensors="pt")
+    actual = preprocess(images, (64, 128), processor.image_mean, processor.image_std)
+
+    assert torch.equal(actual["pixel_mask"], expected["pixel_mask"])
+    # PIL resizes in 8 bits and the processor in float, so values differ by rounding
+    torch.testing.assert_close(
+        actual["pixel_values"], expected["pixel_values"], atol=0.05, rtol=0
+    )
+
+
+def test_pixel_limit_is_checked_from_the_header():
+    contents = image_bytes(width=400, height=300)
+
+    assert open_image(contents, max_pixels=400 * 300).size == (400, 300)
+    with pytest.raises(ImageTooLargeError):
+        open_image(contents, max_pixels=400 * 300 - 1)
+
+
+def test_detect_rejects_oversized_uploads(client, monkeypatch):
+    contents = image_bytes(width=400, height=300)
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", len(contents) - 1)
+
+    response = client.post("/detect", files={"file": ("a.png", contents, "image/png")})
+
+    assert response.status_code == 413
+    assert "upload limit" in response.json()["detail"]
+
+
+def test_detect_rejects_images_over_the_pixel_limit(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_IMAGE_PIXELS", 400 * 300 - 1)
+    upload = ("a.png", image_bytes(width=400, height=300), "image/png")
+
+    response = client.post("/detect", files={"file": upload})
+
+    assert response.status_code == 413
+    assert "megapixels" in response.json()["detail"]
+
+
+def test_batch_reports_limits_per_image(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_IMAGE_PIXELS", 400 * 300 - 1)
+    files = [
+        ("files", ("small.png", image_bytes(), "image/png")),
+        ("files", ("large.png", image_bytes(width=400, height=300), "image/png")),
+    ]
+
+    results = client.post("/detect-batch", files=files).json()["results"]
+
+    assert [result["success"] for result in results] == [True, False]
+    assert "megapixels" in results[1]["error"]
@@ -0,0 +1,130 @@
+"""Tests for the raw-frame input path"""
+
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from preprocessing import (
+    RawFrameError,
+    frames_from_buffer,
+    frames_from_npy,
+    preprocess,
+    preprocess_frames,
+)
+
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+
+
+def random_frames(count=2, height=48, width=64):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (count, height, width, 3), dtype=np.uint8)
+
+
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def test_buffer_is_wrapped_without_copying():
+    buffer = bytearray(random_frames().tobytes())
+
+    frames = frames_from_buffer(buffer, (2, 48, 64, 3))
+    buffer[0] = 255 - buffer[0]
+
+    assert frames.shape == (2, 48, 64, 3)
+    assert frames[0, 0, 0, 0].item() == buffer[0]
+
+
+def test_npy_array_is_read_in_place():
+    array = random_frames()
+    buffer = bytearray(npy_bytes(array))
+
+    frames = frames_from_npy(buffer)
+    expected = torch.from_numpy(array.copy())
+    buffer[-1] = 255 - buffer[-1]
+    expected[-1, -1, -1, -1] = buffer[-1]
+
+    assert torch.equal(frames, expected)
+    # A single frame gets a count of one
+    assert frames_from_npy(bytearray(npy_bytes(array[0]))).shape == (1, 48, 64, 3)
+
+
+@pytest.mark.parametrize(
+    "array", [random_frames().astype(np.float32), np.asfortranarray(random_frames()[0])]
+)
+def test_npy_must_hold_c_ordered_uint8(array):
+    with pytest.raises(RawFrameError):
+        frames_from_npy(bytearray(npy_bytes(array)))
+
+
+def test_buffer_size_must_match_shape():
+    with pytest.raises(RawFrameError):
+        frames_from_buffer(bytearray(100), (2, 48, 64, 3))
+
+
+def test_frames_match_the_image_path():
+    array = random_frames()
+    images = [Image.fromarray(frame) for frame in array]
+
+    frames = preprocess_frames(torch.from_numpy(array), (32, 64), MEAN, STD)
+    expected = preprocess(images, (32, 64), MEAN, STD)
+
+    assert frames["pixel_values"].shape == expected["pixel_values"].shape
+    assert torch.equal(frames["pixel_mask"], expected["pixel_mask"])
+    # Both use an antialiased bilinear filter; only rounding differs
+    assert (frames["pixel_values"] - expected["pixel_values"]).abs().mean() < 0.02
+
+
+def test_detect_raw_accepts_buffers_and_npy(client):
+    array = random_frames()
+
+    raw = client.post(
+        "/detect-raw",
+        content=array.tobytes(),
+        headers={
+            "Content-Type": "application/octet-stream",
+            "X-Frame-Shape": "2,48,64,3",
+        },
+    )
+    npy = client.post(
+        "/detect-raw",
+        content=npy_bytes(array),
+        headers={"Content-Type": "application/x-npy"},
+    )
+
+    for response in (raw, npy):
+        assert response.status_code == 200
+        body = response.json()
+        assert body["total_frames"] == 2
+        assert body["image_size"] == {"width": 64, "height": 48}
+        assert [result["total_detections"] for result in body["results"]] == [5, 5]
+
+
+def test_detect_raw_rejects_bad_bodies(client):
+    pixels = random_frames(count=1).tobytes()
+
+    missing_shape = client.post(
+        "/detect-raw",
+        content=pixels,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    wrong_shape = client.post(
+        "/detect-raw",
+        content=pixels,
+        headers={
+            "Content-Type": "application/octet-stream",
+            "X-Frame-Shape": "48,64,4",
+        },
+    )
+    wrong_type = client.post(
+        "/detect-raw", content=pixels, headers={"Content-Type": "image/png"}
+    )
+
+    assert missing_shape.status_code == 400
+    assert wrong_shape.status_code == 400
+    assert wrong_type.status_code == 415
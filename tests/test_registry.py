@@ -0,0 +1,90 @@
+"""Tests for the multi-model registry"""
+
+import threading
+
+import pytest
+
+from registry import Detector, ModelRegistry, UnknownModelError
+
+MB = 1024 * 1024
+SOURCES = {"default": "d", "a": "a", "b": "b", "c": "c"}
+
+
+def make_registry(loaded, budget=3 * MB):
+    """A registry whose models each take 1MB, recording what was loaded"""
+
+    def loader(name, source):
+        loaded.append(name)
+        return Detector(name, object(), None, [], name, memory_bytes=MB)
+
+    registry = ModelRegistry(SOURCES, "default", loader, memory_budget_bytes=budget)
+    registry.register(
+        Detector("default", object(), None, [], "default", memory_bytes=MB)
+    )
+    return registry
+
+
+def test_models_load_lazily_once():
+    loaded = []
+    registry = make_registry(loaded)
+
+    assert registry.loaded_names() == ["default"]
+    first = registry.get("a")
+
+    assert registry.get("a") is first
+    assert loaded == ["a"]
+
+
+def test_least_recently_used_model_is_evicted():
+    loaded = []
+    registry = make_registry(loaded)
+    registry.get("a")
+    registry.get("b")
+
+    # Using "a" makes "b" the least recently used model
+    registry.get("a")
+    registry.get("c")
+
+    assert registry.loaded_names() == ["default", "a", "c"]
+    assert registry.evictions == 1
+    registry.get("b")
+    assert loaded == ["a", "b", "c", "b"]
+
+
+def test_default_model_is_never_evicted():
+    registry = make_registry([], budget=MB)
+
+    registry.get("a")
+    registry.get("b")
+
+    assert registry.loaded_names() == ["default", "b"]
+
+
+def test_concurrent_requests_share_one_load():
+    release = threading.Event()
+    loaded = []
+
+    def loader(name, source):
+        release.wait(5)
+        loaded.append(name)
+        return Detector(name, object(), None, [], name, memory_bytes=MB)
+
+    registry = ModelRegistry(SOURCES, "default", loader)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get("a")))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loaded == ["a"]
+    assert len(results) == 3 and all(result is results[0] for result in results)
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(UnknownModelError):
+        make_registry([]).get("missing")
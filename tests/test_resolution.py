@@ -0,0 +1,56 @@
+"""Tests for configurable inference resolution"""
+
+import pytest
+
+from conftest import image_bytes
+from imaging import decode_image
+from preprocessing import resized_size
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_decode_shrinks_no_further_than_inference_needs(fmt):
+    contents = image_bytes(width=1600, height=1200, fmt=fmt)
+    resolution = (200, 400)
+
+    image, original_size = decode_image(contents, resolution)
+
+    assert original_size == (1600, 1200)
+    assert image.width < 1600
+    needed = resized_size(original_size, resolution)
+    assert image.width >= needed[0] and image.height >= needed[1]
+
+
+def test_decode_keeps_full_size_without_a_resolution():
+    image, original_size = decode_image(image_bytes(width=1600, height=1200))
+
+    assert image.size == original_size == (1600, 1200)
+
+
+def test_detect_maps_boxes_to_the_original_size(client):
+    upload = {
+        "file": (
+            "a.jpg",
+            image_bytes(width=1600, height=1200, fmt="JPEG"),
+            "image/jpeg",
+        )
+    }
+
+    body = client.post(
+        "/detect", files=upload, params={"shortest_edge": 200, "max_size": 400}
+    ).json()
+
+    assert body["image_size"] == {"width": 1600, "height": 1200}
+    # The stub model's boxes are centred, 20% wide and 30% high
+    assert body["detections"][0]["bbox"] == pytest.approx(
+        {"xmin": 640, "ymin": 420, "xmax": 960, "ymax": 780}, abs=0.5
+    )
+
+
+def test_shortest_edge_above_max_size_is_rejected(client):
+    upload = {"file": ("a.png", image_bytes(), "image/png")}
+
+    response = client.post(
+        "/detect", files=upload, params={"shortest_edge": 800, "max_size": 400}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,147 @@
+"""Tests for searching stored detection results"""
+
+import time
+
+import torch
+
+from conftest import image_bytes
+from store import DetectionStore, SearchQuery, StoredResult
+
+CLASSES = ["N/A", "person", "bicycle", "car"]
+
+
+def stored_result(index, labels, scores=None):
+    scores = scores or [0.9] * len(labels)
+    return StoredResult(
+        model="detr-resnet-50",
+        classes=CLASSES,
+        source="detect",
+        filename=f"{index}.png",
+        image_size=(640, 480),
+        result={
+            "scores": torch.tensor(scores),
+            "labels": torch.tensor(labels),
+            "boxes": torch.tensor([[10.0, 10.0, 30.0, 20.0]] * len(labels)),
+        },
+        image_hash=f"{index:064x}",
+    )
+
+
+def fill_store(path, records):
+    """Write records and return a store reopened on the same database"""
+    store = DetectionStore(str(path), min_score=0.3)
+    for record in records:
+        store.add(record)
+    store.close()
+    return DetectionStore(str(path), min_score=0.3)
+
+
+def test_search_pages_newest_first(tmp_path):
+    store = fill_store(
+        tmp_path / "results.sqlite3", [stored_result(index, [1]) for index in range(5)]
+    )
+    try:
+        first = store.search(SearchQuery(limit=2))
+        second = store.search(SearchQuery(offset=first["next_offset"], limit=2))
+        last = store.search(SearchQuery(offset=second["next_offset"], limit=2))
+    finally:
+        store.close()
+
+    pages = [
+        [entry["filename"] for entry in page["results"]]
+        for page in (first, second, last)
+    ]
+    assert pages == [["4.png", "3.png"], ["2.png", "1.png"], ["0.png"]]
+    assert (first["next_offset"], second["next_offset"], last["next_offset"]) == (
+        2,
+        4,
+        None,
+    )
+
+
+def test_search_filters_by_class_count_and_score(tmp_path):
+    store = fill_store(
+        tmp_path / "results.sqlite3",
+        [
+            stored_result(0, [1, 1, 3]),
+            stored_result(1, [1, 2]),
+            stored_result(2, [3, 3], [0.95, 0.5]),
+            stored_result(
+                3, [1], [0.2]
+            ),  # Below the store's min_score, so never stored
+        ],
+    )
+    try:
+        people = store.search(SearchQuery(class_ids=store.class_ids("person")))
+        crowds = store.search(
+            SearchQuery(class_ids=store.class_ids("person"), min_count=2)
+        )
+        confident_cars = store.search(
+            SearchQuery(class_ids=store.class_ids("car"), min_score=0.8)
+        )
+        unknown = store.search(SearchQuery(class_ids=store.class_ids("giraffe")))
+    finally:
+        store.close()
+
+    assert [entry["filename"] for entry in people["results"]] == ["1.png", "0.png"]
+    assert [entry["matches"] for entry in crowds["results"]] == [2]
+    assert [entry["filename"] for entry in confident_cars["results"]] == [
+        "2.png",
+        "0.png",
+    ]
+    assert [
+        detection["confidence"]
+        for detection in confident_cars["results"][0]["detections"]
+    ] == [torch.tensor(0.95).item()]
+    assert unknown == {"results": [], "next_offset": None}
+
+
+def test_search_endpoint_pages_stored_detections(client):
+    for index in range(3):
+        upload = (f"{index}.png", image_bytes(color=(index * 80, 0, 0)), "image/png")
+        response = client.post("/detect", files={"file": upload})
+        assert response.status_code == 200
+
+    # Results are stored in the background
+    deadline = time.time() + 10
+    while (
+        len(
+            client.get("/search", params={"class": "person", "limit": 10}).json()[
+                "results"
+            ]
+        )
+        < 3
+    ):
+        assert time.time() < deadline, "results were not stored"
+        time.sleep(0.05)
+
+    first = client.get(
+        "/search", params={"class": "person", "limit": 2, "min_count": 5}
+    ).json()
+    second = client.get(
+        "/search",
+        params={
+            "class": "person",
+            "limit": 2,
+            "min_count": 5,
+            "offset": first["next_offset"],
+        },
+    ).json()
+
+    assert [entry["filename"] for entry in first["results"] + second["results"]] == [
+        "2.png",
+        "1.png",
+        "0.png",
+    ]
+    assert second["next_offset"] is None
+    assert all(len(entry["detections"]) == 5 for entry in first["results"])
+    assert (
+        client.get("/search", params={"class": "person", "min_count": 6}).json()[
+            "results"
+        ]
+        == []
+    )
+    assert (
+        client.get("/search", params={"class": "person", "class_id": 1}).status_code
+        == 400
+    )
@@ -0,0 +1,58 @@
+"""Tests for response formats and JSON serialization"""
+
+import json
+
+from conftest import image_bytes
+from serialization import json_dumps
+
+
+def detect(client, **params):
+    upload = {"file": ("a.png", image_bytes(), "image/png")}
+    return client.post("/detect", files=upload, params=params)
+
+
+def test_columnar_format_matches_detailed(client):
+    detailed = detect(client).json()
+    columnar = detect(client, format="columnar").json()
+
+    assert columnar["format"] == "columnar"
+    assert "detections" not in columnar
+    assert columnar["total_detections"] == len(detailed["detections"])
+    assert [columnar["classes"][class_id] for class_id in columnar["class_ids"]] == [
+        detection["class"] for detection in detailed["detections"]
+    ]
+    assert columnar["scores"] == [
+        detection["confidence"] for detection in detailed["detections"]
+    ]
+    # Boxes are flattened as [xmin, ymin, xmax, ymax, ...]
+    assert columnar["boxes"] == [
+        value
+        for detection in detailed["detections"]
+        for value in detection["bbox"].values()
+    ]
+
+
+def test_batch_sends_the_class_table_once(client):
+    upload = ("a.png", image_bytes(), "image/png")
+    response = client.post(
+        "/detect-batch", files=[("files", upload)] * 2, params={"format": "columnar"}
+    )
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["classes"][1] == "person"
+    assert all("classes" not in result for result in body["results"])
+    assert [result["class_ids"] for result in body["results"]] == [[1] * 5] * 2
+
+
+def test_unknown_format_is_rejected(client):
+    assert detect(client, format="xml").status_code == 400
+
+
+def test_json_dumps_is_compact_and_keeps_unicode():
+    content = {"class": "café", "scores": [0.5, 1.0], "count": 2}
+
+    assert (
+        json_dumps(content) == '{"class":"café","scores":[0.5,1.0],"count":2}'.encode()
+    )
+    assert json.loads(json_dumps(content)) == content
@@ -0,0 +1,123 @@
+"""Tests for streamed batch detection"""
+
+import asyncio
+import json
+
+import pytest
+
+import main
+from conftest import image_bytes
+from streaming import UploadLimitError, UploadSpool, iter_multipart_files
+
+BOUNDARY = "test-boundary"
+
+
+def multipart_body(files):
+    body = b""
+    for name, contents in files:
+        body += (
+            (
+                f"--{BOUNDARY}\r\n"
+                f'Content-Disposition: form-data; name="files"; filename="{name}"\r\n'
+                "Content-Type: image/png\r\n\r\n"
+            ).encode()
+            + contents
+            + b"\r\n"
+        )
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def parse(body, chunk_size=7, **limits):
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start : start + chunk_size]
+
+    async def run():
+        content_type = f"multipart/form-data; boundary={BOUNDARY}"
+        return [
+            part
+            async for part in iter_multipart_files(content_type, chunks(), **limits)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_parts_are_parsed_across_chunk_boundaries():
+    parts = parse(multipart_body([("a.png", b"first"), ("b.png", b"second file")]))
+
+    assert [(part.filename, part.data) for part in parts] == [
+        ("a.png", b"first"),
+        ("b.png", b"second file"),
+    ]
+
+
+def test_oversized_part_is_reported_without_its_data():
+    parts = parse(
+        multipart_body([("a.png", b"x" * 100), ("b.png", b"ok")]), max_part_bytes=10
+    )
+
+    assert parts[0].data == b"" and "upload limit" in parts[0].error
+    assert (parts[1].data, parts[1].error) == (b"ok", None)
+
+
+@pytest.mark.parametrize("limits", [{"max_total_bytes": 200}, {"max_files": 2}])
+def test_body_and_file_count_limits(limits):
+    with pytest.raises(UploadLimitError):
+        parse(
+            multipart_body([(f"{index}.png", b"x" * 50) for index in range(3)]),
+            **limits,
+        )
+
+
+def test_spool_frees_parts_as_they_are_taken():
+    spool = UploadSpool(max_memory_bytes=10, segment_bytes=20)
+    parts = [spool.write(bytes([index]) * 8) for index in range(6)]
+
+    assert (spool.memory_bytes, spool.disk_bytes) == (8, 40)
+    assert [spool.take(part) for part in parts[:4]] == [
+        bytes([index]) * 8 for index in range(4)
+    ]
+    # The first segment (parts 1-3) is gone; the second still holds parts 4-5
+    assert (spool.memory_bytes, spool.disk_bytes) == (0, 16)
+    assert [spool.take(part) for part in parts[4:]] == [bytes([4]) * 8, bytes([5]) * 8]
+    assert spool.disk_bytes == 0
+    spool.close()
+
+
+def test_stream_endpoint_returns_results_in_order(client):
+    files = [(f"{index}.png", image_bytes(color=(index, 0, 0))) for index in range(5)]
+
+    response = client.post(
+        "/detect-batch/stream",
+        content=multipart_body(files),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    records = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [record.get("filename") for record in records[:-1]] == [
+        name for name, _ in files
+    ]
+    assert [record["index"] for record in records[:-1]] == list(range(5))
+    assert records[-1]["done"] and records[-1]["total_images"] == 5
+
+
+def test_stream_endpoint_enforces_body_limits(client, monkeypatch):
+    body = multipart_body([(f"{index}.png", image_bytes()) for index in range(3)])
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+    monkeypatch.setattr(main, "STREAM_MAX_BODY_BYTES", len(body) - 1)
+    too_large = client.post("/detect-batch/stream", content=body, headers=headers)
+
+    monkeypatch.setattr(main, "STREAM_MAX_BODY_BYTES", 0)
+    monkeypatch.setattr(main, "STREAM_MAX_FILES", 2)
+    records = [
+        json.loads(line)
+        for line in client.post(
+            "/detect-batch/stream", content=body, headers=headers
+        ).text.splitlines()
+    ]
+
+    assert too_large.status_code == 413
+    assert [record.get("success") for record in records[:-1]] == [True, True, False]
+    assert records[-2]["status_code"] == 413
+    assert records[-1]["total_images"] == 2
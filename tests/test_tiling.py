@@ -0,0 +1,50 @@
+"""Tests for merging tiled detections"""
+
+import pytest
+import torch
+
+from tiling import merge_detections
+
+
+def tile_result(boxes, scores, labels):
+    return {
+        "boxes": torch.tensor(boxes, dtype=torch.float32),
+        "scores": torch.tensor(scores),
+        "labels": torch.tensor(labels),
+    }
+
+
+def test_overlapping_boxes_from_neighbouring_tiles_are_merged():
+    # The same object seen by two tiles whose overlap starts at x=100
+    left = tile_result([[90, 10, 130, 50]], [0.8], [1])
+    right = tile_result([[-9, 10, 30, 50]], [0.9], [1])
+
+    merged = merge_detections(
+        [left, right], [(0, 0), (100, 0)], scale=1.0, iou_threshold=0.5
+    )
+
+    assert merged["scores"].tolist() == pytest.approx([0.9])
+    assert merged["boxes"].tolist() == [[91.0, 10.0, 130.0, 50.0]]
+
+
+def test_overlapping_boxes_of_different_classes_are_kept():
+    left = tile_result([[90, 10, 130, 50]], [0.8], [1])
+    right = tile_result([[-10, 10, 30, 50]], [0.9], [3])
+
+    merged = merge_detections(
+        [left, right], [(0, 0), (100, 0)], scale=1.0, iou_threshold=0.5
+    )
+
+    assert sorted(merged["labels"].tolist()) == [1, 3]
+
+
+def test_boxes_are_mapped_back_to_original_image():
+    result = tile_result([[10, 20, 30, 40], [100, 100, 120, 120]], [0.7, 0.6], [1, 1])
+
+    merged = merge_detections([result], [(200, 50)], scale=2.0, iou_threshold=0.5)
+
+    assert merged["boxes"].tolist() == [
+        [105.0, 35.0, 115.0, 45.0],
+        [150.0, 75.0, 160.0, 85.0],
+    ]
+    assert merged["scores"].tolist() == pytest.approx([0.7, 0.6])
@@ -0,0 +1,48 @@
+"""Tests for tuning profiles"""
+
+import torch
+
+import main
+from tuning import TuningProfile, host_signature, load_profile, save_profile
+
+
+def profile(cpu="test cpu", batch_size=4, torch_threads=1):
+    host = {**host_signature("pytorch", "fp32"), "cpu": cpu}
+    return TuningProfile(torch_threads, 0, 1, batch_size, host=host)
+
+
+def test_profiles_are_kept_per_host_type(tmp_path):
+    path = str(tmp_path / "autotune.json")
+    save_profile(path, profile(cpu="cpu a", batch_size=2))
+    save_profile(path, profile(cpu="cpu b", batch_size=8))
+    save_profile(path, profile(cpu="cpu a", batch_size=4))
+
+    assert load_profile(path, profile(cpu="cpu a").host).batch_size == 4
+    assert load_profile(path, profile(cpu="cpu b").host).batch_size == 8
+    assert load_profile(path, profile(cpu="cpu c").host) is None
+
+
+def test_unreadable_profile_is_ignored(tmp_path):
+    path = tmp_path / "autotune.json"
+    path.write_text("{not json")
+
+    assert load_profile(str(path), profile().host) is None
+
+
+def test_startup_applies_the_matching_profile(tmp_path, monkeypatch):
+    path = str(tmp_path / "autotune.json")
+    host = host_signature(main.INFERENCE_BACKEND, main.MODEL_PRECISION)
+    save_profile(path, TuningProfile(1, 0, 1, 3, host=host))
+    monkeypatch.setattr(main, "TUNING_PROFILE", path)
+    monkeypatch.setattr(main, "TORCH_THREADS", 0)
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", main.MAX_BATCH_SIZE)
+    monkeypatch.setattr(main, "tuning_profile", main.tuning_profile)
+    monkeypatch.delenv("MAX_BATCH_SIZE", raising=False)
+    threads = torch.get_num_threads()
+    try:
+        main.apply_tuning_profile()
+
+        assert torch.get_num_threads() == 1
+        assert main.MAX_BATCH_SIZE == 3
+    finally:
+        torch.set_num_threads(threads)
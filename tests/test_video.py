@@ -0,0 +1,51 @@
+"""Tests for skipping duplicate video frames"""
+
+from PIL import Image, ImageDraw
+
+from video import DuplicateFilter
+
+
+def frame(shift=0, brightness=0):
+    """A gradient frame with a dark square, optionally moved and brightened"""
+    image = (
+        Image.linear_gradient("L")
+        .resize((320, 240))
+        .point(lambda value: min(255, value + brightness))
+    )
+    ImageDraw.Draw(image).rectangle([40 + shift, 60, 120 + shift, 140], fill=0)
+    return image.convert("RGB")
+
+
+def test_first_frame_is_never_a_duplicate():
+    assert not DuplicateFilter(max_distance=4).is_duplicate(frame())
+
+
+def test_repeated_frame_is_a_duplicate():
+    duplicates = DuplicateFilter(max_distance=4)
+    duplicates.is_duplicate(frame())
+
+    assert duplicates.is_duplicate(frame())
+    assert duplicates.is_duplicate(frame(shift=1))
+
+
+def test_changed_frame_becomes_the_new_reference():
+    duplicates = DuplicateFilter(max_distance=4)
+    duplicates.is_duplicate(frame())
+
+    assert not duplicates.is_duplicate(frame(shift=150))
+    assert duplicates.is_duplicate(frame(shift=150))
+    assert not duplicates.is_duplicate(frame())
+
+
+def test_lighting_change_is_not_a_duplicate():
+    duplicates = DuplicateFilter(max_distance=4)
+    duplicates.is_duplicate(frame())
+
+    assert not duplicates.is_duplicate(frame(brightness=60))
+
+
+def test_negative_distance_disables_deduplication():
+    duplicates = DuplicateFilter(max_distance=-1)
+
+    assert not duplicates.is_duplicate(frame())
+    assert not duplicates.is_duplicate(frame())
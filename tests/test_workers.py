@@ -0,0 +1,47 @@
+"""Tests for admission control"""
+
+import pytest
+
+import main
+from conftest import image_bytes
+from workers import InFlightLimiter, ServerBusyError
+
+
+def test_limiter_rejects_past_the_limit():
+    limiter = InFlightLimiter(max_in_flight=4)
+    slots = limiter.acquire(3)
+
+    with pytest.raises(ServerBusyError):
+        limiter.acquire(2)
+
+    limiter.release(slots)
+    assert limiter.acquire(2) == 2
+    assert limiter.stats() == {
+        "in_flight": 2,
+        "max_in_flight": 4,
+        "rejected_requests": 1,
+    }
+
+
+def test_oversized_request_reserves_the_whole_limit():
+    limiter = InFlightLimiter(max_in_flight=4)
+
+    assert limiter.acquire(10) == 4
+    with pytest.raises(ServerBusyError):
+        limiter.acquire(1)
+
+
+def test_saturated_server_returns_503_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(main, "RETRY_AFTER_SECONDS", 7)
+    upload = {"file": ("a.png", image_bytes(), "image/png")}
+    slots = main.limiter.acquire(main.limiter.max_in_flight)
+    try:
+        response = client.post("/detect", files=upload)
+        # Health checks are still answered
+        assert client.get("/health").status_code == 200
+    finally:
+        main.limiter.release(slots)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert client.post("/detect", files=upload).status_code == 200